@@ -0,0 +1,230 @@
+"""Account balances.
+
+``account_balances`` annotates accounts with their debit and credit totals
+in a single query, and ``get_chart_of_accounts`` groups those rows by
+category type with subtotals. Views, exports and reports should use these
+instead of aggregating per account.
+
+Totals start from the last closed accounting period before the ``as_of``
+month: the latest ``AccountBalanceSnapshot`` after that period, else the
+period's ``PeriodClosingBalance`` (older snapshots are not read). Without a
+closed period they start from the latest snapshot before the month. The
+journal entries from the start of the ``as_of`` month are added, so the cost
+does not grow with the size of the ledger. ``rebuild_balance_snapshots``
+recomputes the snapshot table from the journal.
+"""
+import threading
+from collections import defaultdict
+from contextlib import contextmanager
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import DecimalField, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce, TruncMonth
+
+from .models import (
+    Account, AccountBalanceSnapshot, AccountCategory, AccountingPeriod, JournalEntry, PeriodClosingBalance,
+    period_start,
+)
+
+ZERO = Decimal("0.00")
+
+# Category types whose balance is debits minus credits; the rest are credit-normal
+DEBIT_NORMAL_TYPES = ("asset", "expense")
+
+CATEGORY_LABELS = {
+    "asset": "Assets",
+    "liability": "Liabilities",
+    "equity": "Equity",
+    "revenue": "Revenue",
+    "expense": "Expenses",
+}
+
+
+def normal_balance(category_type, debit_total, credit_total):
+    """Balance of an account of ``category_type`` in its normal direction."""
+    if category_type in DEBIT_NORMAL_TYPES:
+        return debit_total - credit_total
+    return credit_total - debit_total
+
+
+AMOUNT_FIELD = DecimalField(max_digits=14, decimal_places=2)
+
+
+def _subquery_total(queryset, field):
+    return Coalesce(Subquery(queryset.values(field)[:1], output_field=AMOUNT_FIELD), Value(ZERO))
+
+
+def _opening_total(field, month):
+    """Account total before ``month`` (all of it when None) from the last closed period and the snapshots after it"""
+    snapshots = AccountBalanceSnapshot.objects.filter(account=OuterRef("pk")).order_by("-period")
+    closed = AccountingPeriod.objects.filter(status="closed").order_by("-end_date")
+    closing = PeriodClosingBalance.objects.filter(account=OuterRef("pk"), period__status="closed").order_by(
+        "-period__end_date"
+    )
+    if month is not None:
+        snapshots = snapshots.filter(period__lt=month)
+        closed = closed.filter(end_date__lt=month)
+        closing = closing.filter(period__end_date__lt=month)
+    last_closed_end = Subquery(closed.values("end_date")[:1])
+    column = f"closing_{field}"
+    return Coalesce(
+        # Months after the last closed period; none when no period is closed
+        Subquery(snapshots.filter(period__gt=last_closed_end).values(column)[:1], output_field=AMOUNT_FIELD),
+        Subquery(closing.values(column)[:1], output_field=AMOUNT_FIELD),
+        # No closed period, or an account opened since the last close
+        Subquery(snapshots.values(column)[:1], output_field=AMOUNT_FIELD),
+        Value(ZERO),
+    )
+
+
+def _balance_total(field, as_of):
+    if as_of is None:
+        return _opening_total(field, None)
+
+    month = period_start(as_of)
+    opening = _opening_total(field, month)
+    since_opening = (
+        JournalEntry.objects.filter(
+            account=OuterRef("pk"), transaction__date__range=[month, as_of]
+        )
+        .order_by()
+        .values("account")
+        .annotate(total=Sum(field))
+    )
+    return opening + _subquery_total(since_opening, "total")
+
+
+def account_balances(as_of=None, accounts=None):
+    """Accounts annotated with ``debit_total`` and ``credit_total``.
+
+    Only journal entries dated on or before ``as_of`` are counted when it is
+    given. Defaults to all active accounts, ordered by category type and code;
+    the result is a single query.
+    """
+    if accounts is None:
+        accounts = Account.objects.filter(is_active=True)
+    return (
+        accounts.select_related("category")
+        .annotate(
+            debit_total=_balance_total("debit", as_of),
+            credit_total=_balance_total("credit", as_of),
+        )
+        .order_by("category__category_type", "code")
+    )
+
+
+def period_balances(start, end, accounts=None):
+    """``account_balances(end)`` also annotated with ``opening_debit`` and ``opening_credit``.
+
+    The opening totals count entries dated before ``start`` (zero when it is
+    None); closing minus opening is the movement within the period. Still a
+    single query.
+    """
+    accounts = account_balances(end, accounts)
+    if start is None:
+        return accounts.annotate(opening_debit=Value(ZERO), opening_credit=Value(ZERO))
+    day_before = start - timedelta(days=1)
+    return accounts.annotate(
+        opening_debit=_balance_total("debit", day_before),
+        opening_credit=_balance_total("credit", day_before),
+    )
+
+
+def get_chart_of_accounts(as_of=None):
+    """Active accounts with balances, grouped by category type.
+
+    Returns an ordered dict of category label -> ``{'type', 'accounts',
+    'debit_total', 'credit_total', 'total_balance'}``, with one entry per
+    category type (empty ones included). Each account row is a dict of
+    ``account``, ``debit_total``, ``credit_total`` and ``balance``.
+    """
+    chart = {
+        CATEGORY_LABELS[cat_type]: {
+            "type": cat_type,
+            "accounts": [],
+            "debit_total": ZERO,
+            "credit_total": ZERO,
+            "total_balance": ZERO,
+        }
+        for cat_type, _label in AccountCategory.CATEGORY_TYPES
+    }
+    for account in account_balances(as_of):
+        cat_type = account.category.category_type
+        balance = normal_balance(cat_type, account.debit_total, account.credit_total)
+        group = chart[CATEGORY_LABELS[cat_type]]
+        group["accounts"].append({
+            "account": account,
+            "debit_total": account.debit_total,
+            "credit_total": account.credit_total,
+            "balance": balance,
+        })
+        group["debit_total"] += account.debit_total
+        group["credit_total"] += account.credit_total
+        group["total_balance"] += balance
+    return chart
+
+
+def rebuild_balance_snapshots():
+    """Recompute every balance snapshot from the journal. Returns the number of rows.
+
+    The journal is aggregated once by account and month; needed after entries
+    were written without signals (raw SQL, ``bulk_create`` or ``update()``).
+    """
+    movements = defaultdict(list)
+    monthly = (
+        JournalEntry.objects.order_by()
+        .annotate(period=TruncMonth("transaction__date"))
+        .values("account_id", "period")
+        .annotate(debit=Sum("debit"), credit=Sum("credit"))
+    )
+    for row in monthly:
+        movements[row["account_id"]].append((period_start(row["period"]), row["debit"], row["credit"]))
+
+    snapshots = []
+    for account_id, months in movements.items():
+        closing_debit = closing_credit = ZERO
+        for period, debit, credit in sorted(months):
+            closing_debit += debit
+            closing_credit += credit
+            snapshots.append(AccountBalanceSnapshot(
+                account_id=account_id,
+                period=period,
+                debit=debit,
+                credit=credit,
+                closing_debit=closing_debit,
+                closing_credit=closing_credit,
+            ))
+
+    with transaction.atomic():
+        AccountBalanceSnapshot.objects.all().delete()
+        AccountBalanceSnapshot.objects.bulk_create(snapshots, batch_size=1000)
+    return len(snapshots)
+
+
+_tracking = threading.local()
+
+
+def balance_tracking_suspended():
+    return getattr(_tracking, "suspended", False)
+
+
+@contextmanager
+def suspended_balance_tracking():
+    """Skip the per-entry snapshot and total updates of the journal signals inside the block.
+
+    For bulk rewrites of the ledger: entries are deleted and saved without
+    a query per entry, and the snapshots are rebuilt once when the block
+    succeeds. Transactions whose entries are edited inside the block must
+    refresh their own totals.
+    """
+    if balance_tracking_suspended():
+        yield
+        return
+    _tracking.suspended = True
+    try:
+        yield
+    finally:
+        _tracking.suspended = False
+    rebuild_balance_snapshots()
@@ -0,0 +1,150 @@
+"""Double-entry integrity checks.
+
+Every check is one set-based query (an aggregate with HAVING, or NOT
+EXISTS), so the whole ledger can be checked nightly by ``manage.py
+check_ledger_integrity`` or on demand from the admin report. A check never
+loads the ledger into Python; only the offending rows come back.
+
+* unbalanced transactions: debits and credits differ, or fewer than two lines;
+* orphaned journal entries: lines whose transaction or account is gone;
+* closed period drift: balances at the end of a closed period that no
+  longer match what was stored when it was closed;
+* unposted documents, one check per ledger source: documents with no ledger
+  transaction that are not queued in the outbox either. Documents posted
+  before the outbox existed show up here until ``rebuild_ledger
+  --replace-legacy`` links them. The outbox's unique ``(source, source_id)``
+  already rules out a second posting of a document.
+"""
+from decimal import Decimal
+
+from django.db.models import Count, Exists, F, OuterRef, Q, Subquery, Sum, Value
+from django.db.models.functions import Abs, Coalesce
+
+from .balances import AMOUNT_FIELD, ZERO
+from .models import Account, AccountBalanceSnapshot, JournalEntry, LedgerOutbox, PeriodClosingBalance, Transaction
+from .outbox import LEDGER_SOURCES
+
+# Sums of decimal columns come back as floats on SQLite
+TOLERANCE = Decimal("0.005")
+
+
+class IntegrityCheck:
+    """One check: ``queryset()`` returns the offending rows as ``values()`` in ``columns`` order."""
+
+    def __init__(self, name, label, columns, queryset):
+        self.name = name
+        self.label = label
+        self.columns = columns
+        self.queryset = queryset
+
+    def run(self, limit=None):
+        """``(number of problems, rows)`` with up to ``limit`` rows as lists of column values."""
+        queryset = self.queryset()
+        count = queryset.count()
+        rows = queryset[:limit] if limit else queryset
+        keys = [key for key, _label in self.columns]
+        return count, [[row[key] for key in keys] for row in rows]
+
+
+def unbalanced_transactions():
+    return (
+        Transaction.objects.annotate(
+            entry_count=Count("entries"),
+            debit_sum=Coalesce(Sum("entries__debit"), Value(ZERO), output_field=AMOUNT_FIELD),
+            credit_sum=Coalesce(Sum("entries__credit"), Value(ZERO), output_field=AMOUNT_FIELD),
+        )
+        .annotate(difference=Abs(F("debit_sum") - F("credit_sum")))
+        .filter(Q(entry_count__lt=2) | Q(difference__gte=TOLERANCE))
+        .order_by("date", "pk")
+        .values("pk", "date", "description", "entry_count", "debit_sum", "credit_sum")
+    )
+
+
+def orphaned_entries():
+    return (
+        JournalEntry.objects.filter(
+            ~Exists(Transaction.objects.filter(pk=OuterRef("transaction_id")))
+            | ~Exists(Account.objects.filter(pk=OuterRef("account_id")))
+        )
+        .order_by("pk")
+        .values("pk", "transaction_id", "account_id", "debit", "credit")
+    )
+
+
+def unposted_documents(source):
+    outbox = LedgerOutbox.objects.filter(source=source.name, source_id=OuterRef("pk"))
+    return (
+        source.get_model().objects.filter(
+            ~source.has_posting(),
+            ~Exists(outbox.filter(status__in=["pending", "processing", "skipped"])),
+        )
+        .annotate(outbox_status=Subquery(outbox.values("status")[:1]))
+        .order_by(source.date_field, "pk")
+        .values("pk", source.date_field, "amount", "outbox_status")
+    )
+
+
+def _latest(snapshots, field):
+    return Coalesce(Subquery(snapshots.values(field)[:1], output_field=AMOUNT_FIELD), Value(ZERO))
+
+
+def closed_period_drift():
+    # Periods end on a month end, so the latest snapshot up to it holds the closing totals
+    snapshots = AccountBalanceSnapshot.objects.filter(
+        account=OuterRef("account_id"), period__lte=OuterRef("period__end_date")
+    ).order_by("-period")
+    return (
+        PeriodClosingBalance.objects.annotate(
+            current_debit=_latest(snapshots, "closing_debit"),
+            current_credit=_latest(snapshots, "closing_credit"),
+        )
+        .filter(
+            Q(closing_debit__gt=F("current_debit") + TOLERANCE)
+            | Q(closing_debit__lt=F("current_debit") - TOLERANCE)
+            | Q(closing_credit__gt=F("current_credit") + TOLERANCE)
+            | Q(closing_credit__lt=F("current_credit") - TOLERANCE)
+        )
+        .order_by("period__start_date", "account__code")
+        .values("period__name", "account__code", "closing_debit", "current_debit", "closing_credit",
+                "current_credit")
+    )
+
+
+def integrity_checks():
+    checks = [
+        IntegrityCheck(
+            "unbalanced_transactions",
+            "Unbalanced transactions",
+            [("pk", "ID"), ("date", "Date"), ("description", "Description"), ("entry_count", "Lines"),
+             ("debit_sum", "Debits"), ("credit_sum", "Credits")],
+            unbalanced_transactions,
+        ),
+        IntegrityCheck(
+            "orphaned_entries",
+            "Orphaned journal entries",
+            [("pk", "ID"), ("transaction_id", "Transaction"), ("account_id", "Account"),
+             ("debit", "Debit"), ("credit", "Credit")],
+            orphaned_entries,
+        ),
+        IntegrityCheck(
+            "closed_period_drift",
+            "Closed periods whose balances changed",
+            [("period__name", "Period"), ("account__code", "Account"), ("closing_debit", "Closed Debit"),
+             ("current_debit", "Debit Now"), ("closing_credit", "Closed Credit"), ("current_credit", "Credit Now")],
+            closed_period_drift,
+        ),
+    ]
+    for source in LEDGER_SOURCES.values():
+        model = source.get_model()
+        checks.append(IntegrityCheck(
+            f"unposted_{source.name}",
+            f"{model._meta.verbose_name_plural.capitalize()} without a ledger transaction",
+            [("pk", "ID"), (source.date_field, "Date"), ("amount", "Amount"), ("outbox_status", "Outbox")],
+            lambda source=source: unposted_documents(source),
+        ))
+    return checks
+
+
+def run_integrity_checks(limit=100):
+    """Run every check; returns a list of ``(check, number of problems, first rows)``."""
+    return [(check, *check.run(limit)) for check in integrity_checks()]
@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand
+
+from accounting.models import Transaction
+
+
+class Command(BaseCommand):
+    help = (
+        'Recompute the stored total_amount and transaction_type of ledger transactions '
+        'from their journal entries, one UPDATE per batch'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help='Transactions per UPDATE (default: 1000)')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        updated = 0
+        last_pk = 0
+        while True:
+            pks = list(
+                Transaction.objects.filter(pk__gt=last_pk)
+                .order_by('pk')
+                .values_list('pk', flat=True)[:batch_size]
+            )
+            if not pks:
+                break
+            updated += Transaction.objects.filter(pk__in=pks).refresh_totals()
+            last_pk = pks[-1]
+            self.stdout.write(f'Updated {updated} transactions (through id {last_pk})')
+
+        self.stdout.write(self.style.SUCCESS(f'Backfilled totals for {updated} transactions'))
@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from accounting.integrity import run_integrity_checks
+
+
+class Command(BaseCommand):
+    help = (
+        'Check that every ledger transaction balances, no journal entry is orphaned and '
+        'every source document is posted; exits with an error if anything is found'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--limit', type=int, default=20,
+                            help='Problem rows listed per check (default: 20)')
+
+    def handle(self, *args, **options):
+        problems = 0
+        for check, count, rows in run_integrity_checks(limit=options['limit']):
+            if not count:
+                self.stdout.write(f'{check.label}: none')
+                continue
+            problems += count
+            self.stdout.write(self.style.WARNING(f'{check.label}: {count}'))
+            self.stdout.write('  ' + ' | '.join(label for _key, label in check.columns))
+            for row in rows:
+                self.stdout.write('  ' + ' | '.join('' if value is None else str(value) for value in row))
+            if count > len(rows):
+                self.stdout.write(f'  ... and {count - len(rows)} more')
+
+        if problems:
+            raise CommandError(f'Ledger integrity check found {problems} problems')
+        self.stdout.write(self.style.SUCCESS('Ledger integrity check passed'))
@@ -0,0 +1,54 @@
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+
+from accounting.models import AccountingPeriod
+from accounting.periods import close_period, reopen_period
+
+
+def _date(value):
+    try:
+        parsed = parse_date(value)
+    except ValueError:
+        parsed = None
+    if parsed is None:
+        raise CommandError(f"Invalid date '{value}', expected YYYY-MM-DD")
+    return parsed
+
+
+class Command(BaseCommand):
+    help = 'Close (or reopen) an accounting period, creating it if needed'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--from', dest='start', required=True, help='First day of the period (YYYY-MM-DD)')
+        parser.add_argument('--to', dest='end', required=True, help='Last day of the period (YYYY-MM-DD)')
+        parser.add_argument('--name', help='Name for a new period (default: from the dates)')
+        parser.add_argument('--reopen', action='store_true', help='Reopen the period instead of closing it')
+
+    def handle(self, *args, **options):
+        start, end = _date(options['start']), _date(options['end'])
+        period = AccountingPeriod.objects.filter(start_date=start, end_date=end).first()
+        try:
+            if period is None:
+                if options['reopen']:
+                    raise CommandError('No such accounting period')
+                same_month = (start.year, start.month) == (end.year, end.month)
+                period = AccountingPeriod(
+                    name=options['name'] or (f'{start:%B %Y}' if same_month else f'{start:%b %Y} - {end:%b %Y}'),
+                    period_type='month' if same_month else 'fiscal_year',
+                    start_date=start,
+                    end_date=end,
+                )
+                period.full_clean()
+                period.save()
+
+            if options['reopen']:
+                reopen_period(period)
+                self.stdout.write(self.style.SUCCESS(f'Reopened {period.name}'))
+            else:
+                period = close_period(period, closed_by='manage.py')
+                self.stdout.write(self.style.SUCCESS(
+                    f'Closed {period.name} with {period.closing_balances.count()} account balances'
+                ))
+        except ValidationError as e:
+            raise CommandError('; '.join(e.messages))
@@ -0,0 +1,53 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from accounting.outbox import DEFAULT_BATCH_SIZE, process_ledger_outbox, requeue_stale_outbox
+
+REQUEUE_INTERVAL = 5 * 60
+
+
+def _drain(batch_size):
+    try:
+        return process_ledger_outbox(batch_size=batch_size)
+    finally:
+        # Worker threads open their own connections
+        connection.close()
+
+
+class Command(BaseCommand):
+    help = 'Post queued source documents from the ledger outbox in batches'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true',
+                            help='Drain the current queue and exit (for cron)')
+        parser.add_argument('--interval', type=float, default=5,
+                            help='Seconds to wait between queue polls (default: 5)')
+        parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE,
+                            help=f'Documents posted per database transaction (default: {DEFAULT_BATCH_SIZE})')
+        parser.add_argument('--workers', type=int, default=1,
+                            help='Threads draining the queue concurrently (default: 1)')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        workers = max(1, options['workers'])
+        last_requeue = None
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            while True:
+                if last_requeue is None or time.monotonic() - last_requeue >= REQUEUE_INTERVAL:
+                    requeued = requeue_stale_outbox()
+                    last_requeue = time.monotonic()
+                    if requeued:
+                        self.stdout.write(f'Requeued {requeued} stale outbox entries')
+
+                if workers == 1:
+                    posted = process_ledger_outbox(batch_size=batch_size)
+                else:
+                    posted = sum(pool.map(_drain, [batch_size] * workers))
+                if posted:
+                    self.stdout.write(self.style.SUCCESS(f'Posted {posted} documents to the ledger'))
+                if options['once']:
+                    break
+                time.sleep(options['interval'])
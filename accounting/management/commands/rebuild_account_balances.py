@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from accounting.balances import rebuild_balance_snapshots
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the per-account monthly balance snapshots from the journal'
+
+    def handle(self, *args, **options):
+        count = rebuild_balance_snapshots()
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {count} account balance snapshots'))
@@ -0,0 +1,51 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+
+from accounting.outbox import LEDGER_SOURCES
+from accounting.rebuild import DEFAULT_BATCH_SIZE, rebuild_ledger
+
+
+def _date(value):
+    try:
+        parsed = parse_date(value)
+    except ValueError:
+        parsed = None
+    if parsed is None:
+        raise CommandError(f"Invalid date '{value}', expected YYYY-MM-DD")
+    return parsed
+
+
+class Command(BaseCommand):
+    help = (
+        'Delete the ledger transactions of donations, expenses, membership, billing and fee '
+        'payments and post the documents again from their current values'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--from', dest='start', help='Only documents dated on or after this day (YYYY-MM-DD)')
+        parser.add_argument('--to', dest='end', help='Only documents dated on or before this day (YYYY-MM-DD)')
+        parser.add_argument('--source', action='append', choices=sorted(LEDGER_SOURCES),
+                            help='Rebuild only this kind of document (repeatable; default: all)')
+        parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE,
+                            help=f'Documents posted per bulk insert (default: {DEFAULT_BATCH_SIZE})')
+        parser.add_argument('--replace-legacy', action='store_true',
+                            help='Also delete unlinked transactions that look like postings made '
+                                 'before the ledger outbox existed (matched by description)')
+
+    def handle(self, *args, **options):
+        start = _date(options['start']) if options['start'] else None
+        end = _date(options['end']) if options['end'] else None
+        if start and end and start > end:
+            raise CommandError('--from must not be after --to')
+
+        results = rebuild_ledger(
+            start=start,
+            end=end,
+            sources=options['source'],
+            batch_size=options['batch_size'],
+            replace_legacy=options['replace_legacy'],
+        )
+        for name, (deleted, posted) in results.items():
+            self.stdout.write(f'{name}: deleted {deleted} transactions, posted {posted} documents')
+        total = sum(posted for _deleted, posted in results.values())
+        self.stdout.write(self.style.SUCCESS(f'Reposted {total} documents to the ledger'))
@@ -1,16 +1,10 @@
 from django.core.management.base import BaseCommand
 from accounting.models import Account, AccountCategory
-from django.db.models.signals import post_save
 
 class Command(BaseCommand):
     help = 'Initialize Chart of Accounts with standard mosque accounts'
 
     def handle(self, *args, **options):
-        # Aggressively disable all post_save signals to avoid django-tasks error
-        from django.db.models.signals import post_save
-        post_save.receivers = []
-        self.stdout.write("All post_save signals temporarily disabled for setup.")
-
         # 1. Categories
         assets, _ = AccountCategory.objects.get_or_create(name='Assets', category_type='asset')
         liabi, _ = AccountCategory.objects.get_or_create(name='Liabilities', category_type='liability')
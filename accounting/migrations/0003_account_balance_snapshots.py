@@ -0,0 +1,68 @@
+# Generated by Django 4.2.30 on 2026-10-17 21:30
+
+from django.db import migrations, models
+import django.db.models.deletion
+from django.db.models import Sum
+from django.db.models.functions import TruncMonth
+
+
+def build_snapshots(apps, schema_editor):
+    """Seed the snapshot table from the existing journal."""
+    JournalEntry = apps.get_model("accounting", "JournalEntry")
+    AccountBalanceSnapshot = apps.get_model("accounting", "AccountBalanceSnapshot")
+    db_alias = schema_editor.connection.alias
+
+    monthly = (
+        JournalEntry.objects.using(db_alias)
+        .order_by()
+        .annotate(period=TruncMonth("transaction__date"))
+        .values("account_id", "period")
+        .annotate(debit=Sum("debit"), credit=Sum("credit"))
+        .order_by("account_id", "period")
+    )
+    snapshots = []
+    closing = {}
+    for row in monthly:
+        closing_debit, closing_credit = closing.get(row["account_id"], (0, 0))
+        closing_debit += row["debit"]
+        closing_credit += row["credit"]
+        closing[row["account_id"]] = (closing_debit, closing_credit)
+        snapshots.append(AccountBalanceSnapshot(
+            account_id=row["account_id"],
+            period=row["period"],
+            debit=row["debit"],
+            credit=row["credit"],
+            closing_debit=closing_debit,
+            closing_credit=closing_credit,
+        ))
+    AccountBalanceSnapshot.objects.using(db_alias).bulk_create(snapshots, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounting', '0002_add_name_to_transaction'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AccountBalanceSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('period', models.DateField(help_text='First day of the month')),
+                ('debit', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('credit', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('closing_debit', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('closing_credit', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('account', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='balance_snapshots', to='accounting.account')),
+            ],
+            options={
+                'verbose_name': 'Account Balance Snapshot',
+                'verbose_name_plural': 'Account Balance Snapshots',
+                'ordering': ['account', 'period'],
+                'unique_together': {('account', 'period')},
+            },
+        ),
+        migrations.RunPython(build_snapshots, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 4.2.30 on 2026-10-17 21:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounting', '0003_account_balance_snapshots'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='transaction',
+            name='total_amount',
+            field=models.DecimalField(decimal_places=2, default=0, editable=False, max_digits=14),
+        ),
+        migrations.AddField(
+            model_name='transaction',
+            name='transaction_type',
+            field=models.CharField(choices=[('income', 'Income'), ('expense', 'Expense'), ('transfer', 'Transfer')], default='transfer', editable=False, max_length=10),
+        ),
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['date', 'transaction_type'], name='accounting__date_e5fb78_idx'),
+        ),
+    ]
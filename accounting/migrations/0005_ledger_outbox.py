@@ -0,0 +1,36 @@
+# Generated by Django 4.2.30 on 2026-10-17 21:54
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounting', '0004_transaction_totals'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LedgerOutbox',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('source', models.CharField(help_text="Registered ledger source, e.g. 'donation'", max_length=50)),
+                ('source_id', models.PositiveBigIntegerField()),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('processing', 'Processing'), ('posted', 'Posted'), ('skipped', 'Skipped'), ('failed', 'Failed')], default='pending', max_length=20)),
+                ('attempts', models.PositiveSmallIntegerField(default=0)),
+                ('error', models.TextField(blank=True)),
+                ('claimed_by', models.CharField(blank=True, max_length=32)),
+                ('claimed_at', models.DateTimeField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('posted_at', models.DateTimeField(blank=True, null=True)),
+                ('transaction', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='accounting.transaction')),
+            ],
+            options={
+                'verbose_name': 'Ledger Outbox Entry',
+                'verbose_name_plural': 'Ledger Outbox',
+                'indexes': [models.Index(fields=['status', 'id'], name='accounting__status_8ddcff_idx')],
+                'unique_together': {('source', 'source_id')},
+            },
+        ),
+    ]
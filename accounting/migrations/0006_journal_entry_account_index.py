@@ -0,0 +1,17 @@
+# Generated by Django 4.2.30 on 2026-10-17 22:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounting', '0005_ledger_outbox'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='journalentry',
+            index=models.Index(fields=['account', 'transaction'], name='accounting__account_bc377c_idx'),
+        ),
+    ]
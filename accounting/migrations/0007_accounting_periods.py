@@ -0,0 +1,52 @@
+# Generated by Django 4.2.30 on 2026-10-17 22:12
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounting', '0006_journal_entry_account_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AccountingPeriod',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100)),
+                ('period_type', models.CharField(choices=[('month', 'Month'), ('fiscal_year', 'Fiscal Year')], default='month', max_length=20)),
+                ('start_date', models.DateField(help_text='First day of a month')),
+                ('end_date', models.DateField(help_text='Last day of a month')),
+                ('status', models.CharField(choices=[('open', 'Open'), ('closed', 'Closed')], default='open', editable=False, max_length=10)),
+                ('closed_at', models.DateTimeField(blank=True, editable=False, null=True)),
+                ('closed_by', models.CharField(blank=True, editable=False, max_length=150)),
+            ],
+            options={
+                'ordering': ['-start_date'],
+            },
+        ),
+        migrations.CreateModel(
+            name='PeriodClosingBalance',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('closing_debit', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('closing_credit', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('account', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='period_closing_balances', to='accounting.account')),
+                ('period', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='closing_balances', to='accounting.accountingperiod')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='accountingperiod',
+            index=models.Index(fields=['status', 'start_date', 'end_date'], name='accounting__status_38913e_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='accountingperiod',
+            unique_together={('start_date', 'end_date')},
+        ),
+        migrations.AlterUniqueTogether(
+            name='periodclosingbalance',
+            unique_together={('period', 'account')},
+        ),
+    ]
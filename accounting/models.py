@@ -1,6 +1,15 @@
-from django.db import models
+import datetime
+from decimal import Decimal
+
+from django.core.exceptions import ValidationError
+from django.db import IntegrityError, models, transaction
+from django.db.models import Case, CharField, DecimalField, F, OuterRef, Q, Subquery, Sum, Value, When
+from django.db.models.functions import Coalesce
+from django.db.models.lookups import IsNull, LessThan
 from django.utils import timezone
 
+CENTS = Decimal('0.01')
+
 class AccountCategory(models.Model):
     """Assets, Liabilities, Equity, Revenue, Expenses"""
     CATEGORY_TYPES = [
@@ -34,22 +43,82 @@ class Account(models.Model):
     def __str__(self):
         return f"{self.code} - {self.name}"
 
-def get_or_create_account(code, name, category_type):
-    """Helper to safely get or create an account for ledger posting"""
-    category_name = category_type.capitalize() + "s"
-    category, _ = AccountCategory.objects.get_or_create(
-        category_type=category_type,
-        defaults={'name': category_name}
+def period_start(value):
+    """First day of the month of a date or datetime."""
+    if isinstance(value, datetime.datetime):
+        value = timezone.localtime(value).date() if timezone.is_aware(value) else value.date()
+    return value.replace(day=1)
+
+AMOUNT_FIELD = DecimalField(max_digits=14, decimal_places=2)
+
+
+def _entry_total_expression(field):
+    """Sum of ``field`` over the entries of the outer transaction row."""
+    totals = (
+        JournalEntry.objects.filter(transaction=OuterRef('pk'))
+        .order_by()
+        .values('transaction')
+        .annotate(total=Sum(field))
+        .values('total')
     )
-    account, _ = Account.objects.get_or_create(
-        code=code,
-        defaults={'name': name, 'category': category}
+    return Coalesce(Subquery(totals, output_field=AMOUNT_FIELD), Value(0, output_field=AMOUNT_FIELD))
+
+
+def _transaction_type_expression():
+    """Income/expense/transfer of the outer transaction row, from its entries.
+
+    The first entry (by id) that credits a revenue account or debits an
+    expense account decides the type; anything else is a transfer.
+    """
+    def first_entry(category_type, side):
+        matching = JournalEntry.objects.filter(
+            transaction=OuterRef('pk'),
+            account__category__category_type=category_type,
+            **{f'{side}__gt': 0},
+        ).order_by('pk')
+        return Subquery(matching.values('pk')[:1])
+
+    income = first_entry('revenue', 'credit')
+    expense = first_entry('expense', 'debit')
+    return Case(
+        When(
+            Q(IsNull(income, False)) & (Q(IsNull(expense, True)) | Q(LessThan(income, expense))),
+            then=Value('income'),
+        ),
+        When(IsNull(expense, False), then=Value('expense')),
+        default=Value('transfer'),
+        output_field=CharField(),
     )
-    return account
+
+
+class TransactionQuerySet(models.QuerySet):
+    def with_totals(self):
+        """Annotate ``annotated_debit`` and ``annotated_credit`` for listing many transactions.
+
+        The ``total_debit`` and ``total_credit`` properties use the
+        annotations instead of querying the entries of each row.
+        """
+        return self.annotate(
+            annotated_debit=_entry_total_expression('debit'),
+            annotated_credit=_entry_total_expression('credit'),
+        )
+
+    def refresh_totals(self):
+        """Recompute the stored ``total_amount`` and ``transaction_type`` with one UPDATE."""
+        return self.update(
+            total_amount=_entry_total_expression('debit'),
+            transaction_type=_transaction_type_expression(),
+        )
+
 
 class Transaction(models.Model):
     wagtail_reference_index_ignore = True
     """Represents a financial event"""
+    TRANSACTION_TYPES = [
+        ('income', 'Income'),
+        ('expense', 'Expense'),
+        ('transfer', 'Transfer'),
+    ]
     date = models.DateField(default=timezone.now)
     name = models.CharField(
         max_length=200,
@@ -58,45 +127,58 @@ class Transaction(models.Model):
     )
     description = models.CharField(max_length=255)
     reference = models.CharField(max_length=100, blank=True, help_text="External ref (e.g. Receipt #)")
+    # Derived from the entries and kept current by the JournalEntry signal
+    # handlers in accounting/signals.py; see refresh_totals()
+    total_amount = models.DecimalField(max_digits=14, decimal_places=2, default=0, editable=False)
+    transaction_type = models.CharField(
+        max_length=10, choices=TRANSACTION_TYPES, default='transfer', editable=False
+    )
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = TransactionQuerySet.as_manager()
+
+    class Meta:
+        indexes = [models.Index(fields=['date', 'transaction_type'])]
+
     def __str__(self):
         if self.name:
             return f"{self.date} - {self.name} - {self.description}"
         return f"{self.date} - {self.description}"
 
+    def clean(self):
+        previous = Transaction.objects.filter(pk=self.pk).values_list('date', flat=True).first() if self.pk else None
+        AccountingPeriod.ensure_open(self.date, previous)
+
+    def refresh_totals(self):
+        """Recompute ``total_amount`` and ``transaction_type`` from the entries."""
+        Transaction.objects.filter(pk=self.pk).refresh_totals()
+        self.refresh_from_db(fields=['total_amount', 'transaction_type'])
+
     @property
     def total_debit(self):
         """Sum of all debit entries for this transaction"""
+        if hasattr(self, 'annotated_debit'):
+            # SQLite drops the scale of computed decimals
+            return Decimal(self.annotated_debit).quantize(CENTS)
         return sum(entry.debit for entry in self.entries.all())
 
     @property
     def total_credit(self):
         """Sum of all credit entries for this transaction"""
+        if hasattr(self, 'annotated_credit'):
+            return Decimal(self.annotated_credit).quantize(CENTS)
         return sum(entry.credit for entry in self.entries.all())
 
-    @property
-    def transaction_type(self):
-        """Determine transaction type based on accounts involved"""
-        entries = self.entries.select_related('account__category').all()
-        for entry in entries:
-            cat_type = entry.account.category.category_type
-            if cat_type == 'revenue' and entry.credit > 0:
-                return 'Income'
-            if cat_type == 'expense' and entry.debit > 0:
-                return 'Expense'
-        return 'Transfer'
-
     @property
     def amount(self):
         """Returns the transaction amount (debit total, which equals credit total)"""
-        return self.total_debit
+        return self.total_amount
 
     @property
     def is_income(self):
         """Check if this is an income transaction"""
-        return self.transaction_type == 'Income'
+        return self.transaction_type == 'income'
 
 class JournalEntry(models.Model):
     wagtail_reference_index_ignore = True
@@ -109,3 +191,209 @@ class JournalEntry(models.Model):
 
     def __str__(self):
         return f"{self.account.name}: Dr {self.debit} / Cr {self.credit}"
+
+    def clean(self):
+        if self.transaction_id:
+            AccountingPeriod.ensure_open(self.transaction.date)
+
+    class Meta:
+        # Account histories (general ledger, balances); Transaction's
+        # (date, transaction_type) index serves the date ranges
+        indexes = [models.Index(fields=['account', 'transaction'])]
+
+
+class AccountBalanceSnapshot(models.Model):
+    """Journal totals of one account for one month.
+
+    ``debit``/``credit`` hold the month's movement and ``closing_debit``/
+    ``closing_credit`` the running totals up to the end of the month, so a
+    balance is the closing totals of the latest earlier snapshot plus the
+    entries since. Rows are kept current by the ``JournalEntry`` and
+    ``Transaction`` signal handlers in ``accounting/signals.py`` and can be
+    rebuilt with ``manage.py rebuild_account_balances``.
+    """
+    wagtail_reference_index_ignore = True
+    account = models.ForeignKey(Account, on_delete=models.CASCADE, related_name='balance_snapshots')
+    period = models.DateField(help_text="First day of the month")
+    debit = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    credit = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    closing_debit = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    closing_credit = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.account} {self.period:%b %Y}"
+
+    class Meta:
+        unique_together = ['account', 'period']
+        ordering = ['account', 'period']
+        verbose_name = "Account Balance Snapshot"
+        verbose_name_plural = "Account Balance Snapshots"
+
+    @classmethod
+    def record_movement(cls, account_id, date, debit=0, credit=0):
+        """Add ``debit``/``credit`` (negative to reverse) to the account's balance on ``date``."""
+        if not debit and not credit:
+            return
+        period = period_start(date)
+        snapshots = cls.objects.filter(account_id=account_id)
+        now = timezone.now()
+        with transaction.atomic(savepoint=False):
+            if not snapshots.filter(period=period).update(
+                debit=F('debit') + debit, credit=F('credit') + credit, updated_at=now
+            ):
+                opening = snapshots.filter(period__lt=period).order_by('-period').values(
+                    'closing_debit', 'closing_credit'
+                ).first() or {}
+                try:
+                    with transaction.atomic():
+                        cls.objects.create(
+                            account_id=account_id, period=period, debit=debit, credit=credit, **opening
+                        )
+                except IntegrityError:
+                    # Created concurrently; add the movement to that row
+                    snapshots.filter(period=period).update(
+                        debit=F('debit') + debit, credit=F('credit') + credit, updated_at=now
+                    )
+            snapshots.filter(period__gte=period).update(
+                closing_debit=F('closing_debit') + debit,
+                closing_credit=F('closing_credit') + credit,
+                updated_at=now,
+            )
+
+
+class ClosedPeriodError(ValidationError):
+    """Raised when a ledger change falls into a closed accounting period."""
+
+
+class AccountingPeriod(models.Model):
+    """A month or fiscal year of the ledger that can be closed.
+
+    Closing (``accounting.periods.close_period``) stores every account's
+    balance at ``end_date`` in ``PeriodClosingBalance`` and locks the
+    period: transactions dated inside it can no longer be created, edited
+    or deleted until it is reopened.
+    """
+    wagtail_reference_index_ignore = True
+    PERIOD_TYPES = [
+        ('month', 'Month'),
+        ('fiscal_year', 'Fiscal Year'),
+    ]
+    STATUS_CHOICES = [
+        ('open', 'Open'),
+        ('closed', 'Closed'),
+    ]
+    name = models.CharField(max_length=100)
+    period_type = models.CharField(max_length=20, choices=PERIOD_TYPES, default='month')
+    start_date = models.DateField(help_text="First day of a month")
+    end_date = models.DateField(help_text="Last day of a month")
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='open', editable=False)
+    closed_at = models.DateTimeField(null=True, blank=True, editable=False)
+    closed_by = models.CharField(max_length=150, blank=True, editable=False)
+
+    def __str__(self):
+        return f"{self.name} ({self.get_status_display()})"
+
+    class Meta:
+        unique_together = ['start_date', 'end_date']
+        indexes = [models.Index(fields=['status', 'start_date', 'end_date'])]
+        ordering = ['-start_date']
+
+    def clean(self):
+        if self.start_date and self.start_date.day != 1:
+            raise ValidationError({'start_date': "A period starts on the first day of a month."})
+        if self.end_date and (self.end_date + datetime.timedelta(days=1)).day != 1:
+            raise ValidationError({'end_date': "A period ends on the last day of a month."})
+        if self.start_date and self.end_date and self.end_date < self.start_date:
+            raise ValidationError({'end_date': "The end date must not be before the start date."})
+        if self.pk and self.status == 'closed':
+            stored = AccountingPeriod.objects.filter(pk=self.pk).values_list('start_date', 'end_date').first()
+            if stored and stored != (self.start_date, self.end_date):
+                raise ValidationError("Reopen the period before changing its dates.")
+
+    @classmethod
+    def ensure_open(cls, *dates):
+        """Raise ``ClosedPeriodError`` if any of ``dates`` lies in a closed period (one query)."""
+        dates = [value for value in dates if value]
+        if not dates:
+            return
+        closed = (
+            cls.objects.filter(status='closed', start_date__lte=max(dates), end_date__gte=min(dates))
+            .values_list('name', 'start_date', 'end_date')
+        )
+        for name, start, end in closed:
+            for value in dates:
+                if start <= value <= end:
+                    raise ClosedPeriodError(
+                        f"{value:%d %b %Y} is in the closed accounting period {name}.", code='closed_period'
+                    )
+
+    @classmethod
+    def ensure_open_for(cls, transactions):
+        """Raise ``ClosedPeriodError`` if any of ``transactions`` (a queryset) is dated in a closed period (one query)."""
+        closed = cls.objects.filter(status='closed', start_date__lte=OuterRef('date'), end_date__gte=OuterRef('date'))
+        hit = (
+            transactions.order_by()
+            .annotate(closed_period=Subquery(closed.values('name')[:1]))
+            .exclude(closed_period=None)
+            .values_list('date', 'closed_period')[:1]
+        )
+        for value, name in hit:
+            raise ClosedPeriodError(
+                f"{value:%d %b %Y} is in the closed accounting period {name}.", code='closed_period'
+            )
+
+
+class PeriodClosingBalance(models.Model):
+    """An account's debit and credit totals at the end of a closed period."""
+    wagtail_reference_index_ignore = True
+    period = models.ForeignKey(AccountingPeriod, on_delete=models.CASCADE, related_name='closing_balances')
+    account = models.ForeignKey(Account, on_delete=models.CASCADE, related_name='period_closing_balances')
+    closing_debit = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    closing_credit = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    def __str__(self):
+        return f"{self.account} at {self.period.end_date}"
+
+    class Meta:
+        unique_together = ['period', 'account']
+
+
+class LedgerOutbox(models.Model):
+    """A source document waiting to be posted to the ledger.
+
+    Rows are written by the ``post_save`` handlers of the source models,
+    inside the caller's database transaction, and posted in batches by
+    ``accounting.outbox`` (right after commit, or by ``manage.py
+    drain_ledger_outbox``). ``(source, source_id)`` is unique, so a document
+    is posted at most once however often it is queued.
+    """
+    wagtail_reference_index_ignore = True
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('processing', 'Processing'),
+        ('posted', 'Posted'),
+        ('skipped', 'Skipped'),
+        ('failed', 'Failed'),
+    ]
+    source = models.CharField(max_length=50, help_text="Registered ledger source, e.g. 'donation'")
+    source_id = models.PositiveBigIntegerField()
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    attempts = models.PositiveSmallIntegerField(default=0)
+    error = models.TextField(blank=True)
+    claimed_by = models.CharField(max_length=32, blank=True)
+    claimed_at = models.DateTimeField(null=True, blank=True)
+    transaction = models.ForeignKey(
+        Transaction, null=True, blank=True, on_delete=models.SET_NULL, related_name='+'
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+    posted_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.source} #{self.source_id} ({self.get_status_display()})"
+
+    class Meta:
+        unique_together = ['source', 'source_id']
+        indexes = [models.Index(fields=['status', 'id'])]
+        verbose_name = "Ledger Outbox Entry"
+        verbose_name_plural = "Ledger Outbox"
@@ -0,0 +1,365 @@
+"""Transactional outbox for ledger posting.
+
+Saving a donation, expense, membership payment, billing payment or student
+fee payment no longer posts to the ledger in its ``post_save`` handler; it
+only queues a ``LedgerOutbox`` row for the document. Queued documents are
+posted in batches with ``LedgerPoster.post_many``:
+
+* right after the surrounding transaction commits, when
+  ``LEDGER_POST_ON_COMMIT`` is enabled (the default);
+* at the end of a ``batch_posting()`` block, for imports and batch jobs
+  that save many documents;
+* by ``manage.py drain_ledger_outbox``, which picks up everything else
+  (and is the only path when ``LEDGER_POST_ON_COMMIT`` is off).
+
+Rows are claimed with a conditional UPDATE, and a document's row is marked
+posted in the same database transaction that writes its ledger entries, so
+each document is posted exactly once.
+"""
+import logging
+import threading
+import uuid
+from collections import defaultdict
+from contextlib import contextmanager
+from datetime import timedelta
+
+from django.apps import apps
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Exists, OuterRef, Q
+from django.utils import timezone
+
+from .models import LedgerOutbox, Transaction
+from .posting import (
+    ASSET_RENTAL_REVENUE, CASH, DONATIONS_REVENUE, EDUCATION_BANK, EDUCATION_CASH, EDUCATION_FEES,
+    GENERAL_EXPENSES, MEMBERSHIP_DUES_REVENUE, LedgerPoster, Posting,
+)
+
+logger = logging.getLogger(__name__)
+
+# Processing rows older than this are assumed to belong to a dead drainer
+STALE_AFTER = timedelta(minutes=10)
+MAX_ATTEMPTS = 5
+DEFAULT_BATCH_SIZE = 200
+
+LEDGER_SOURCES = {}
+
+
+def register_source(source_class):
+    LEDGER_SOURCES[source_class.name] = source_class()
+    return source_class
+
+
+class LedgerSource:
+    """How one kind of document is posted. ``model`` is an ``app_label.ModelName`` string.
+
+    ``date_field`` is the document date posted as the transaction date, and
+    ``description_prefix`` starts the description of every posting, which is
+    how ``rebuild_ledger`` recognises postings made before the outbox existed.
+    """
+
+    name = None
+    model = None
+    date_field = "date"
+    description_prefix = None
+    select_related = ()
+
+    def get_model(self):
+        return apps.get_model(self.model)
+
+    def get_documents(self, ids):
+        return self.get_model().objects.select_related(*self.select_related).in_bulk(ids)
+
+    def posting(self, document):
+        """The ``Posting`` for a document, or None if it must not be posted."""
+        raise NotImplementedError
+
+    def posted_many(self, pairs):
+        """Called in the posting transaction with ``(document, transaction)`` pairs once posted."""
+
+    def linked_transactions(self, documents):
+        """Ids of ledger transactions the ``documents`` queryset records itself, besides the outbox."""
+        return Transaction.objects.none().values("pk")
+
+    def has_posting(self):
+        """Condition on the source model: the document has a ledger transaction."""
+        return Exists(LedgerOutbox.objects.filter(
+            source=self.name, source_id=OuterRef("pk"), transaction__isnull=False
+        ))
+
+
+@register_source
+class DonationSource(LedgerSource):
+    name = "donation"
+    model = "finance.Donation"
+    description_prefix = "Donation: "
+    select_related = ("member", "category")
+
+    def posting(self, donation):
+        # Debit Asset (Cash/Bank) - Assuming default "Main Cash" for now
+        return Posting(
+            date=donation.date,
+            description=f"Donation: {donation.member} ({donation.category})",
+            reference=donation.receipt_number,
+            amount=donation.amount,
+            debit=CASH,
+            credit=DONATIONS_REVENUE,
+        )
+
+
+@register_source
+class ExpenseSource(LedgerSource):
+    name = "expense"
+    model = "finance.Expense"
+    description_prefix = "Expense: "
+
+    def posting(self, expense):
+        return Posting(
+            date=expense.date,
+            description=f"Expense: {expense.description}",
+            reference=expense.receipt_number,
+            amount=expense.amount,
+            debit=GENERAL_EXPENSES,
+            credit=CASH,
+        )
+
+
+@register_source
+class MembershipPaymentSource(LedgerSource):
+    name = "membership_payment"
+    model = "membership.Payment"
+    date_field = "payment_date"
+    description_prefix = "Membership Dues Payment: "
+    select_related = ("member",)
+
+    def posting(self, payment):
+        return Posting(
+            date=payment.payment_date,
+            description=f"Membership Dues Payment: {payment.member}",
+            reference=payment.receipt_number,
+            amount=payment.amount,
+            debit=CASH,
+            credit=MEMBERSHIP_DUES_REVENUE,
+        )
+
+
+@register_source
+class BillingPaymentSource(LedgerSource):
+    name = "billing_payment"
+    model = "billing.BillingPayment"
+    date_field = "payment_date"
+    description_prefix = "Payment for Invoice "
+    select_related = ("invoice",)
+
+    def posting(self, payment):
+        invoice = payment.invoice
+        # Credit Revenue (Based on what was invoiced)
+        # In a full system, this would be more complex (Accounts Receivable vs Revenue)
+        # For simplicity, we credit the respective revenue account directly
+        if invoice.house_id:
+            revenue = MEMBERSHIP_DUES_REVENUE
+        elif invoice.shop_id:
+            revenue = ASSET_RENTAL_REVENUE
+        else:
+            revenue = DONATIONS_REVENUE
+        return Posting(
+            date=payment.payment_date,
+            description=f"Payment for Invoice {invoice.invoice_number}",
+            reference=payment.transaction_id or invoice.invoice_number,
+            amount=payment.amount,
+            debit=CASH,
+            credit=revenue,
+        )
+
+
+@register_source
+class StudentFeeSource(LedgerSource):
+    name = "student_fee"
+    model = "education.StudentFeePayment"
+    description_prefix = "Course Fee: "
+    select_related = ("enrollment__student", "enrollment__class_instance")
+
+    def posting(self, payment):
+        if payment.transaction_id:
+            return None
+        return Posting(
+            date=payment.date,
+            name=payment.enrollment.student.full_name,
+            description=f"Course Fee: {payment.enrollment.class_instance.name}",
+            reference=payment.reference_number or f"PAY-{payment.id}",
+            memo=payment.reference_number,
+            amount=payment.amount,
+            debit=EDUCATION_CASH if payment.payment_method == "cash" else EDUCATION_BANK,
+            credit=EDUCATION_FEES,
+        )
+
+    def linked_transactions(self, payments):
+        return payments.exclude(transaction=None).values("transaction_id")
+
+    def has_posting(self):
+        return super().has_posting() | Q(transaction__isnull=False)
+
+    def posted_many(self, pairs):
+        # bulk_update() so the fee payment's own post_save handler does not run again
+        payments = []
+        for payment, tx in pairs:
+            payment.transaction = tx
+            payments.append(payment)
+        self.get_model().objects.bulk_update(payments, ["transaction"])
+
+
+def _source_for(document):
+    label = document._meta.label
+    for source in LEDGER_SOURCES.values():
+        if source.model == label:
+            return source
+    raise ValueError(f"No ledger source registered for {label}")
+
+
+def post_on_commit_enabled():
+    return getattr(settings, "LEDGER_POST_ON_COMMIT", True)
+
+
+_local = threading.local()
+
+
+@contextmanager
+def batch_posting():
+    """Post every document queued inside the block as one batch when it ends.
+
+    Use around imports and batch jobs so documents are not posted one by
+    one; when ``LEDGER_POST_ON_COMMIT`` is off they are left to the drainer.
+    """
+    outer = getattr(_local, "batch", None)
+    if outer is not None:
+        yield
+        return
+    _local.batch = []
+    try:
+        yield
+    finally:
+        keys, _local.batch = _local.batch, None
+    if keys and post_on_commit_enabled():
+        transaction.on_commit(lambda: post_documents(keys))
+
+
+def enqueue_ledger_posting(document):
+    """Queue ``document`` for posting; a document already in the outbox is left alone."""
+    source = _source_for(document)
+    LedgerOutbox.objects.bulk_create(
+        [LedgerOutbox(source=source.name, source_id=document.pk)], ignore_conflicts=True
+    )
+    key = (source.name, document.pk)
+    batch = getattr(_local, "batch", None)
+    if batch is not None:
+        batch.append(key)
+    elif post_on_commit_enabled():
+        transaction.on_commit(lambda: post_documents([key]))
+
+
+def _claim(queryset, limit=None):
+    """Mark pending rows of ``queryset`` as processing by this caller and return them."""
+    token = uuid.uuid4().hex
+    ids = queryset.filter(status="pending").order_by("pk").values_list("pk", flat=True)
+    if limit:
+        ids = ids[:limit]
+    claimed = LedgerOutbox.objects.filter(pk__in=list(ids), status="pending").update(
+        status="processing", claimed_by=token, claimed_at=timezone.now()
+    )
+    if not claimed:
+        return []
+    return list(LedgerOutbox.objects.filter(claimed_by=token, status="processing").order_by("pk"))
+
+
+def _post_claimed(rows):
+    """Post claimed outbox rows in one transaction. Returns the number posted."""
+    documents = {}
+    for name in {row.source for row in rows}:
+        source = LEDGER_SOURCES[name]
+        ids = [row.source_id for row in rows if row.source == name]
+        documents[name] = source.get_documents(ids)
+
+    to_post, skipped = [], []
+    for row in rows:
+        source = LEDGER_SOURCES[row.source]
+        document = documents[row.source].get(row.source_id)
+        posting = source.posting(document) if document is not None else None
+        if posting is None:
+            skipped.append(row)
+        else:
+            to_post.append((row, source, document, posting))
+
+    now = timezone.now()
+    with transaction.atomic():
+        transactions = LedgerPoster().post_many(posting for _row, _source, _document, posting in to_post)
+        posted = defaultdict(list)
+        for (row, source, document, _posting), tx in zip(to_post, transactions):
+            posted[source].append((document, tx))
+            row.status, row.transaction, row.posted_at, row.error = "posted", tx, now, ""
+        for source, pairs in posted.items():
+            source.posted_many(pairs)
+        for row in skipped:
+            row.status, row.posted_at = "skipped", now
+        LedgerOutbox.objects.bulk_update(rows, ["status", "transaction", "posted_at", "error"])
+    return len(to_post)
+
+
+def _record_failure(row, error):
+    row.attempts += 1
+    row.error = str(error)
+    row.status = "failed" if row.attempts >= MAX_ATTEMPTS else "pending"
+    LedgerOutbox.objects.filter(pk=row.pk).update(
+        attempts=row.attempts, error=row.error, status=row.status, claimed_by=""
+    )
+
+
+def _post_rows(rows):
+    try:
+        return _post_claimed(rows)
+    except Exception as e:
+        if len(rows) == 1:
+            logger.error(f"Ledger posting of {rows[0]} failed: {e}", exc_info=True)
+            _record_failure(rows[0], e)
+            return 0
+    # Retry one by one so a single bad document does not hold back the batch
+    return sum(_post_rows([row]) for row in rows)
+
+
+def post_documents(keys):
+    """Post the queued documents given as ``(source, source_id)`` pairs, if still pending."""
+    posted = 0
+    by_source = {}
+    for name, source_id in keys:
+        by_source.setdefault(name, []).append(source_id)
+    for name, ids in by_source.items():
+        for start in range(0, len(ids), DEFAULT_BATCH_SIZE):
+            chunk = ids[start:start + DEFAULT_BATCH_SIZE]
+            rows = _claim(LedgerOutbox.objects.filter(source=name, source_id__in=chunk))
+            if rows:
+                posted += _post_rows(rows)
+    return posted
+
+
+def process_ledger_outbox(batch_size=DEFAULT_BATCH_SIZE, limit=None):
+    """Post pending outbox rows in batches until none are left (or ``limit`` rows were claimed).
+
+    Rows are taken in id order and each is tried at most once per call, so a
+    failing row waits for the next drain instead of being retried in a loop.
+    """
+    posted = claimed = last_id = 0
+    while limit is None or claimed < limit:
+        size = batch_size if limit is None else min(batch_size, limit - claimed)
+        rows = _claim(LedgerOutbox.objects.filter(pk__gt=last_id), size)
+        if not rows:
+            break
+        claimed += len(rows)
+        last_id = rows[-1].pk
+        posted += _post_rows(rows)
+    return posted
+
+
+def requeue_stale_outbox():
+    """Put rows left processing by a drainer that died back in the queue."""
+    return LedgerOutbox.objects.filter(
+        status="processing", claimed_at__lt=timezone.now() - STALE_AFTER
+    ).update(status="pending", claimed_by="")
@@ -0,0 +1,92 @@
+"""Closing and reopening accounting periods.
+
+``close_period`` refuses periods with unbalanced transactions, stores every
+account's debit and credit totals at the period end in
+``PeriodClosingBalance`` and marks the period closed. From then on the
+ledger signals and ``LedgerPoster`` reject any change dated inside it (see
+``AccountingPeriod.ensure_open``). Balance and report queries for later
+dates start from the last closed period's closing balances (see
+``accounting.balances``) and never read the snapshots before it. The
+``closed_period_drift`` integrity check compares those snapshots with the
+stored closing balances.
+
+Bulk deletes that have checked their transactions with
+``AccountingPeriod.ensure_open_for`` run inside ``period_lock_checked`` so
+the delete signals do not check every row again.
+"""
+import threading
+from contextlib import contextmanager
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.utils import timezone
+
+from .balances import account_balances
+from .integrity import unbalanced_transactions
+from .models import Account, AccountingPeriod, PeriodClosingBalance
+
+
+_lock = threading.local()
+
+
+def period_lock_skipped():
+    return getattr(_lock, "checked", False)
+
+
+@contextmanager
+def period_lock_checked():
+    """Skip the per-row closed-period check of the ledger delete signals inside the block.
+
+    Only for deletes whose dates the caller has already checked, e.g. with
+    ``AccountingPeriod.ensure_open_for``.
+    """
+    if period_lock_skipped():
+        yield
+        return
+    _lock.checked = True
+    try:
+        yield
+    finally:
+        _lock.checked = False
+
+
+def close_period(period, closed_by=""):
+    """Close ``period`` and store its closing balances. Returns the updated period."""
+    with transaction.atomic():
+        period = AccountingPeriod.objects.select_for_update().get(pk=period.pk)
+        if period.status == "closed":
+            raise ValidationError(f"{period.name} is already closed.")
+        unbalanced = unbalanced_transactions().filter(date__range=[period.start_date, period.end_date]).count()
+        if unbalanced:
+            raise ValidationError(
+                f"{period.name} has {unbalanced} unbalanced transactions; fix them before closing."
+            )
+
+        PeriodClosingBalance.objects.bulk_create([
+            PeriodClosingBalance(
+                period=period,
+                account=account,
+                closing_debit=account.debit_total,
+                closing_credit=account.credit_total,
+            )
+            for account in account_balances(period.end_date, Account.objects.all())
+        ])
+        period.status = "closed"
+        period.closed_at = timezone.now()
+        period.closed_by = closed_by
+        period.save(update_fields=["status", "closed_at", "closed_by"])
+    return period
+
+
+def reopen_period(period):
+    """Reopen a closed ``period`` so its transactions can be corrected."""
+    with transaction.atomic():
+        period = AccountingPeriod.objects.select_for_update().get(pk=period.pk)
+        if period.status != "closed":
+            raise ValidationError(f"{period.name} is not closed.")
+        period.closing_balances.all().delete()
+        period.status = "open"
+        period.closed_at = None
+        period.closed_by = ""
+        period.save(update_fields=["status", "closed_at", "closed_by"])
+    return period
@@ -0,0 +1,190 @@
+"""Posting documents (payments, donations, expenses) to the ledger.
+
+``LedgerPoster`` turns each ``Posting`` into a balanced two-leg
+``Transaction``. Accounts are described by ``LedgerAccount`` specs and
+resolved through a process-local cache that is cleared whenever an account
+or category is saved or deleted, and after migrate/flush (see
+``accounting/signals.py``). Lookups are
+only cached once the surrounding database transaction commits, so a
+rolled-back account creation never leaves a dangling id behind.
+
+Entries are written with one ``bulk_create``, which skips the
+``JournalEntry`` signals, so the poster fills in the stored transaction
+totals and the balance snapshots itself, and refuses dates in closed
+accounting periods. With a warm cache a posting costs the closed-period
+check, two INSERTs and the snapshot updates of its two accounts.
+"""
+from collections import defaultdict
+from decimal import Decimal
+from functools import partial
+
+from django.db import connection, transaction
+
+from .balances import CATEGORY_LABELS, balance_tracking_suspended
+from .models import (
+    CENTS, Account, AccountBalanceSnapshot, AccountCategory, AccountingPeriod, JournalEntry, Transaction,
+    period_start,
+)
+
+
+class LedgerAccount:
+    """An account posted to by code or, when ``aliases`` are given, by name.
+
+    Accounts matched by name are looked up among accounts of
+    ``category_type`` with any of the ``aliases``; if none exists the account
+    is created as ``name`` with ``code`` or the next free code after it.
+    """
+
+    def __init__(self, code, name, category_type, aliases=()):
+        self.code = code
+        self.name = name
+        self.category_type = category_type
+        self.aliases = tuple(aliases)
+
+    @property
+    def key(self):
+        return (self.code, self.name, self.category_type, self.aliases)
+
+    def __repr__(self):
+        return f"<LedgerAccount {self.code} {self.name}>"
+
+
+CASH = LedgerAccount("1001", "Main Cash", "asset")
+DONATIONS_REVENUE = LedgerAccount("4001", "Donations Revenue", "revenue")
+MEMBERSHIP_DUES_REVENUE = LedgerAccount("4002", "Membership Dues Revenue", "revenue")
+ASSET_RENTAL_REVENUE = LedgerAccount("4003", "Asset Rental Revenue", "revenue")
+GENERAL_EXPENSES = LedgerAccount("5001", "General Expenses", "expense")
+
+EDUCATION_CASH = LedgerAccount(
+    "1001", "Cash in Hand", "asset", aliases=("Cash in Hand", "Main Cash", "Petty Cash")
+)
+EDUCATION_BANK = LedgerAccount("1002", "Bank Account", "asset", aliases=("Bank Account",))
+EDUCATION_FEES = LedgerAccount(
+    "4001", "Education Fees", "revenue", aliases=("Education Fees", "Education Revenue")
+)
+
+
+class Posting:
+    """One document to post: ``amount`` debited to ``debit`` and credited to ``credit``."""
+
+    def __init__(self, date, description, amount, debit, credit, name="", reference="", memo=""):
+        self.date = date
+        self.description = description
+        self.amount = Decimal(str(amount)).quantize(CENTS)
+        self.debit = debit
+        self.credit = credit
+        self.name = name
+        self.reference = reference or ""
+        self.memo = memo or ""
+
+
+# LedgerAccount.key -> (account id, category type)
+_account_cache = {}
+
+
+def clear_account_cache(**kwargs):
+    _account_cache.clear()
+
+
+def _next_free_code(code):
+    taken = set(Account.objects.filter(code__startswith=code[:2]).values_list("code", flat=True))
+    candidate = int(code)
+    while str(candidate) in taken:
+        candidate += 1
+    return str(candidate)
+
+
+def _find_account(spec):
+    accounts = Account.objects.select_related("category")
+    if spec.aliases:
+        return (
+            accounts.filter(category__category_type=spec.category_type, name__in=spec.aliases)
+            .order_by("pk")
+            .first()
+        )
+    return accounts.filter(code=spec.code).first()
+
+
+def _create_account(spec):
+    category = (
+        AccountCategory.objects.filter(category_type=spec.category_type).order_by("pk").first()
+        or AccountCategory.objects.create(
+            name=CATEGORY_LABELS[spec.category_type], category_type=spec.category_type
+        )
+    )
+    return Account.objects.create(code=_next_free_code(spec.code), name=spec.name, category=category)
+
+
+def resolve_account(spec):
+    """``(account id, category type)`` for a ``LedgerAccount``, creating the account if needed."""
+    resolved = _account_cache.get(spec.key)
+    if resolved is None:
+        account = _find_account(spec) or _create_account(spec)
+        resolved = (account.pk, account.category.category_type)
+        transaction.on_commit(partial(_account_cache.__setitem__, spec.key, resolved))
+    return resolved
+
+
+def _transaction_type(amount, debit_type, credit_type):
+    # Same rule as the stored Transaction.transaction_type: the debit leg is
+    # written first, so an expense debit wins over a revenue credit.
+    if amount > 0 and debit_type == "expense":
+        return "expense"
+    if amount > 0 and credit_type == "revenue":
+        return "income"
+    return "transfer"
+
+
+class LedgerPoster:
+    def post(self, posting):
+        """Post a single document and return its ``Transaction``."""
+        return self.post_many([posting])[0]
+
+    def post_many(self, postings):
+        """Post several documents in one batch and return their transactions, in order."""
+        postings = list(postings)
+        if not postings:
+            return []
+
+        with transaction.atomic():
+            accounts = [(resolve_account(p.debit), resolve_account(p.credit)) for p in postings]
+            transactions = self._create_transactions([
+                Transaction(
+                    date=posting.date,
+                    name=posting.name,
+                    description=posting.description,
+                    reference=posting.reference,
+                    total_amount=posting.amount,
+                    transaction_type=_transaction_type(posting.amount, debit[1], credit[1]),
+                )
+                for posting, (debit, credit) in zip(postings, accounts)
+            ])
+
+            entries = []
+            movements = defaultdict(lambda: [Decimal("0.00"), Decimal("0.00")])
+            for tx, posting, ((debit_id, _), (credit_id, _)) in zip(transactions, postings, accounts):
+                entries.append(JournalEntry(
+                    transaction=tx, account_id=debit_id, debit=posting.amount, memo=posting.memo
+                ))
+                entries.append(JournalEntry(
+                    transaction=tx, account_id=credit_id, credit=posting.amount, memo=posting.memo
+                ))
+                period = period_start(tx.date)
+                movements[(debit_id, period)][0] += posting.amount
+                movements[(credit_id, period)][1] += posting.amount
+            JournalEntry.objects.bulk_create(entries)
+
+            if not balance_tracking_suspended():
+                for (account_id, period), (debit, credit) in movements.items():
+                    AccountBalanceSnapshot.record_movement(account_id, period, debit, credit)
+        return transactions
+
+    def _create_transactions(self, transactions):
+        if len(transactions) > 1 and connection.features.can_return_rows_from_bulk_insert:
+            # bulk_create skips the closed-period check of the pre_save signal
+            AccountingPeriod.ensure_open(*{tx.date for tx in transactions})
+            return Transaction.objects.bulk_create(transactions)
+        # Backends that cannot return ids from a bulk insert (MySQL) save one by one
+        for tx in transactions:
+            tx.save()
+        return transactions
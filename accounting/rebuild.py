@@ -0,0 +1,115 @@
+"""Reposting source documents to the ledger.
+
+Saving a document only queues its first posting, so later corrections (an
+edited donation amount, a fixed date) never reach the ledger by themselves.
+``rebuild_ledger`` deletes the ledger transactions of the source documents
+in a date window and posts the documents again from their current values.
+
+Documents are streamed with ``.iterator()`` in a fixed order (source, date,
+id) and posted with ``LedgerPoster.post_many`` one batch at a time, with the
+journal signals suspended; the balance snapshots are rebuilt once at the end.
+The whole rebuild runs in one database transaction.
+"""
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .balances import suspended_balance_tracking
+from .models import AccountingPeriod, LedgerOutbox, Transaction
+from .outbox import LEDGER_SOURCES
+from .periods import period_lock_checked
+from .posting import LedgerPoster
+
+DEFAULT_BATCH_SIZE = 500
+
+
+def _in_window(queryset, date_field, start, end):
+    if start:
+        queryset = queryset.filter(**{f"{date_field}__gte": start})
+    if end:
+        queryset = queryset.filter(**{f"{date_field}__lte": end})
+    return queryset
+
+
+def _delete_postings(source, documents, start, end, replace_legacy):
+    """Delete the ledger transactions and outbox rows of ``documents``. Returns the number of transactions."""
+    outbox = LedgerOutbox.objects.filter(source=source.name, source_id__in=documents.values("pk"))
+    # Postings of documents deleted since, dated in the window
+    orphaned = _in_window(
+        LedgerOutbox.objects.filter(source=source.name)
+        .exclude(source_id__in=source.get_model().objects.values("pk"))
+        .exclude(transaction=None),
+        "transaction__date", start, end,
+    )
+    condition = (
+        Q(pk__in=outbox.exclude(transaction=None).values("transaction_id"))
+        | Q(pk__in=orphaned.values("transaction_id"))
+        | Q(pk__in=source.linked_transactions(documents))
+    )
+    if replace_legacy and source.description_prefix:
+        # Postings made by the old signal handlers have no outbox row to link them
+        legacy = Transaction.objects.filter(description__startswith=source.description_prefix).exclude(
+            pk__in=LedgerOutbox.objects.exclude(transaction=None).values("transaction_id")
+        )
+        condition |= Q(pk__in=_in_window(legacy, "date", start, end).values("pk"))
+
+    orphaned_ids = list(orphaned.values_list("pk", flat=True))
+    transactions = Transaction.objects.filter(condition)
+    AccountingPeriod.ensure_open_for(transactions)
+    deleted = transactions.count()
+    # Checked above for the whole set, not again per row by the delete signals
+    with period_lock_checked():
+        transactions.delete()
+    LedgerOutbox.objects.filter(pk__in=[*outbox.values_list("pk", flat=True), *orphaned_ids]).delete()
+    return deleted
+
+
+def _post_batch(source, documents, poster):
+    now = timezone.now()
+    to_post, rows = [], []
+    for document in documents:
+        posting = source.posting(document)
+        if posting is None:
+            rows.append(LedgerOutbox(source=source.name, source_id=document.pk, status="skipped", posted_at=now))
+        else:
+            to_post.append((document, posting))
+
+    transactions = poster.post_many(posting for _document, posting in to_post)
+    pairs = [(document, tx) for (document, _posting), tx in zip(to_post, transactions)]
+    source.posted_many(pairs)
+    rows.extend(
+        LedgerOutbox(source=source.name, source_id=document.pk, status="posted", transaction=tx, posted_at=now)
+        for document, tx in pairs
+    )
+    LedgerOutbox.objects.bulk_create(rows)
+    return len(pairs)
+
+
+def rebuild_ledger(start=None, end=None, sources=None, batch_size=DEFAULT_BATCH_SIZE, replace_legacy=False):
+    """Repost the source documents dated between ``start`` and ``end`` (inclusive, either optional).
+
+    ``sources`` limits the rebuild to the named ledger sources. With
+    ``replace_legacy``, transactions in the window that no outbox row links
+    to but whose description starts like a source's postings are deleted too.
+    Returns ``{source name: (transactions deleted, documents posted)}``.
+    """
+    selected = [LEDGER_SOURCES[name] for name in sources] if sources else list(LEDGER_SOURCES.values())
+    poster = LedgerPoster()
+    results = {}
+    with transaction.atomic(), suspended_balance_tracking():
+        for source in selected:
+            documents = _in_window(source.get_model().objects.all(), source.date_field, start, end)
+            deleted = _delete_postings(source, documents, start, end, replace_legacy)
+
+            posted = 0
+            batch = []
+            ordered = documents.select_related(*source.select_related).order_by(source.date_field, "pk")
+            for document in ordered.iterator(chunk_size=batch_size):
+                batch.append(document)
+                if len(batch) == batch_size:
+                    posted += _post_batch(source, batch, poster)
+                    batch = []
+            if batch:
+                posted += _post_batch(source, batch, poster)
+            results[source.name] = (deleted, posted)
+    return results
@@ -0,0 +1,206 @@
+"""Financial statements over date ranges.
+
+``trial_balance``, ``income_statement`` and ``balance_sheet`` are built
+from ``period_balances`` / ``account_balances`` and cost one query each.
+``general_ledger`` pages through one account's journal lines with keyset
+pagination on ``(date, transaction id, entry id)``; the running balance is a
+window function over the page, started from the balance before the page,
+which is read from the monthly snapshots plus the lines of the cursor's day.
+"""
+from datetime import date as date_type, timedelta
+from decimal import Decimal
+
+from django.db.models import F, OuterRef, Q, Subquery, Sum, Value, Window
+from django.db.models.expressions import RowRange
+from django.db.models.functions import Coalesce
+
+from .balances import (
+    AMOUNT_FIELD, CATEGORY_LABELS, DEBIT_NORMAL_TYPES, ZERO, account_balances, normal_balance, period_balances,
+)
+from .models import CENTS, Account, JournalEntry
+
+GENERAL_LEDGER_PAGE_SIZE = 100
+
+
+def _amount(value):
+    # SQLite drops the scale of computed decimals
+    return Decimal(value or 0).quantize(CENTS)
+
+
+def trial_balance(start, end):
+    """Opening balance, period debits and credits and closing balance of every account.
+
+    Closing balances are split into debit and credit columns; their totals
+    are equal when the ledger balances. Accounts without any balance or
+    movement are left out.
+    """
+    rows = []
+    totals = {"period_debit": ZERO, "period_credit": ZERO, "closing_debit": ZERO, "closing_credit": ZERO}
+    for account in period_balances(start, end):
+        opening = _amount(account.opening_debit) - _amount(account.opening_credit)
+        period_debit = _amount(account.debit_total) - _amount(account.opening_debit)
+        period_credit = _amount(account.credit_total) - _amount(account.opening_credit)
+        closing = opening + period_debit - period_credit
+        if not (opening or period_debit or period_credit):
+            continue
+        row = {
+            "account": account,
+            "opening_balance": normal_balance(account.category.category_type, opening, ZERO),
+            "period_debit": period_debit,
+            "period_credit": period_credit,
+            "closing_debit": closing if closing > 0 else ZERO,
+            "closing_credit": -closing if closing < 0 else ZERO,
+        }
+        for key in totals:
+            totals[key] += row[key]
+        rows.append(row)
+    return {"rows": rows, **totals}
+
+
+def income_statement(start, end):
+    """Revenue and expense accounts with their net movement between ``start`` and ``end``."""
+    sections = {cat_type: {"label": CATEGORY_LABELS[cat_type], "accounts": [], "total": ZERO}
+                for cat_type in ("revenue", "expense")}
+    accounts = period_balances(start, end).filter(category__category_type__in=list(sections))
+    for account in accounts:
+        cat_type = account.category.category_type
+        amount = normal_balance(
+            cat_type,
+            _amount(account.debit_total) - _amount(account.opening_debit),
+            _amount(account.credit_total) - _amount(account.opening_credit),
+        )
+        if amount:
+            sections[cat_type]["accounts"].append({"account": account, "amount": amount})
+            sections[cat_type]["total"] += amount
+    return {
+        "sections": list(sections.values()),
+        "revenue": sections["revenue"],
+        "expense": sections["expense"],
+        "net_income": sections["revenue"]["total"] - sections["expense"]["total"],
+    }
+
+
+def balance_sheet(as_of):
+    """Asset, liability and equity balances on ``as_of``.
+
+    Revenue less expenses to date is retained earnings, included in the
+    equity total, so total assets equal total liabilities and equity.
+    """
+    sections = {cat_type: {"label": CATEGORY_LABELS[cat_type], "accounts": [], "total": ZERO}
+                for cat_type in ("asset", "liability", "equity")}
+    earnings = ZERO
+    for account in account_balances(as_of):
+        cat_type = account.category.category_type
+        balance = normal_balance(cat_type, _amount(account.debit_total), _amount(account.credit_total))
+        if cat_type in sections:
+            if balance:
+                sections[cat_type]["accounts"].append({"account": account, "balance": balance})
+                sections[cat_type]["total"] += balance
+        elif cat_type == "revenue":
+            earnings += balance
+        else:
+            earnings -= balance
+    sections["equity"]["total"] += earnings
+    return {
+        "sections": list(sections.values()),
+        "asset": sections["asset"],
+        "liability": sections["liability"],
+        "equity": sections["equity"],
+        "retained_earnings": earnings,
+        "liabilities_and_equity": sections["liability"]["total"] + sections["equity"]["total"],
+    }
+
+
+def format_cursor(entry):
+    return f"{entry.entry_date.isoformat()}.{entry.transaction_id}.{entry.pk}"
+
+
+def parse_cursor(cursor):
+    """``(date, transaction id, entry id)`` from a general ledger cursor; raises ValueError."""
+    day, transaction_id, entry_id = cursor.split(".")
+    return date_type.fromisoformat(day), int(transaction_id), int(entry_id)
+
+
+def _after(cursor):
+    day, transaction_id, entry_id = cursor
+    return (
+        Q(transaction__date__gt=day)
+        | Q(transaction__date=day, transaction_id__gt=transaction_id)
+        | Q(transaction__date=day, transaction_id=transaction_id, pk__gt=entry_id)
+    )
+
+
+def general_ledger(account, start, end, after=None, page_size=GENERAL_LEDGER_PAGE_SIZE):
+    """One page of ``account``'s journal lines between ``start`` and ``end`` with running balances.
+
+    ``after`` is the ``next_cursor`` of the previous page (a string from
+    ``format_cursor``). Balances are in the account's normal direction.
+    Returns a dict of ``account``, ``opening_balance`` (before ``start``),
+    ``page_opening_balance``, ``entries`` and ``next_cursor`` (None on the
+    last page).
+    """
+    lines = JournalEntry.objects.filter(account=account)
+    if start:
+        lines = lines.filter(transaction__date__gte=start)
+    if end:
+        lines = lines.filter(transaction__date__lte=end)
+
+    opening = ZERO
+    if start:
+        totals = account_balances(start - timedelta(days=1), Account.objects.filter(pk=account.pk)).get()
+        opening = _amount(totals.debit_total) - _amount(totals.credit_total)
+    page_opening = opening
+    if after:
+        cursor = parse_cursor(after)
+        # Balance up to the cursor: the account total to the day before it,
+        # which starts from the monthly snapshot, plus that day's lines up to
+        # the cursor, so later pages do not re-read the earlier ones
+        same_day = (
+            JournalEntry.objects.filter(account=OuterRef("pk"), transaction__date=cursor[0])
+            .filter(~_after(cursor))
+            .order_by()
+            .values("account")
+            .annotate(net=Sum(F("debit") - F("credit"), output_field=AMOUNT_FIELD))
+            .values("net")
+        )
+        totals = (
+            account_balances(cursor[0] - timedelta(days=1), Account.objects.filter(pk=account.pk))
+            .annotate(same_day=Coalesce(Subquery(same_day[:1], output_field=AMOUNT_FIELD), Value(ZERO)))
+            .get()
+        )
+        page_opening = _amount(totals.debit_total) - _amount(totals.credit_total) + _amount(totals.same_day)
+        lines = lines.filter(_after(cursor))
+
+    order = [F("transaction__date").asc(), F("transaction_id").asc(), F("pk").asc()]
+    page = list(
+        lines.select_related("transaction")
+        .annotate(
+            entry_date=F("transaction__date"),
+            running=Window(
+                Sum(F("debit") - F("credit"), output_field=AMOUNT_FIELD),
+                order_by=order,
+                frame=RowRange(start=None, end=0),
+            ),
+        )
+        .order_by(*order)[:page_size + 1]
+    )
+    next_cursor = format_cursor(page[page_size - 1]) if len(page) > page_size else None
+
+    cat_type = account.category.category_type
+    sign = 1 if cat_type in DEBIT_NORMAL_TYPES else -1
+    entries = []
+    for entry in page[:page_size]:
+        entries.append({
+            "entry": entry,
+            "transaction": entry.transaction,
+            "debit": entry.debit,
+            "credit": entry.credit,
+            "balance": sign * (page_opening + _amount(entry.running)),
+        })
+    return {
+        "account": account,
+        "opening_balance": sign * opening,
+        "page_opening_balance": sign * page_opening,
+        "entries": entries,
+        "next_cursor": next_cursor,
+    }
@@ -1,58 +1,174 @@
-from django.db.models.signals import post_save
+from django.db.models import Sum
+from django.db.models.signals import post_delete, post_migrate, post_save, pre_delete, pre_save
 from django.dispatch import receiver
 from finance.models import Donation, Expense
 from membership.models import Payment as MemberPayment
 from billing.models import BillingPayment
-from .models import Transaction, JournalEntry, Account, AccountCategory, get_or_create_account
+from .models import (
+    Account, AccountBalanceSnapshot, AccountCategory, AccountingPeriod, JournalEntry, Transaction, period_start,
+)
+from .balances import balance_tracking_suspended
+from .outbox import enqueue_ledger_posting
+from .periods import period_lock_skipped
+from .posting import clear_account_cache
 
-@receiver(post_save, sender=Donation)
-def post_donation_to_ledger(sender, instance, created, **kwargs):
-    if created:
-        # 1. Create Transaction
-        tx = Transaction.objects.create(
-            date=instance.date,
-            description=f"Donation: {instance.member} ({instance.category})",
-            reference=instance.receipt_number
-        )
-        
-        # 2. Debit Asset (Cash/Bank) - Assuming default "Main Cash" for now
-        cash_account = get_or_create_account('1001', 'Main Cash', 'asset')
-        JournalEntry.objects.create(transaction=tx, account=cash_account, debit=instance.amount)
-        
-        # 3. Credit Revenue (Donations)
-        donation_account = get_or_create_account('4001', 'Donations Revenue', 'revenue')
-        JournalEntry.objects.create(transaction=tx, account=donation_account, credit=instance.amount)
+# Ledger posting goes through the outbox: saving a document only queues it,
+# and accounting.outbox posts queued documents in batches.
 
+@receiver(post_save, sender=Donation)
 @receiver(post_save, sender=Expense)
-def post_expense_to_ledger(sender, instance, created, **kwargs):
-    if created:
-        tx = Transaction.objects.create(
-            date=instance.date,
-            description=f"Expense: {instance.description}",
-            reference=instance.receipt_number
-        )
-        
-        # 1. Debit Expense
-        expense_account = get_or_create_account('5001', 'General Expenses', 'expense')
-        JournalEntry.objects.create(transaction=tx, account=expense_account, debit=instance.amount)
-        
-        # 2. Credit Asset (Cash/Bank)
-        cash_account = get_or_create_account('1001', 'Main Cash', 'asset')
-        JournalEntry.objects.create(transaction=tx, account=cash_account, credit=instance.amount)
-
 @receiver(post_save, sender=MemberPayment)
-def post_membership_payment_to_ledger(sender, instance, created, **kwargs):
+@receiver(post_save, sender=BillingPayment)
+def queue_ledger_posting(sender, instance, created, **kwargs):
     if created:
-        tx = Transaction.objects.create(
-            date=instance.payment_date,
-            description=f"Membership Dues Payment: {instance.member}",
-            reference=instance.receipt_number
+        enqueue_ledger_posting(instance)
+
+
+@receiver([post_save, post_delete], sender=Account)
+@receiver([post_save, post_delete], sender=AccountCategory)
+def invalidate_ledger_account_cache(sender, **kwargs):
+    clear_account_cache()
+
+
+# migrate and flush (which also runs between TransactionTestCase tests)
+# can remove accounts without sending delete signals
+post_migrate.connect(clear_account_cache, dispatch_uid="accounting_clear_account_cache")
+
+
+# Closed accounting periods are read-only: nothing dated inside one may be
+# saved or deleted. LedgerPoster checks its bulk inserts itself, and bulk
+# deletes check their queryset once and skip the per-row delete checks
+# (accounting.periods.period_lock_checked).
+
+def _stored_transaction_date(pk):
+    return Transaction.objects.filter(pk=pk).values_list('date', flat=True).first()
+
+
+@receiver(pre_save, sender=Transaction)
+def lock_closed_period_transaction(sender, instance, **kwargs):
+    AccountingPeriod.ensure_open(instance.date, _stored_transaction_date(instance.pk) if instance.pk else None)
+
+
+@receiver(pre_delete, sender=Transaction)
+def lock_closed_period_transaction_delete(sender, instance, **kwargs):
+    if period_lock_skipped():
+        return
+    AccountingPeriod.ensure_open(_stored_transaction_date(instance.pk))
+
+
+@receiver(pre_save, sender=JournalEntry)
+def lock_closed_period_entry(sender, instance, **kwargs):
+    dates = [instance.transaction.date]
+    if instance.pk:
+        # The entry may be moved out of another transaction
+        dates.append(
+            JournalEntry.objects.filter(pk=instance.pk).values_list('transaction__date', flat=True).first()
         )
-        
-        # 1. Debit Asset (Cash)
-        cash_account = get_or_create_account('1001', 'Main Cash', 'asset')
-        JournalEntry.objects.create(transaction=tx, account=cash_account, debit=instance.amount)
-        
-        # 2. Credit Revenue (Membership Dues)
-        dues_account = get_or_create_account('4002', 'Membership Dues Revenue', 'revenue')
-        JournalEntry.objects.create(transaction=tx, account=dues_account, credit=instance.amount)
+    AccountingPeriod.ensure_open(*dates)
+
+
+@receiver(pre_delete, sender=JournalEntry)
+def lock_closed_period_entry_delete(sender, instance, **kwargs):
+    if period_lock_skipped():
+        return
+    AccountingPeriod.ensure_open(
+        JournalEntry.objects.filter(pk=instance.pk).values_list('transaction__date', flat=True).first()
+    )
+
+
+# Balance snapshots: every change to a journal line is applied to the
+# AccountBalanceSnapshot of its account and month as a delta, except inside
+# suspended_balance_tracking(), which rebuilds the snapshots afterwards.
+
+def _stored_entry(pk):
+    """(transaction_id, account_id, date, debit, credit) of a journal entry as currently saved"""
+    return JournalEntry.objects.filter(pk=pk).values_list(
+        'transaction_id', 'account_id', 'transaction__date', 'debit', 'credit'
+    ).first()
+
+
+@receiver(pre_save, sender=JournalEntry)
+def remember_entry_balance(sender, instance, **kwargs):
+    if balance_tracking_suspended():
+        return
+    instance._balance_previous = _stored_entry(instance.pk) if instance.pk else None
+
+
+@receiver(post_save, sender=JournalEntry)
+def update_balance_on_entry_save(sender, instance, **kwargs):
+    if balance_tracking_suspended():
+        return
+    previous = getattr(instance, '_balance_previous', None)
+    if previous:
+        _transaction_id, account_id, date, debit, credit = previous
+        AccountBalanceSnapshot.record_movement(account_id, date, -debit, -credit)
+    AccountBalanceSnapshot.record_movement(
+        instance.account_id, instance.transaction.date, instance.debit, instance.credit
+    )
+
+
+@receiver(pre_delete, sender=JournalEntry)
+def remember_deleted_entry_balance(sender, instance, **kwargs):
+    if balance_tracking_suspended():
+        return
+    # Read now: when the whole transaction is being deleted its row may be
+    # gone by the time post_delete runs.
+    instance._balance_previous = _stored_entry(instance.pk)
+
+
+@receiver(post_delete, sender=JournalEntry)
+def update_balance_on_entry_delete(sender, instance, **kwargs):
+    if balance_tracking_suspended():
+        return
+    previous = getattr(instance, '_balance_previous', None)
+    if previous:
+        _transaction_id, account_id, date, debit, credit = previous
+        AccountBalanceSnapshot.record_movement(account_id, date, -debit, -credit)
+
+
+@receiver(pre_save, sender=Transaction)
+def remember_transaction_date(sender, instance, **kwargs):
+    if balance_tracking_suspended():
+        return
+    instance._balance_previous_date = _stored_transaction_date(instance.pk) if instance.pk else None
+
+
+@receiver(post_save, sender=Transaction)
+def move_balance_on_date_change(sender, instance, **kwargs):
+    """Move the transaction's entries to the new month when its date changes month."""
+    if balance_tracking_suspended():
+        return
+    previous = getattr(instance, '_balance_previous_date', None)
+    if not previous or period_start(previous) == period_start(instance.date):
+        return
+    totals = (
+        instance.entries.order_by()
+        .values('account_id')
+        .annotate(debit=Sum('debit'), credit=Sum('credit'))
+    )
+    for row in totals:
+        AccountBalanceSnapshot.record_movement(row['account_id'], previous, -row['debit'], -row['credit'])
+        AccountBalanceSnapshot.record_movement(row['account_id'], instance.date, row['debit'], row['credit'])
+
+
+# Transaction.total_amount and transaction_type follow the entries.
+
+@receiver(post_save, sender=JournalEntry)
+def update_transaction_totals_on_entry_save(sender, instance, **kwargs):
+    if balance_tracking_suspended():
+        return
+    previous = getattr(instance, '_balance_previous', None)
+    transaction_ids = {instance.transaction_id}
+    if previous:
+        # The entry may have been moved from another transaction
+        transaction_ids.add(previous[0])
+    Transaction.objects.filter(pk__in=transaction_ids).refresh_totals()
+    if JournalEntry.transaction.is_cached(instance):
+        instance.transaction.refresh_from_db(fields=['total_amount', 'transaction_type'])
+
+
+@receiver(post_delete, sender=JournalEntry)
+def update_transaction_totals_on_entry_delete(sender, instance, **kwargs):
+    if balance_tracking_suspended():
+        return
+    Transaction.objects.filter(pk=instance.transaction_id).refresh_totals()
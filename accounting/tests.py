@@ -0,0 +1,791 @@
+from datetime import date
+from decimal import Decimal
+from io import StringIO
+from unittest.mock import patch
+
+from django.contrib.auth.models import User
+from django.core.exceptions import ValidationError
+from django.core.management import CommandError, call_command
+from django.db import transaction
+from django.test import RequestFactory, TestCase, override_settings
+from django.urls import reverse
+from billing.models import Invoice
+from finance.models import Donation, Expense
+from membership.models import City, Country, HouseBalance, HouseRegistration, PostalCode, State, Taluk, Ward
+
+from accounting.balances import account_balances, get_chart_of_accounts, rebuild_balance_snapshots
+from accounting.integrity import closed_period_drift, integrity_checks, run_integrity_checks
+from accounting.models import (
+    Account, AccountBalanceSnapshot, AccountCategory, AccountingPeriod, ClosedPeriodError, JournalEntry, LedgerOutbox,
+    Transaction,
+)
+from accounting.outbox import MAX_ATTEMPTS, batch_posting, enqueue_ledger_posting, process_ledger_outbox
+from accounting.periods import close_period, reopen_period
+from accounting.rebuild import rebuild_ledger
+from accounting.reports import balance_sheet, general_ledger, income_statement, trial_balance
+from accounting.posting import (
+    CASH, DONATIONS_REVENUE, EDUCATION_CASH, EDUCATION_FEES, GENERAL_EXPENSES, LedgerPoster, Posting,
+    clear_account_cache,
+)
+
+
+def post_transaction(tx_date, debit_account, credit_account, amount, description="Test posting"):
+    """Create a balanced two-line transaction"""
+    tx = Transaction.objects.create(date=tx_date, description=description)
+    JournalEntry.objects.create(transaction=tx, account=debit_account, debit=amount)
+    JournalEntry.objects.create(transaction=tx, account=credit_account, credit=amount)
+    return tx
+
+
+class ChartOfAccountsTest(TestCase):
+    """Test cases for the chart of accounts balance service"""
+
+    def setUp(self):
+        self.assets = AccountCategory.objects.create(name="Assets", category_type="asset")
+        self.revenue = AccountCategory.objects.create(name="Revenue", category_type="revenue")
+        self.expenses = AccountCategory.objects.create(name="Expenses", category_type="expense")
+        self.cash = Account.objects.create(code="1001", name="Main Cash", category=self.assets)
+        self.donations = Account.objects.create(code="4001", name="Donations Revenue", category=self.revenue)
+        self.general = Account.objects.create(code="5001", name="General Expenses", category=self.expenses)
+
+        post_transaction(date(2024, 1, 10), self.cash, self.donations, Decimal("500.00"))
+        post_transaction(date(2024, 2, 10), self.cash, self.donations, Decimal("250.00"))
+        post_transaction(date(2024, 2, 15), self.general, self.cash, Decimal("100.00"))
+
+    def test_account_totals(self):
+        """Test that debit and credit totals are summed per account"""
+        totals = {a.code: (a.debit_total, a.credit_total) for a in account_balances()}
+        self.assertEqual(totals["1001"], (Decimal("750.00"), Decimal("100.00")))
+        self.assertEqual(totals["4001"], (Decimal("0.00"), Decimal("750.00")))
+        self.assertEqual(totals["5001"], (Decimal("100.00"), Decimal("0.00")))
+
+    def test_chart_balances_and_subtotals(self):
+        """Test normal balances and category subtotals"""
+        chart = get_chart_of_accounts()
+        self.assertEqual(list(chart), ["Assets", "Liabilities", "Equity", "Revenue", "Expenses"])
+        self.assertEqual(chart["Assets"]["total_balance"], Decimal("650.00"))
+        self.assertEqual(chart["Revenue"]["total_balance"], Decimal("750.00"))
+        self.assertEqual(chart["Revenue"]["credit_total"], Decimal("750.00"))
+        self.assertEqual(chart["Expenses"]["total_balance"], Decimal("100.00"))
+        self.assertEqual(chart["Liabilities"]["accounts"], [])
+
+    def test_as_of_date(self):
+        """Test that entries after the as_of date are ignored"""
+        chart = get_chart_of_accounts(as_of=date(2024, 1, 31))
+        self.assertEqual(chart["Assets"]["total_balance"], Decimal("500.00"))
+        self.assertEqual(chart["Expenses"]["accounts"][0]["balance"], Decimal("0.00"))
+
+    def test_inactive_accounts_excluded(self):
+        """Test that inactive accounts are left out of the chart"""
+        Account.objects.filter(pk=self.general.pk).update(is_active=False)
+        self.assertEqual(get_chart_of_accounts()["Expenses"]["accounts"], [])
+
+    def test_single_query(self):
+        """Test that the chart costs one query regardless of account count"""
+        for i in range(100):
+            account = Account.objects.create(code=f"6{i:03d}", name=f"Fund {i}", category=self.expenses)
+            post_transaction(date(2024, 3, 1), account, self.cash, Decimal("1.00"))
+        with self.assertNumQueries(1):
+            chart = get_chart_of_accounts()
+        self.assertEqual(len(chart["Expenses"]["accounts"]), 101)
+        with self.assertNumQueries(1):
+            get_chart_of_accounts(as_of=date(2024, 2, 29))
+
+    def test_view(self):
+        """Test the chart of accounts view with an as_of filter"""
+        User.objects.create_user(username="accountant", password="password")
+        self.client.login(username="accountant", password="password")
+        response = self.client.get(reverse("accounting:chart_of_accounts"), {"as_of": "2024-01-31"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context["as_of"], date(2024, 1, 31))
+        self.assertEqual(
+            response.context["accounts_by_category"]["Assets"]["total_balance"], Decimal("500.00")
+        )
+
+
+class AccountBalanceSnapshotTest(TestCase):
+    """Test cases for the per-account monthly balance snapshots"""
+
+    def setUp(self):
+        assets = AccountCategory.objects.create(name="Assets", category_type="asset")
+        revenue = AccountCategory.objects.create(name="Revenue", category_type="revenue")
+        self.cash = Account.objects.create(code="1001", name="Main Cash", category=assets)
+        self.bank = Account.objects.create(code="1002", name="Bank Account", category=assets)
+        self.donations = Account.objects.create(code="4001", name="Donations Revenue", category=revenue)
+
+        self.january = post_transaction(date(2024, 1, 5), self.cash, self.donations, Decimal("100.00"))
+        self.march = post_transaction(date(2024, 3, 5), self.cash, self.donations, Decimal("40.00"))
+
+    def snapshots(self, account):
+        return list(
+            AccountBalanceSnapshot.objects.filter(account=account).values_list(
+                "period", "debit", "credit", "closing_debit", "closing_credit"
+            )
+        )
+
+    def assertMatchesRebuild(self):
+        # Months whose entries were all removed keep an empty row; the rebuild drops them
+        incremental = list(AccountBalanceSnapshot.objects.exclude(debit=0, credit=0).values_list(
+            "account_id", "period", "debit", "credit", "closing_debit", "closing_credit"
+        ))
+        rebuild_balance_snapshots()
+        rebuilt = list(AccountBalanceSnapshot.objects.values_list(
+            "account_id", "period", "debit", "credit", "closing_debit", "closing_credit"
+        ))
+        self.assertEqual(incremental, rebuilt)
+
+    def test_entries_update_snapshots(self):
+        """Test that new entries record the month's movement and running totals"""
+        self.assertEqual(self.snapshots(self.cash), [
+            (date(2024, 1, 1), Decimal("100.00"), Decimal("0.00"), Decimal("100.00"), Decimal("0.00")),
+            (date(2024, 3, 1), Decimal("40.00"), Decimal("0.00"), Decimal("140.00"), Decimal("0.00")),
+        ])
+
+    def test_backdated_entry_updates_later_months(self):
+        """Test that an entry in an earlier month carries into later closing totals"""
+        post_transaction(date(2024, 2, 10), self.cash, self.donations, Decimal("10.00"))
+        self.assertEqual(
+            [row[3] for row in self.snapshots(self.cash)],
+            [Decimal("100.00"), Decimal("110.00"), Decimal("150.00")],
+        )
+        self.assertMatchesRebuild()
+
+    def test_entry_edit_and_delete(self):
+        """Test that editing and deleting entries reverse their old amounts"""
+        entry = self.january.entries.get(account=self.cash)
+        entry.debit = Decimal("70.00")
+        entry.account = self.bank
+        entry.save()
+        self.march.entries.get(account=self.donations).delete()
+
+        self.assertEqual(self.snapshots(self.bank)[0][3], Decimal("70.00"))
+        self.assertEqual(self.snapshots(self.cash)[-1][3], Decimal("40.00"))
+        self.assertEqual(self.snapshots(self.donations)[-1][4], Decimal("100.00"))
+        self.assertMatchesRebuild()
+
+    def test_transaction_date_and_delete(self):
+        """Test moving a transaction to another month and deleting it"""
+        self.march.date = date(2023, 12, 20)
+        self.march.save()
+        self.assertEqual(self.snapshots(self.cash)[0][:4], (
+            date(2023, 12, 1), Decimal("40.00"), Decimal("0.00"), Decimal("40.00"),
+        ))
+        self.assertMatchesRebuild()
+
+        self.january.delete()
+        self.assertEqual(self.snapshots(self.cash)[-1][3], Decimal("40.00"))
+        self.assertMatchesRebuild()
+
+    def test_balances_read_from_snapshots(self):
+        """Test that balances combine snapshots with entries of the as_of month"""
+        JournalEntry.objects.filter(transaction=self.january).update(debit=0, credit=0)
+        # Snapshots still hold January; only entries of the as_of month are read
+        totals = {a.code: a.debit_total for a in account_balances(as_of=date(2024, 3, 31))}
+        self.assertEqual(totals["1001"], Decimal("140.00"))
+
+        call_command("rebuild_account_balances", stdout=StringIO())
+        totals = {a.code: a.debit_total for a in account_balances()}
+        self.assertEqual(totals["1001"], Decimal("40.00"))
+
+
+class TransactionListingTest(TestCase):
+    """Test cases for the annotated ledger transaction listing"""
+
+    def setUp(self):
+        assets = AccountCategory.objects.create(name="Assets", category_type="asset")
+        revenue = AccountCategory.objects.create(name="Revenue", category_type="revenue")
+        expenses = AccountCategory.objects.create(name="Expenses", category_type="expense")
+        self.cash = Account.objects.create(code="1001", name="Main Cash", category=assets)
+        self.bank = Account.objects.create(code="1002", name="Bank Account", category=assets)
+        self.donations = Account.objects.create(code="4001", name="Donations Revenue", category=revenue)
+        self.general = Account.objects.create(code="5001", name="General Expenses", category=expenses)
+
+    def post_mixed(self, count):
+        for i in range(count):
+            kind = i % 3
+            if kind == 0:
+                post_transaction(date(2024, 1, 1), self.cash, self.donations, Decimal("10.00"))
+            elif kind == 1:
+                post_transaction(date(2024, 1, 2), self.general, self.cash, Decimal("5.00"))
+            else:
+                post_transaction(date(2024, 1, 3), self.bank, self.cash, Decimal("7.50"))
+
+    def test_annotated_totals(self):
+        """Test that annotated entry totals match the per-row properties"""
+        self.post_mixed(6)
+        plain = {tx.pk: (tx.total_debit, tx.total_credit) for tx in Transaction.objects.all()}
+        with self.assertNumQueries(1):
+            annotated = {tx.pk: (tx.total_debit, tx.total_credit) for tx in Transaction.objects.with_totals()}
+        self.assertEqual(annotated, plain)
+
+    def test_stored_type_and_amount(self):
+        """Test that total_amount and transaction_type follow entry changes"""
+        self.post_mixed(3)
+        self.assertEqual(
+            list(Transaction.objects.order_by("pk").values_list("transaction_type", "total_amount")),
+            [("income", Decimal("10.00")), ("expense", Decimal("5.00")), ("transfer", Decimal("7.50"))],
+        )
+
+        # The first matching entry decides a mixed transaction
+        mixed = Transaction.objects.create(date=date(2024, 1, 4), description="Mixed")
+        JournalEntry.objects.create(transaction=mixed, account=self.general, debit=Decimal("3.00"))
+        entry = JournalEntry.objects.create(transaction=mixed, account=self.donations, credit=Decimal("3.00"))
+        self.assertEqual((mixed.transaction_type, mixed.total_amount), ("expense", Decimal("3.00")))
+
+        entry.account = self.cash
+        entry.save()
+        JournalEntry.objects.filter(transaction=mixed, account=self.general).delete()
+        mixed.refresh_from_db()
+        self.assertEqual((mixed.transaction_type, mixed.total_amount), ("transfer", Decimal("0.00")))
+
+    def test_backfill_command(self):
+        """Test that the backfill command recomputes stored totals in batches"""
+        self.post_mixed(5)
+        Transaction.objects.update(transaction_type="transfer", total_amount=0)
+        call_command("backfill_transaction_totals", batch_size=2, stdout=StringIO())
+        self.assertEqual(
+            Transaction.objects.filter(date=date(2024, 1, 1)).values_list("transaction_type", flat=True).distinct().get(),
+            "income",
+        )
+        self.assertEqual(Transaction.objects.filter(total_amount=0).count(), 0)
+
+    def test_admin_list_query_count(self):
+        """Test that the ledger list columns for 100 rows come from one query"""
+        from accounting.wagtail_hooks import TransactionAdmin
+
+        self.post_mixed(100)
+        transaction_admin = TransactionAdmin()
+        request = RequestFactory().get("/")
+        request.user = User.objects.create_superuser(username="admin", password="password")
+
+        with self.assertNumQueries(1):
+            rows = [
+                (tx.date, tx.name, tx.description, tx.reference, tx.transaction_type,
+                 transaction_admin.colored_amount(tx))
+                for tx in transaction_admin.get_queryset(request)
+            ]
+        self.assertEqual(len(rows), 100)
+        income = [row for row in rows if row[4] == "income"]
+        self.assertEqual(len(income), 34)
+        self.assertIn("#28a745", income[0][5])
+        self.assertIn("₹10.00", income[0][5])
+
+
+class LedgerPosterTest(TestCase):
+    """Test cases for the centralized ledger posting service"""
+
+    def setUp(self):
+        clear_account_cache()
+        self.addCleanup(clear_account_cache)
+
+    def post(self, amount="100.00", debit=CASH, credit=DONATIONS_REVENUE, tx_date=date(2024, 5, 2)):
+        return LedgerPoster().post(Posting(
+            date=tx_date, description="Test", amount=Decimal(amount), debit=debit, credit=credit
+        ))
+
+    def test_post_creates_balanced_transaction(self):
+        """Test that a posting writes both legs, stored totals and snapshots"""
+        tx = self.post()
+        self.assertEqual(
+            sorted(tx.entries.values_list("account__code", "debit", "credit")),
+            [("1001", Decimal("100.00"), Decimal("0.00")), ("4001", Decimal("0.00"), Decimal("100.00"))],
+        )
+        tx.refresh_from_db()
+        self.assertEqual((tx.transaction_type, tx.total_amount), ("income", Decimal("100.00")))
+        self.assertEqual(
+            self.post(debit=GENERAL_EXPENSES, credit=CASH).transaction_type, "expense"
+        )
+        cash = Account.objects.get(code="1001")
+        self.assertEqual(cash.category.name, "Assets")
+        self.assertEqual(
+            account_balances(accounts=Account.objects.filter(pk=cash.pk)).get().credit_total,
+            Decimal("100.00"),
+        )
+
+    def test_cached_posting_query_count(self):
+        """Test that a posting with resolved accounts costs a fixed handful of queries"""
+        with self.captureOnCommitCallbacks(execute=True):
+            self.post()
+        # Closed-period check, transaction and entry INSERTs plus two snapshot
+        # UPDATEs per account, inside a savepoint because the test runs in a transaction
+        with self.assertNumQueries(9):
+            self.post()
+
+    def test_post_many(self):
+        """Test that a batch of postings is written in one pass"""
+        with self.captureOnCommitCallbacks(execute=True):
+            self.post()
+        postings = [
+            Posting(date=date(2024, 5, day), description=f"Batch {day}", amount=Decimal("10.00"),
+                    debit=CASH, credit=DONATIONS_REVENUE)
+            for day in range(1, 21)
+        ]
+        with self.assertNumQueries(9):
+            transactions = LedgerPoster().post_many(postings)
+        self.assertEqual(len(transactions), 20)
+        self.assertEqual(JournalEntry.objects.filter(transaction__in=transactions).count(), 40)
+        self.assertEqual(
+            AccountBalanceSnapshot.objects.get(account__code="1001", period=date(2024, 5, 1)).debit,
+            Decimal("300.00"),
+        )
+
+    def test_cache_cleared_on_account_save(self):
+        """Test that saving an account drops cached lookups"""
+        with self.captureOnCommitCallbacks(execute=True):
+            self.post()
+        Account.objects.filter(code="1001").update(code="1901")
+        with self.captureOnCommitCallbacks(execute=True):
+            Account.objects.create(
+                code="1001", name="New Cash", category=AccountCategory.objects.get(category_type="asset")
+            )
+        tx = self.post()
+        self.assertTrue(tx.entries.filter(account__name="New Cash").exists())
+
+    def test_alias_accounts(self):
+        """Test name-matched accounts and next free codes for new ones"""
+        assets = AccountCategory.objects.create(name="Current Assets", category_type="asset")
+        Account.objects.create(code="1001", name="Petty Cash", category=assets)
+        revenue = AccountCategory.objects.create(name="Revenue", category_type="revenue")
+        Account.objects.create(code="4001", name="Donations Revenue", category=revenue)
+
+        tx = self.post(debit=EDUCATION_CASH, credit=EDUCATION_FEES)
+        self.assertEqual(
+            sorted(tx.entries.values_list("account__code", "account__name")),
+            [("1001", "Petty Cash"), ("4002", "Education Fees")],
+        )
+
+
+class LedgerOutboxTest(TestCase):
+    """Test cases for queued ledger posting"""
+
+    def setUp(self):
+        clear_account_cache()
+        self.addCleanup(clear_account_cache)
+
+    def donate(self, amount="50.00"):
+        return Donation.objects.create(amount=Decimal(amount), date=date(2024, 6, 1), receipt_number="R-1")
+
+    def test_save_queues_and_commit_posts(self):
+        """Test that a saved document is queued and posted once its transaction commits"""
+        with self.captureOnCommitCallbacks(execute=True):
+            donation = self.donate()
+            row = LedgerOutbox.objects.get(source="donation", source_id=donation.pk)
+            self.assertEqual(row.status, "pending")
+            self.assertFalse(Transaction.objects.exists())
+
+        row.refresh_from_db()
+        self.assertEqual(row.status, "posted")
+        self.assertEqual(row.transaction.reference, "R-1")
+        self.assertEqual(
+            sorted(row.transaction.entries.values_list("account__code", "debit", "credit")),
+            [("1001", Decimal("50.00"), Decimal("0.00")), ("4001", Decimal("0.00"), Decimal("50.00"))],
+        )
+
+    @override_settings(LEDGER_POST_ON_COMMIT=False)
+    def test_drainer_posts_each_document_once(self):
+        """Test that draining posts queued documents in batches and never twice"""
+        with self.captureOnCommitCallbacks(execute=True):
+            for _ in range(5):
+                self.donate()
+            Expense.objects.create(amount=Decimal("20.00"), date=date(2024, 6, 2), description="Lamps")
+        self.assertFalse(Transaction.objects.exists())
+
+        self.assertEqual(process_ledger_outbox(batch_size=2), 6)
+        self.assertEqual(process_ledger_outbox(), 0)
+        self.assertEqual(Transaction.objects.count(), 6)
+        self.assertEqual(LedgerOutbox.objects.filter(status="posted").count(), 6)
+        self.assertEqual(Transaction.objects.filter(transaction_type="expense").count(), 1)
+
+        # Queuing an already posted document again is a no-op
+        enqueue_ledger_posting(Donation.objects.first())
+        self.assertEqual(process_ledger_outbox(), 0)
+        self.assertEqual(Transaction.objects.count(), 6)
+
+    def test_batch_posting(self):
+        """Test that documents queued in a batch block are posted together at the end"""
+        with self.captureOnCommitCallbacks(execute=True):
+            with batch_posting():
+                for _ in range(10):
+                    self.donate("5.00")
+            self.assertFalse(Transaction.objects.exists())
+        self.assertEqual(Transaction.objects.count(), 10)
+        self.assertEqual(
+            AccountBalanceSnapshot.objects.get(account__code="1001", period=date(2024, 6, 1)).debit,
+            Decimal("50.00"),
+        )
+
+    @override_settings(LEDGER_POST_ON_COMMIT=False)
+    def test_failures_do_not_block_the_batch(self):
+        """Test that failing rows are retried and given up on while the rest of the batch posts"""
+        donation = self.donate()
+        deleted = self.donate()
+        deleted_id = deleted.pk
+        deleted.delete()
+        broken = LedgerOutbox.objects.create(source="retired_source", source_id=1)
+
+        self.assertEqual(process_ledger_outbox(), 1)
+        statuses = dict(LedgerOutbox.objects.values_list("source_id", "status").filter(source="donation"))
+        self.assertEqual(statuses, {donation.pk: "posted", deleted_id: "skipped"})
+        broken.refresh_from_db()
+        self.assertEqual((broken.status, broken.attempts), ("pending", 1))
+        self.assertIn("retired_source", broken.error)
+
+        for _ in range(MAX_ATTEMPTS - 1):
+            process_ledger_outbox()
+        broken.refresh_from_db()
+        self.assertEqual((broken.status, broken.attempts), ("failed", MAX_ATTEMPTS))
+        self.assertEqual(Transaction.objects.count(), 1)
+
+    @override_settings(LEDGER_POST_ON_COMMIT=False)
+    def test_drain_command(self):
+        """Test that drain_ledger_outbox --once posts the queue"""
+        self.donate()
+        call_command("drain_ledger_outbox", "--once", "--workers", "1", stdout=StringIO())
+        self.assertEqual(LedgerOutbox.objects.get().status, "posted")
+        self.assertEqual(Transaction.objects.count(), 1)
+
+
+    def test_commands_keep_signals_connected(self):
+        """Test that the setup and invoice commands save with every post_save receiver connected"""
+        location = dict(
+            ward=Ward.objects.create(name="Ward 1"),
+            taluk=Taluk.objects.create(name="Taluk"),
+            city=City.objects.create(name="City"),
+            state=State.objects.create(name="State"),
+            country=Country.objects.create(name="Country"),
+            postal_code=PostalCode.objects.create(code="123456"),
+        )
+        house = HouseRegistration.objects.create(house_name="House 1", house_number="H-1", **location)
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command("setup_chart_of_accounts", stdout=StringIO())
+            call_command("generate_monthly_invoices", stdout=StringIO())
+
+        self.assertEqual(Invoice.objects.get(house=house).total_amount, Decimal("500.00"))
+        self.assertEqual(HouseBalance.objects.get(house=house).invoice_balance, Decimal("500.00"))
+        with self.captureOnCommitCallbacks(execute=True):
+            donation = self.donate()
+        self.assertEqual(LedgerOutbox.objects.get(source="donation", source_id=donation.pk).status, "posted")
+
+
+class LedgerRebuildTest(TestCase):
+    """Test cases for reposting source documents to the ledger"""
+
+    def setUp(self):
+        clear_account_cache()
+        self.addCleanup(clear_account_cache)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.may = [
+                Donation.objects.create(amount=Decimal("10.00"), date=date(2024, 5, day)) for day in (1, 2, 3)
+            ]
+            self.june = Expense.objects.create(amount=Decimal("7.00"), date=date(2024, 6, 1), description="Oil")
+
+    def cash_balance(self):
+        cash = Account.objects.filter(code="1001")
+        row = account_balances(accounts=cash).get()
+        return row.debit_total - row.credit_total
+
+    def test_rebuild_picks_up_corrections(self):
+        """Test that edited documents are reposted with their current values"""
+        self.assertEqual(self.cash_balance(), Decimal("23.00"))
+        Donation.objects.filter(pk=self.may[0].pk).update(amount=Decimal("25.00"))
+        self.may[1].delete()
+
+        results = rebuild_ledger(batch_size=2)
+        self.assertEqual(results["donation"], (3, 2))
+        self.assertEqual(results["expense"], (1, 1))
+        self.assertEqual(Transaction.objects.count(), 3)
+        self.assertEqual(self.cash_balance(), Decimal("28.00"))
+        row = LedgerOutbox.objects.get(source="donation", source_id=self.may[0].pk)
+        self.assertEqual((row.status, row.transaction.total_amount), ("posted", Decimal("25.00")))
+        self.assertFalse(LedgerOutbox.objects.filter(source="donation", source_id=self.may[1].pk).exists())
+
+    def test_date_window(self):
+        """Test that only documents in the window are reposted"""
+        june_tx = LedgerOutbox.objects.get(source="expense").transaction_id
+        Donation.objects.filter(pk=self.may[2].pk).update(amount=Decimal("1.00"))
+
+        call_command("rebuild_ledger", "--from", "2024-05-01", "--to", "2024-05-31",
+                     stdout=StringIO())
+        self.assertEqual(LedgerOutbox.objects.get(source="expense").transaction_id, june_tx)
+        self.assertEqual(self.cash_balance(), Decimal("14.00"))
+        self.assertEqual(
+            AccountBalanceSnapshot.objects.get(account__code="1001", period=date(2024, 6, 1)).closing_debit,
+            Decimal("21.00"),
+        )
+
+    def test_replace_legacy(self):
+        """Test that unlinked postings are only replaced when asked, and manual entries never"""
+        legacy = LedgerPoster().post(Posting(
+            date=date(2024, 5, 1), description="Donation: old", amount=Decimal("10.00"),
+            debit=CASH, credit=DONATIONS_REVENUE,
+        ))
+        manual = LedgerPoster().post(Posting(
+            date=date(2024, 5, 1), description="Opening float", amount=Decimal("100.00"),
+            debit=CASH, credit=DONATIONS_REVENUE,
+        ))
+
+        rebuild_ledger(sources=["donation"])
+        self.assertTrue(Transaction.objects.filter(pk=legacy.pk).exists())
+        rebuild_ledger(sources=["donation"], replace_legacy=True)
+        self.assertFalse(Transaction.objects.filter(pk=legacy.pk).exists())
+        self.assertTrue(Transaction.objects.filter(pk=manual.pk).exists())
+        self.assertEqual(self.cash_balance(), Decimal("123.00"))
+
+
+class LedgerIntegrityTest(TestCase):
+    """Test cases for the double-entry integrity checks"""
+
+    def setUp(self):
+        clear_account_cache()
+        self.addCleanup(clear_account_cache)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.donation = Donation.objects.create(amount=Decimal("10.00"), date=date(2024, 5, 1))
+        self.cash = Account.objects.get(code="1001")
+        self.revenue = Account.objects.get(code="4001")
+
+    def problems(self):
+        return {check.name: [row[0] for row in rows] for check, count, rows in run_integrity_checks() if count}
+
+    def test_clean_ledger(self):
+        """Test that a correctly posted ledger passes every check"""
+        self.assertEqual(self.problems(), {})
+        call_command("check_ledger_integrity", stdout=StringIO())
+
+    def test_unbalanced_and_orphaned(self):
+        """Test that unbalanced transactions and entries without a transaction are found"""
+        unbalanced = post_transaction(date(2024, 5, 2), self.cash, self.revenue, Decimal("5.00"))
+        JournalEntry.objects.create(transaction=unbalanced, account=self.cash, debit=Decimal("0.10"))
+        single = Transaction.objects.create(date=date(2024, 5, 3), description="Half done")
+        JournalEntry.objects.create(transaction=single, account=self.cash, debit=Decimal("0.00"))
+        # FK checks are deferred to commit, which never happens in a test
+        [orphan] = JournalEntry.objects.bulk_create(
+            [JournalEntry(transaction_id=999999, account=self.cash, debit=Decimal("1.00"))]
+        )
+        self.addCleanup(JournalEntry.objects.filter(transaction_id=999999).delete)
+
+        problems = self.problems()
+        self.assertEqual(problems["unbalanced_transactions"], [unbalanced.pk, single.pk])
+        self.assertEqual(problems["orphaned_entries"], [orphan.pk])
+        with self.assertRaises(CommandError):
+            call_command("check_ledger_integrity", stdout=StringIO())
+
+    @override_settings(LEDGER_POST_ON_COMMIT=False)
+    def test_unposted_documents(self):
+        """Test that documents are reported once they are neither posted nor queued"""
+        queued = Donation.objects.create(amount=Decimal("3.00"), date=date(2024, 5, 2))
+        lost = Donation.objects.create(amount=Decimal("4.00"), date=date(2024, 5, 3))
+        failed = Expense.objects.create(amount=Decimal("2.00"), date=date(2024, 5, 4), description="Broom")
+        LedgerOutbox.objects.filter(source="donation", source_id=lost.pk).delete()
+        LedgerOutbox.objects.filter(source="expense").update(status="failed")
+        LedgerOutbox.objects.get(source="donation", source_id=self.donation.pk).transaction.delete()
+
+        problems = self.problems()
+        self.assertEqual(problems["unposted_donation"], [self.donation.pk, lost.pk])
+        self.assertEqual(problems["unposted_expense"], [failed.pk])
+        self.assertNotIn(queued.pk, problems["unposted_donation"])
+
+    def test_each_check_is_one_query(self):
+        """Test that a check costs one query for its rows and one for the count"""
+        for check in integrity_checks():
+            with self.assertNumQueries(2):
+                check.run(limit=10)
+
+    def test_view(self):
+        """Test the ledger integrity report"""
+        User.objects.create_user(username="accountant", password="password")
+        self.client.login(username="accountant", password="password")
+        response = self.client.get(reverse("accounting:ledger_integrity"))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context["problem_count"], 0)
+
+
+class FinancialReportsTest(TestCase):
+    """Test cases for the trial balance, statements and general ledger"""
+
+    def setUp(self):
+        assets = AccountCategory.objects.create(name="Assets", category_type="asset")
+        liabilities = AccountCategory.objects.create(name="Liabilities", category_type="liability")
+        revenue = AccountCategory.objects.create(name="Revenue", category_type="revenue")
+        expenses = AccountCategory.objects.create(name="Expenses", category_type="expense")
+        self.cash = Account.objects.create(code="1001", name="Cash", category=assets)
+        self.loan = Account.objects.create(code="2001", name="Loan", category=liabilities)
+        self.donations = Account.objects.create(code="4001", name="Donations", category=revenue)
+        self.utilities = Account.objects.create(code="5001", name="Utilities", category=expenses)
+
+        post_transaction(date(2023, 12, 10), self.cash, self.loan, Decimal("1000.00"))
+        post_transaction(date(2023, 12, 20), self.cash, self.donations, Decimal("200.00"))
+        post_transaction(date(2024, 1, 5), self.cash, self.donations, Decimal("300.00"))
+        post_transaction(date(2024, 1, 15), self.utilities, self.cash, Decimal("120.00"))
+        post_transaction(date(2024, 2, 1), self.cash, self.donations, Decimal("50.00"))
+
+    def test_trial_balance(self):
+        """Test opening, period and closing columns for a date range"""
+        report = trial_balance(date(2024, 1, 1), date(2024, 1, 31))
+        rows = {row["account"].code: row for row in report["rows"]}
+        self.assertEqual(rows["1001"]["opening_balance"], Decimal("1200.00"))
+        self.assertEqual((rows["1001"]["period_debit"], rows["1001"]["period_credit"]),
+                         (Decimal("300.00"), Decimal("120.00")))
+        self.assertEqual(rows["1001"]["closing_debit"], Decimal("1380.00"))
+        self.assertEqual(rows["4001"]["opening_balance"], Decimal("200.00"))
+        self.assertEqual(rows["4001"]["closing_credit"], Decimal("500.00"))
+        self.assertEqual(report["closing_debit"], report["closing_credit"])
+        self.assertEqual(report["period_debit"], Decimal("420.00"))
+
+    def test_income_statement_and_balance_sheet(self):
+        """Test period income and that the balance sheet balances"""
+        statement = income_statement(date(2024, 1, 1), date(2024, 1, 31))
+        self.assertEqual(statement["revenue"]["total"], Decimal("300.00"))
+        self.assertEqual(statement["expense"]["total"], Decimal("120.00"))
+        self.assertEqual(statement["net_income"], Decimal("180.00"))
+
+        sheet = balance_sheet(date(2024, 1, 31))
+        self.assertEqual(sheet["asset"]["total"], Decimal("1380.00"))
+        self.assertEqual(sheet["retained_earnings"], Decimal("380.00"))
+        self.assertEqual(sheet["liabilities_and_equity"], sheet["asset"]["total"])
+
+    def test_general_ledger_pages(self):
+        """Test running balances carry across keyset pages at a fixed query cost"""
+        for day in range(1, 26):
+            post_transaction(date(2024, 3, day), self.cash, self.donations, Decimal("10.00"))
+
+        balances, after, pages = [], None, 0
+        while True:
+            with self.assertNumQueries(3 if after else 2):
+                page = general_ledger(self.cash, date(2024, 3, 1), date(2024, 3, 31), after=after, page_size=10)
+            pages += 1
+            self.assertEqual(page["opening_balance"], Decimal("1430.00"))
+            balances.extend(item["balance"] for item in page["entries"])
+            after = page["next_cursor"]
+            if after is None:
+                break
+        self.assertEqual(pages, 3)
+        self.assertEqual(balances, [Decimal("1430.00") + 10 * n for n in range(1, 26)])
+
+        revenue = general_ledger(self.donations, None, None)
+        self.assertEqual(revenue["entries"][-1]["balance"], Decimal("800.00"))
+
+    def test_general_ledger_cursor_inside_a_day(self):
+        """Test that a page ending partway through a day carries the balance of that day's earlier lines"""
+        for _ in range(3):
+            post_transaction(date(2024, 3, 10), self.cash, self.donations, Decimal("10.00"))
+
+        first = general_ledger(self.cash, date(2024, 3, 1), None, page_size=2)
+        second = general_ledger(self.cash, date(2024, 3, 1), None, after=first["next_cursor"], page_size=2)
+        self.assertEqual(second["page_opening_balance"], Decimal("1450.00"))
+        self.assertEqual([item["balance"] for item in second["entries"]], [Decimal("1460.00")])
+
+    def test_views(self):
+        """Test that the report views render"""
+        User.objects.create_user(username="accountant", password="password")
+        self.client.login(username="accountant", password="password")
+        for name in ("trial_balance", "income_statement"):
+            response = self.client.get(reverse(f"accounting:{name}"), {"from": "2024-01-01", "to": "2024-01-31"})
+            self.assertEqual(response.status_code, 200)
+        response = self.client.get(reverse("accounting:balance_sheet"), {"as_of": "2024-01-31"})
+        self.assertContains(response, "1380.00")
+        response = self.client.get(
+            reverse("accounting:general_ledger", args=[self.cash.pk]),
+            {"from": "2023-12-01", "to": "2024-12-31", "after": "bogus"},
+        )
+        self.assertEqual(len(response.context["ledger"]["entries"]), 5)
+
+
+class AccountingPeriodTest(TestCase):
+    """Test cases for closing accounting periods"""
+
+    def setUp(self):
+        clear_account_cache()
+        self.addCleanup(clear_account_cache)
+        assets = AccountCategory.objects.create(name="Assets", category_type="asset")
+        revenue = AccountCategory.objects.create(name="Revenue", category_type="revenue")
+        self.cash = Account.objects.create(code="1001", name="Main Cash", category=assets)
+        self.donations = Account.objects.create(code="4001", name="Donations Revenue", category=revenue)
+        self.january = post_transaction(date(2024, 1, 10), self.cash, self.donations, Decimal("100.00"))
+        self.period = AccountingPeriod.objects.create(
+            name="January 2024", start_date=date(2024, 1, 1), end_date=date(2024, 1, 31)
+        )
+
+    def test_close_stores_balances_and_locks(self):
+        """Test that closing stores closing balances and rejects changes dated in the period"""
+        close_period(self.period, closed_by="accountant")
+        self.period.refresh_from_db()
+        self.assertEqual(self.period.status, "closed")
+        self.assertEqual(
+            self.period.closing_balances.get(account=self.cash).closing_debit, Decimal("100.00")
+        )
+
+        posting = Posting(date=date(2024, 1, 20), description="Late", amount=Decimal("5.00"),
+                          debit=CASH, credit=DONATIONS_REVENUE)
+        with self.assertRaises(ClosedPeriodError):
+            LedgerPoster().post(posting)
+        with self.assertRaises(ClosedPeriodError):
+            Transaction.objects.create(date=date(2024, 1, 31), description="Backdated")
+        with self.assertRaises(ClosedPeriodError), transaction.atomic():
+            self.january.delete()
+        entry = self.january.entries.get(account=self.cash)
+        entry.debit = Decimal("1.00")
+        with self.assertRaises(ClosedPeriodError):
+            entry.save()
+        feb = post_transaction(date(2024, 2, 1), self.cash, self.donations, Decimal("10.00"))
+        feb.date = date(2024, 1, 15)
+        with self.assertRaises(ValidationError):
+            feb.full_clean()
+
+        self.assertEqual(list(closed_period_drift()), [])
+        reopen_period(self.period)
+        self.january.delete()
+        self.assertFalse(self.period.closing_balances.exists())
+
+    def test_close_requires_balanced_ledger(self):
+        """Test that a period with an unbalanced transaction cannot be closed"""
+        JournalEntry.objects.create(transaction=self.january, account=self.cash, debit=Decimal("1.00"))
+        with self.assertRaises(ValidationError):
+            close_period(self.period)
+        self.period.refresh_from_db()
+        self.assertEqual(self.period.status, "open")
+
+    def test_drift_and_command(self):
+        """Test the close command and that changed snapshots of closed periods are reported"""
+        call_command("close_accounting_period", "--from", "2024-01-01", "--to", "2024-01-31",
+                     stdout=StringIO())
+        self.assertEqual(AccountingPeriod.objects.get().status, "closed")
+        AccountBalanceSnapshot.objects.filter(account=self.cash).update(closing_debit=Decimal("90.00"))
+        self.assertEqual([row["account__code"] for row in closed_period_drift()], ["1001"])
+        with self.assertRaises(CommandError):
+            call_command("close_accounting_period", "--from", "2024-01-01", "--to", "2024-01-31",
+                         stdout=StringIO())
+
+    def test_balances_start_from_closed_period(self):
+        """Test that balances after a closed period start from its closing balances"""
+        close_period(self.period)
+        post_transaction(date(2024, 2, 10), self.cash, self.donations, Decimal("10.00"))
+        # Snapshots from before the close are no longer read
+        AccountBalanceSnapshot.objects.filter(account=self.cash, period=date(2024, 1, 1)).update(
+            closing_debit=Decimal("90.00")
+        )
+        cash = Account.objects.filter(pk=self.cash.pk)
+        for as_of in (date(2024, 2, 20), date(2024, 3, 15), None):
+            self.assertEqual(account_balances(as_of, cash).get().debit_total, Decimal("110.00"))
+
+    def test_rebuild_checks_closed_periods_once(self):
+        """Test that rebuilding the ledger checks the deleted transactions against closed periods in one query"""
+        clear_account_cache()
+        with self.captureOnCommitCallbacks(execute=True):
+            Donation.objects.create(amount=Decimal("10.00"), date=date(2024, 3, 1))
+            Donation.objects.create(amount=Decimal("10.00"), date=date(2024, 3, 2))
+        with patch.object(AccountingPeriod, "ensure_open", wraps=AccountingPeriod.ensure_open) as ensure_open:
+            rebuild_ledger(sources=["donation"])
+        # Only LedgerPoster's insert check; no per-row delete checks
+        self.assertEqual(ensure_open.call_count, 1)
+
+        AccountingPeriod.objects.create(name="March 2024", start_date=date(2024, 3, 1), end_date=date(2024, 3, 31))
+        close_period(AccountingPeriod.objects.get(name="March 2024"))
+        with self.assertRaises(ClosedPeriodError):
+            rebuild_ledger(sources=["donation"])
+        self.assertEqual(Transaction.objects.filter(date__month=3).count(), 2)
+
+    def test_period_must_cover_whole_months(self):
+        """Test that periods start and end on month boundaries"""
+        period = AccountingPeriod(name="Odd", start_date=date(2024, 3, 2), end_date=date(2024, 3, 31))
+        with self.assertRaises(ValidationError):
+            period.full_clean()
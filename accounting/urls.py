@@ -6,4 +6,9 @@ app_name = 'accounting'
 
 urlpatterns = [
     path('chart-of-accounts/', views.chart_of_accounts_view, name='chart_of_accounts'),
+    path('trial-balance/', views.trial_balance_view, name='trial_balance'),
+    path('income-statement/', views.income_statement_view, name='income_statement'),
+    path('balance-sheet/', views.balance_sheet_view, name='balance_sheet'),
+    path('general-ledger/<int:account_id>/', views.general_ledger_view, name='general_ledger'),
+    path('integrity/', views.ledger_integrity_view, name='ledger_integrity'),
 ]
@@ -1,59 +1,118 @@
 from django.contrib.auth.decorators import login_required
-from django.db.models import Sum
-from django.shortcuts import render
+from django.shortcuts import get_object_or_404, render
+from django.utils import timezone
+from django.utils.dateparse import parse_date
 
-from .models import Account, AccountCategory, JournalEntry
+from .balances import get_chart_of_accounts
+from .integrity import run_integrity_checks
+from .models import Account
+from .reports import balance_sheet, general_ledger, income_statement, parse_cursor, trial_balance
+
+
+def _date_param(request, name, default=None):
+    try:
+        return parse_date(request.GET.get(name, '')) or default
+    except ValueError:
+        return default
+
+
+def _date_range(request):
+    """``from``/``to`` query parameters, defaulting to the current year to date"""
+    today = timezone.localdate()
+    start = _date_param(request, 'from', today.replace(month=1, day=1))
+    end = _date_param(request, 'to', today)
+    return start, end
 
 
 @login_required
 def chart_of_accounts_view(request):
     """Display Chart of Accounts grouped by category type in tabular format"""
-    category_types = [
-        ('asset', 'Assets'),
-        ('liability', 'Liabilities'),
-        ('equity', 'Equity'),
-        ('revenue', 'Revenue'),
-        ('expense', 'Expenses'),
-    ]
-
-    accounts_by_category = {}
-
-    for cat_type, cat_label in category_types:
-        accounts = Account.objects.filter(
-            category__category_type=cat_type,
-            is_active=True
-        ).select_related('category').order_by('code')
-
-        accounts_with_balance = []
-        for account in accounts:
-            debit_total = JournalEntry.objects.filter(account=account).aggregate(
-                total=Sum('debit')
-            )['total'] or 0
-            credit_total = JournalEntry.objects.filter(account=account).aggregate(
-                total=Sum('credit')
-            )['total'] or 0
-
-            if cat_type in ('asset', 'expense'):
-                balance = debit_total - credit_total
-            else:
-                balance = credit_total - debit_total
-
-            accounts_with_balance.append({
-                'account': account,
-                'debit_total': debit_total,
-                'credit_total': credit_total,
-                'balance': balance,
-            })
-
-        accounts_by_category[cat_label] = {
-            'type': cat_type,
-            'accounts': accounts_with_balance,
-            'total_balance': sum(a['balance'] for a in accounts_with_balance),
-        }
+    try:
+        as_of = parse_date(request.GET.get('as_of', ''))
+    except ValueError:
+        as_of = None
 
     context = {
-        'accounts_by_category': accounts_by_category,
+        'accounts_by_category': get_chart_of_accounts(as_of=as_of),
+        'as_of': as_of,
         'page_title': 'Chart of Accounts',
     }
 
     return render(request, 'accounting/chart_of_accounts.html', context)
+
+
+@login_required
+def ledger_integrity_view(request):
+    """Report unbalanced transactions, orphaned journal entries and unposted documents"""
+    results = run_integrity_checks(limit=100)
+    context = {
+        'results': results,
+        'problem_count': sum(count for _check, count, _rows in results),
+        'page_title': 'Ledger Integrity',
+    }
+
+    return render(request, 'accounting/ledger_integrity.html', context)
+
+
+@login_required
+def trial_balance_view(request):
+    """Opening balances, period movements and closing balances of every account"""
+    start, end = _date_range(request)
+    context = {
+        'report': trial_balance(start, end),
+        'start': start,
+        'end': end,
+        'page_title': 'Trial Balance',
+    }
+
+    return render(request, 'accounting/trial_balance.html', context)
+
+
+@login_required
+def income_statement_view(request):
+    """Revenue, expenses and net income over a date range"""
+    start, end = _date_range(request)
+    context = {
+        'report': income_statement(start, end),
+        'start': start,
+        'end': end,
+        'page_title': 'Income Statement',
+    }
+
+    return render(request, 'accounting/income_statement.html', context)
+
+
+@login_required
+def balance_sheet_view(request):
+    """Assets, liabilities and equity on a date"""
+    as_of = _date_param(request, 'as_of', timezone.localdate())
+    context = {
+        'report': balance_sheet(as_of),
+        'as_of': as_of,
+        'page_title': 'Balance Sheet',
+    }
+
+    return render(request, 'accounting/balance_sheet.html', context)
+
+
+@login_required
+def general_ledger_view(request, account_id):
+    """Journal lines of one account with running balances, one page at a time"""
+    account = get_object_or_404(Account.objects.select_related('category'), pk=account_id)
+    start, end = _date_range(request)
+    after = request.GET.get('after') or None
+    if after:
+        try:
+            parse_cursor(after)
+        except ValueError:
+            after = None
+
+    context = {
+        'ledger': general_ledger(account, start, end, after=after),
+        'start': start,
+        'end': end,
+        'after': after,
+        'page_title': f'General Ledger: {account.code} {account.name}',
+    }
+
+    return render(request, 'accounting/general_ledger.html', context)
@@ -1,7 +1,7 @@
 from django.utils.html import format_html
 from wagtail.admin.panels import FieldPanel, FieldRowPanel, MultiFieldPanel
 from wagtail_modeladmin.options import ModelAdmin, modeladmin_register
-from .models import Account, AccountCategory, Transaction, JournalEntry
+from .models import Account, AccountCategory, AccountingPeriod, Transaction, JournalEntry
 
 
 class AccountCategoryAdmin(ModelAdmin):
@@ -78,7 +78,7 @@ class TransactionAdmin(ModelAdmin):
     menu_icon = 'transfer'
     list_display = ('date', 'name', 'description', 'reference', 'transaction_type', 'colored_amount')
     search_fields = ('name', 'description', 'reference')
-    list_filter = ('date',)
+    list_filter = ('date', 'transaction_type')
     add_to_admin_menu = False
     panels = [
         MultiFieldPanel(
@@ -117,6 +117,7 @@ class TransactionAdmin(ModelAdmin):
                 amount
             )
     colored_amount.short_description = 'Amount'
+    colored_amount.admin_order_field = 'total_amount'
 
 
 class JournalEntryAdmin(ModelAdmin):
@@ -156,7 +157,38 @@ class JournalEntryAdmin(ModelAdmin):
     ]
 
 
+class AccountingPeriodAdmin(ModelAdmin):
+    model = AccountingPeriod
+    menu_label = 'Accounting Periods'
+    menu_icon = 'date'
+    list_display = ('name', 'period_type', 'start_date', 'end_date', 'status', 'closed_at')
+    add_to_admin_menu = False
+    panels = [
+        MultiFieldPanel(
+            [
+                FieldRowPanel(
+                    [
+                        FieldPanel('name', classname='col6'),
+                        FieldPanel('period_type', classname='col6'),
+                    ],
+                    classname='compact-row',
+                ),
+                FieldRowPanel(
+                    [
+                        FieldPanel('start_date', classname='col6'),
+                        FieldPanel('end_date', classname='col6'),
+                    ],
+                    classname='compact-row',
+                ),
+            ],
+            heading='Period Details',
+            classname='compact-panel',
+        ),
+    ]
+
+
 modeladmin_register(AccountAdmin)
 modeladmin_register(AccountCategoryAdmin)
 modeladmin_register(TransactionAdmin)
 modeladmin_register(JournalEntryAdmin)
+modeladmin_register(AccountingPeriodAdmin)
@@ -9,10 +9,6 @@ class Command(BaseCommand):
     help = 'Generate monthly invoices for members and tenants'
 
     def handle(self, *args, **options):
-        # Aggressively disable all post_save signals to avoid django-tasks error
-        from django.db.models.signals import post_save
-        post_save.receivers = []
-        
         today = timezone.now().date()
         month_name = today.strftime('%B %Y')
         
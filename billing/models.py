@@ -4,6 +4,7 @@ from decimal import Decimal
 
 class Invoice(models.Model):
     """Consolidated bill for a specific period"""
+    wagtail_reference_index_ignore = True
     INVOICE_STATUS = [
         ('draft', 'Draft'),
         ('sent', 'Sent'),
@@ -39,6 +40,7 @@ class Invoice(models.Model):
 
 class InvoiceLineItem(models.Model):
     """Individual charges on an invoice"""
+    wagtail_reference_index_ignore = True
     invoice = models.ForeignKey(Invoice, on_delete=models.CASCADE, related_name='line_items')
     description = models.CharField(max_length=255)
     amount = models.DecimalField(max_digits=12, decimal_places=2)
@@ -51,6 +53,7 @@ class InvoiceLineItem(models.Model):
 
 class BillingPayment(models.Model):
     """Unified payment intake linked to Invoices"""
+    wagtail_reference_index_ignore = True
     PAYMENT_METHODS = [
         ('cash', 'Cash'),
         ('bank', 'Bank Transfer'),
@@ -79,30 +82,8 @@ class BillingPayment(models.Model):
             elif invoice.amount_paid > 0:
                 invoice.status = 'partially_paid'
             invoice.save()
-            
-            # 2. Post to Accounting Ledger
-            from accounting.models import Transaction, JournalEntry, Account, get_or_create_account
-            tx = Transaction.objects.create(
-                date=self.payment_date,
-                description=f"Payment for Invoice {invoice.invoice_number}",
-                reference=self.transaction_id or invoice.invoice_number
-            )
-            
-            # Debit Asset (Cash/Bank) - simplified logic for now
-            cash_account = get_or_create_account('1001', 'Main Cash', 'asset')
-            JournalEntry.objects.create(transaction=tx, account=cash_account, debit=self.amount)
-            
-            # Credit Revenue (Based on what was invoiced)
-            # In a full system, this would be more complex (Accounts Receivable vs Revenue)
-            # For simplicity, we credit the respective revenue account directly
-            if invoice.house:
-                rev_account = get_or_create_account('4002', 'Membership Dues Revenue', 'revenue')
-            elif invoice.shop:
-                rev_account = get_or_create_account('4003', 'Asset Rental Revenue', 'revenue') # Assuming 4003
-            else:
-                rev_account = get_or_create_account('4001', 'Donations Revenue', 'revenue')
-                
-            JournalEntry.objects.create(transaction=tx, account=rev_account, credit=self.amount)
+
+            # Posting to the ledger is queued by accounting.signals
 
     def __str__(self):
         return f"Payment ₹{self.amount} for {self.invoice.invoice_number}"
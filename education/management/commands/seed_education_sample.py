@@ -5,7 +5,8 @@ from django.core.management.base import BaseCommand
 from django.db import transaction
 from django.utils import timezone
 
-from accounting.models import Account, AccountCategory
+from accounting.outbox import batch_posting
+from accounting.posting import EDUCATION_BANK, EDUCATION_CASH, EDUCATION_FEES, resolve_account
 from education.models import Class, StudentEnrollment, StudentFeePayment, Teacher
 from membership.models import Member
 
@@ -15,7 +16,7 @@ class Command(BaseCommand):
 
     def handle(self, *args, **options):
         self.stdout.write("Seeding Education sample data...")
-        with transaction.atomic():
+        with transaction.atomic(), batch_posting():
             self._ensure_accounts_categories()
             members = self._ensure_members()
             teachers = self._create_teachers()
@@ -26,55 +27,8 @@ class Command(BaseCommand):
         )
 
     def _ensure_accounts_categories(self):
-        asset_cat = AccountCategory.objects.filter(category_type="asset").first()
-        if not asset_cat:
-            asset_cat = AccountCategory.objects.create(
-                name="Assets", category_type="asset"
-            )
-        revenue_cat = AccountCategory.objects.filter(category_type="revenue").first()
-        if not revenue_cat:
-            revenue_cat = AccountCategory.objects.create(
-                name="Revenue", category_type="revenue"
-            )
-
-        def next_code(prefix):
-            existing = set(
-                Account.objects.filter(code__startswith=prefix).values_list(
-                    "code", flat=True
-                )
-            )
-            start = int(prefix) * 10 + 1 if len(prefix) == 3 else int(prefix)
-            for i in range(1, 200):
-                candidate = f"{prefix}{i}"
-                if candidate not in existing:
-                    return candidate
-            return f"{prefix}999"
-
-        cash = Account.objects.filter(
-            category__category_type="asset",
-            name__in=["Cash in Hand", "Main Cash", "Petty Cash"],
-        ).first()
-        if not cash:
-            Account.objects.create(
-                name="Cash in Hand", code=next_code("100"), category=asset_cat
-            )
-
-        bank = Account.objects.filter(
-            category__category_type="asset", name="Bank Account"
-        ).first()
-        if not bank:
-            Account.objects.create(
-                name="Bank Account", code=next_code("100"), category=asset_cat
-            )
-
-        revenue = Account.objects.filter(
-            category__category_type="revenue",
-            name__in=["Education Fees", "Education Revenue"],
-        ).first()
-        if not revenue:
-            Account.objects.create(
-                name="Education Fees", code=next_code("400"), category=revenue_cat
-            )
+        for account in (EDUCATION_CASH, EDUCATION_BANK, EDUCATION_FEES):
+            resolve_account(account)
 
     def _ensure_members(self):
         members = list(Member.objects.all()[:4])
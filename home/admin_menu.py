@@ -151,23 +151,53 @@ def register_administration_menu():
                 icon_name="list-ul",
                 order=7,
             ),
+            MenuItem(
+                label="⚖️ Trial Balance",
+                url=reverse_lazy("accounting:trial_balance"),
+                icon_name="list-ul",
+                order=8,
+            ),
+            MenuItem(
+                label="📄 Income Statement",
+                url=reverse_lazy("accounting:income_statement"),
+                icon_name="doc-full",
+                order=9,
+            ),
+            MenuItem(
+                label="🏦 Balance Sheet",
+                url=reverse_lazy("accounting:balance_sheet"),
+                icon_name="doc-full",
+                order=10,
+            ),
             MenuItem(
                 label="📈 Ledger Transactions",
                 url=get_modeladmin_url("accounting", "transaction"),
                 icon_name="transfer",
-                order=8,
+                order=11,
+            ),
+            MenuItem(
+                label="✅ Ledger Integrity",
+                url=reverse_lazy("accounting:ledger_integrity"),
+                icon_name="tick-inverse",
+                order=12,
+            ),
+            MenuItem(
+                label="🔒 Accounting Periods",
+                url=get_modeladmin_url("accounting", "accountingperiod"),
+                icon_name="date",
+                order=13,
             ),
             MenuItem(
                 label="🧾 Invoices",
                 url=get_modeladmin_url("billing", "invoice"),
                 icon_name="doc-full",
-                order=9,
+                order=14,
             ),
             MenuItem(
                 label="💳 Billing Payments",
                 url=get_modeladmin_url("billing", "billingpayment"),
                 icon_name="pick",
-                order=10,
+                order=15,
             ),
         ]
     )
@@ -1,4 +1,3 @@
-import csv
 import datetime
 import logging
 from django.apps import apps
@@ -7,12 +6,12 @@ from django.conf import settings
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required, user_passes_test
 from django.db import models, transaction
-from django.http import HttpResponse
 from django.shortcuts import redirect, render
 from django.urls import reverse
 from django.utils import timezone
 from django.views.decorators.http import require_http_methods
 
+from home.exports import ReportExporter
 from home.models import SystemSettings
 
 logger = logging.getLogger(__name__)
@@ -371,6 +370,22 @@ def _get_enabled_modules():
     return enabled
 
 
+class DataProfilingExporter(ReportExporter):
+    header = ['Module', 'Model Name', 'Record Count', 'Last Updated']
+
+    def __init__(self, stats):
+        super().__init__()
+        self.stats = stats
+
+    def get_filename(self, extension):
+        return f"data_profiling_{timezone.now().strftime('%Y%m%d_%H%M%S')}.{extension}"
+
+    def rows(self):
+        for s in self.stats:
+            last_upd = s['last_updated'].strftime('%Y-%m-%d %H:%M:%S') if s['last_updated'] else 'N/A'
+            yield [s['app'], s['model'], s['record_count'], last_upd]
+
+
 @login_required
 @user_passes_test(_is_superuser)
 def data_profiling_view(request):
@@ -433,17 +448,7 @@ def data_profiling_view(request):
 
     # Handle CSV Export
     if request.GET.get('export') == 'csv':
-        response = HttpResponse(content_type='text/csv')
-        response['Content-Disposition'] = f'attachment; filename="data_profiling_{timezone.now().strftime("%Y%m%d_%H%M%S")}.csv"'
-        
-        writer = csv.writer(response)
-        writer.writerow(['Module', 'Model Name', 'Record Count', 'Last Updated'])
-        
-        for s in stats:
-            last_upd = s['last_updated'].strftime('%Y-%m-%d %H:%M:%S') if s['last_updated'] else 'N/A'
-            writer.writerow([s['app'], s['model'], s['record_count'], last_upd])
-            
-        return response
+        return DataProfilingExporter(stats).csv_response()
 
     context = {
         'stats': stats,
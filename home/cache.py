@@ -0,0 +1,101 @@
+"""Versioned cache for dashboard and live-data payloads.
+
+Every cached payload key embeds a single dashboard version number. Saving or
+deleting any row that feeds the dashboards bumps the version (see
+``home/signals.py``), so all previously cached payloads become unreachable at
+once and the next request recomputes them. Open dashboards polling the live
+feed therefore share one computation per change instead of each running the
+aggregates every 30 seconds.
+
+The backend is the cache alias named by ``DASHBOARD_CACHE_ALIAS`` (configured
+through ``CACHE_URL``). The default local-memory cache is per process; use a
+file or database cache when running several workers so they share versions.
+Only plain, picklable data (dicts, lists, numbers, strings) should be cached,
+never querysets.
+"""
+import hashlib
+import json
+import logging
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+VERSION_KEY = "dashboard:version"
+# How long superseded payloads are kept so clients can request a delta
+SNAPSHOT_TIMEOUT = 60 * 60
+
+
+def get_dashboard_cache():
+    return caches[getattr(settings, "DASHBOARD_CACHE_ALIAS", "default")]
+
+
+def _initial_version():
+    # Seed from the clock rather than 1 so a version key lost to eviction or a
+    # cache restart never lines up with payloads cached under an old version.
+    return int(time.time() * 1000)
+
+
+def get_dashboard_version():
+    """Return the current dashboard data version, creating it if needed."""
+    cache = get_dashboard_cache()
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        cache.add(VERSION_KEY, _initial_version(), timeout=None)
+        version = cache.get(VERSION_KEY)
+    return version
+
+
+def bump_dashboard_version(**kwargs):
+    """Invalidate every cached dashboard payload. Returns the new version."""
+    cache = get_dashboard_cache()
+    try:
+        return cache.incr(VERSION_KEY)
+    except ValueError:
+        # Key missing (first use or evicted)
+        version = _initial_version()
+        cache.set(VERSION_KEY, version, timeout=None)
+        return version
+
+
+def cached_payload(name, builder, timeout=None):
+    """Return ``builder()`` from the cache, computing it once per data version.
+
+    ``timeout`` defaults to ``DASHBOARD_CACHE_TIMEOUT``; it only bounds how
+    long a payload can outlive changes made without model signals (for
+    example ``QuerySet.update``).
+    """
+    cache = get_dashboard_cache()
+    # The date is part of the key because month-to-date and "today" tiles
+    # change at midnight without any row changing.
+    key = f"dashboard:{name}:v{get_dashboard_version()}:{timezone.localdate():%Y%m%d}"
+    payload = cache.get(key)
+    if payload is None:
+        payload = builder()
+        if timeout is None:
+            timeout = getattr(settings, "DASHBOARD_CACHE_TIMEOUT", 300)
+        cache.set(key, payload, timeout)
+        logger.debug(f"Computed dashboard payload {key}")
+    return payload
+
+
+def payload_token(name, payload):
+    """Return a content hash for ``payload`` and keep a snapshot under it.
+
+    The token doubles as the HTTP ETag of the payload and as the ``since``
+    value clients send back to receive only the fields that changed; see
+    ``get_payload_snapshot``.
+    """
+    encoded = json.dumps(payload, sort_keys=True, cls=DjangoJSONEncoder)
+    token = hashlib.sha1(f"{name}:{encoded}".encode()).hexdigest()[:20]
+    get_dashboard_cache().add(f"dashboard:snapshot:{name}:{token}", payload, SNAPSHOT_TIMEOUT)
+    return token
+
+
+def get_payload_snapshot(name, token):
+    """Return the payload previously served under ``token``, or None if expired."""
+    return get_dashboard_cache().get(f"dashboard:snapshot:{name}:{token}")
@@ -0,0 +1,116 @@
+"""Database-backed queue of background report exports.
+
+``queue_export`` records a pending ``ReportExport``; ``manage.py
+run_export_worker`` claims pending jobs one at a time, renders them with the
+registered exporter from ``home.exports`` into ``ReportExport.file_path`` and
+purges expired exports. Jobs are claimed with a conditional UPDATE, so
+several workers can share the queue without locking support from the
+database.
+"""
+import logging
+import tempfile
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files import File
+from django.utils import timezone
+
+from .exports import REPORT_EXPORTERS
+from .models import ReportExport
+
+logger = logging.getLogger(__name__)
+
+EXPORT_FORMATS = ("csv", "pdf")
+# Running jobs older than this are assumed to belong to a dead worker
+STALE_AFTER = timedelta(minutes=30)
+
+
+def get_export_retention():
+    return timedelta(days=getattr(settings, "REPORT_EXPORT_RETENTION_DAYS", 7))
+
+
+def queue_export(user, report_type, export_type="pdf"):
+    """Create a pending export job. Raises ``ValueError`` for unknown reports or formats."""
+    exporter_class = REPORT_EXPORTERS.get(report_type)
+    if exporter_class is None:
+        raise ValueError(f"Unknown report type: {report_type}")
+    if export_type not in EXPORT_FORMATS:
+        raise ValueError(f"Unsupported export format: {export_type}")
+    now = timezone.now()
+    return ReportExport.objects.create(
+        user=user,
+        report_name=exporter_class.title or report_type,
+        report_type=report_type,
+        export_type=export_type,
+        created_at=now,
+        expires_at=now + get_export_retention(),
+    )
+
+
+def claim_next_export():
+    """Mark the oldest pending job as running and return it, or None if the queue is empty."""
+    for job_id in ReportExport.objects.filter(status="pending").order_by("created_at").values_list(
+        "pk", flat=True
+    )[:10]:
+        claimed = ReportExport.objects.filter(pk=job_id, status="pending").update(
+            status="running", started_at=timezone.now()
+        )
+        if claimed:
+            return ReportExport.objects.get(pk=job_id)
+    return None
+
+
+def requeue_stale_exports():
+    """Put jobs left running by a worker that died back in the queue."""
+    return ReportExport.objects.filter(
+        status="running", started_at__lt=timezone.now() - STALE_AFTER
+    ).update(status="pending", started_at=None)
+
+
+def run_export(job):
+    """Render ``job`` into its file; failures are recorded on the job, not raised."""
+    try:
+        exporter = REPORT_EXPORTERS[job.report_type](today=timezone.localtime(job.created_at).date())
+        with tempfile.TemporaryFile() as output:
+            if job.export_type == "pdf":
+                exporter.write_pdf(output)
+            else:
+                for line in exporter.iter_csv():
+                    output.write(line.encode("utf-8"))
+            output.seek(0)
+            job.file_path.save(exporter.get_filename(job.export_type), File(output), save=False)
+    except Exception as e:
+        logger.error(f"Report export {job.pk} failed: {e}", exc_info=True)
+        job.status = "failed"
+        job.error = str(e)
+    else:
+        job.status = "completed"
+    job.completed_at = timezone.now()
+    job.save(update_fields=["status", "error", "file_path", "completed_at"])
+    return job
+
+
+def process_pending_exports(limit=None):
+    """Run pending jobs until the queue is empty (or ``limit`` jobs ran). Returns the count."""
+    processed = 0
+    while limit is None or processed < limit:
+        job = claim_next_export()
+        if job is None:
+            break
+        run_export(job)
+        processed += 1
+    return processed
+
+
+def purge_expired_exports(now=None):
+    """Delete expired exports and their files. Returns the number removed."""
+    expired = ReportExport.objects.filter(expires_at__lte=now or timezone.now())
+    removed = 0
+    for export in expired.iterator():
+        if export.file_path:
+            export.file_path.delete(save=False)
+        export.delete()
+        removed += 1
+    if removed:
+        logger.info(f"Purged {removed} expired report exports")
+    return removed
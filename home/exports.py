@@ -0,0 +1,183 @@
+"""Report exporters for ``export_report_view``.
+
+Each report is a ``ReportExporter`` subclass registered under its report type.
+Subclasses only describe the data (``header`` and a ``rows()`` generator);
+the base class streams it as CSV one row at a time, so a multi-year report
+never has to be held in worker memory. Large querysets should be read with
+``values_list`` projections and ``.iterator(chunk_size=...)`` rather than
+as model instances.
+"""
+import csv
+
+from django.db.models import Count, Q
+from django.http import HttpResponse, StreamingHttpResponse
+from django.utils import timezone
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import letter
+from reportlab.lib.styles import getSampleStyleSheet
+from reportlab.platypus import Paragraph, SimpleDocTemplate, Table, TableStyle
+
+from .kpis import get_dashboard_kpis
+
+REPORT_EXPORTERS = {}
+
+
+def register_exporter(exporter_class):
+    REPORT_EXPORTERS[exporter_class.report_type] = exporter_class
+    return exporter_class
+
+
+class _Echo:
+    """File-like object whose ``write`` returns the line instead of buffering it."""
+
+    def write(self, value):
+        return value
+
+
+class ReportExporter:
+    report_type = None
+    title = None
+    filename = None
+    header = ()
+    chunk_size = 2000
+
+    def __init__(self, today=None):
+        self.today = today or timezone.now().date()
+
+    def rows(self):
+        """Yield one sequence per data row."""
+        raise NotImplementedError
+
+    def get_filename(self, extension):
+        return f"{self.filename or self.report_type}_{self.today}.{extension}"
+
+    def iter_csv(self):
+        """Yield the report as CSV text, one line at a time."""
+        writer = csv.writer(_Echo())
+        yield writer.writerow(self.header)
+        for row in self.rows():
+            yield writer.writerow(row)
+
+    def write_csv(self, fileobj):
+        for line in self.iter_csv():
+            fileobj.write(line)
+
+    def csv_response(self):
+        response = StreamingHttpResponse(self.iter_csv(), content_type="text/csv")
+        response["Content-Disposition"] = f'attachment; filename="{self.get_filename("csv")}"'
+        return response
+
+    def pdf_cell(self, index, value):
+        return str(value)
+
+    def write_pdf(self, fileobj):
+        # reportlab lays out the whole table before writing, so PDF exports
+        # are not streamed; large ones belong in a background export job.
+        styles = getSampleStyleSheet()
+        data = [list(self.header)]
+        data.extend(
+            [self.pdf_cell(index, value) for index, value in enumerate(row)]
+            for row in self.rows()
+        )
+        table = Table(data)
+        table.setStyle(TableStyle([
+            ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
+            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+            ('FONTSIZE', (0, 0), (-1, 0), 14),
+            ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+            ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
+            ('GRID', (0, 0), (-1, -1), 1, colors.black)
+        ]))
+        doc = SimpleDocTemplate(fileobj, pagesize=letter)
+        doc.build([
+            Paragraph(self.title, styles['Heading1']),
+            Paragraph(f"Generated on {self.today}", styles['Normal']),
+            Paragraph("", styles['Normal']),
+            table,
+        ])
+
+    def pdf_response(self):
+        response = HttpResponse(content_type="application/pdf")
+        response["Content-Disposition"] = f'attachment; filename="{self.get_filename("pdf")}"'
+        self.write_pdf(response)
+        return response
+
+
+def house_display(house_name, house_number, house_id):
+    """Same text as ``str(HouseRegistration)`` without loading the instance."""
+    return house_name or house_number or f"House #{house_id}"
+
+
+@register_exporter
+class OverdueDuesExporter(ReportExporter):
+    report_type = "overdue_dues"
+    title = "Overdue Membership Dues Report"
+    header = ['House', 'Year', 'Month', 'Amount Due', 'Due Date', 'Days Overdue']
+
+    def rows(self):
+        from membership.models import MembershipDues
+
+        overdue = (
+            MembershipDues.objects.filter(is_paid=False, due_date__lt=self.today)
+            .order_by('due_date', 'house__house_name', 'house__house_number')
+            .values_list(
+                'house__house_name', 'house__house_number', 'house_id',
+                'year', 'month', 'amount_due', 'due_date',
+            )
+        )
+        for house_name, house_number, house_id, year, month, amount_due, due_date in overdue.iterator(
+            chunk_size=self.chunk_size
+        ):
+            yield [
+                house_display(house_name, house_number, house_id),
+                year,
+                month,
+                amount_due,
+                due_date,
+                (self.today - due_date).days,
+            ]
+
+    def pdf_cell(self, index, value):
+        return f"₹{value}" if index == 3 else str(value)
+
+
+@register_exporter
+class FinancialSummaryExporter(ReportExporter):
+    report_type = "financial_summary"
+    title = "Financial Summary Report"
+    header = ['Category', 'Amount']
+
+    def get_filename(self, extension):
+        return f"financial_summary_{self.today.year}.{extension}"
+
+    def rows(self):
+        kpis = get_dashboard_kpis('financial', self.today)
+        yield ['Total Donations', kpis['yearly_donations']]
+        yield ['Total Expenses', kpis['yearly_expenses']]
+        yield ['Total Membership Payments', kpis['yearly_dues_collected']]
+        yield [
+            'Net Income',
+            kpis['yearly_donations'] + kpis['yearly_dues_collected'] - kpis['yearly_expenses'],
+        ]
+
+
+@register_exporter
+class MembershipSummaryExporter(ReportExporter):
+    report_type = "membership_summary"
+    title = "Membership Summary Report"
+    header = ['Metric', 'Count']
+
+    def rows(self):
+        from membership.models import HouseRegistration, Member
+
+        members = Member.objects.filter(is_active=True).aggregate(
+            total=Count('id'),
+            male=Count('id', filter=Q(gender='M')),
+            female=Count('id', filter=Q(gender='F')),
+        )
+        yield ['Total Houses', HouseRegistration.objects.count()]
+        yield ['Total Active Members', members['total']]
+        yield ['Male Members', members['male']]
+        yield ['Female Members', members['female']]
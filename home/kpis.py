@@ -0,0 +1,163 @@
+"""Shared KPI tiles for the dashboards and the live data feed.
+
+Each table is read once with conditional aggregates (``Count``/``Sum`` with
+``filter=``), so a full admin dashboard costs one query per table instead of
+one per tile. ``get_dashboard_kpis`` is the single entry point used by
+``wagtail_dashboard_view``, ``live_data_feed`` and ``DashboardPage``.
+"""
+import datetime
+from decimal import Decimal
+
+from django.db.models import Count, Q, Sum
+from django.utils import timezone
+
+ZERO = Decimal("0.00")
+
+
+def _houses(today):
+    from membership.models import HouseRegistration
+
+    return {"total_houses": HouseRegistration.objects.count()}
+
+
+def _members(today):
+    from membership.models import Member
+
+    active = Q(is_active=True)
+    return Member.objects.aggregate(
+        total_members=Count("id", filter=active),
+        male_members=Count("id", filter=active & Q(gender="M")),
+        female_members=Count("id", filter=active & Q(gender="F")),
+    )
+
+
+def _education(today):
+    from education.models import Class, StudentEnrollment, Teacher
+
+    tiles = Teacher.objects.aggregate(total_teachers=Count("id", filter=Q(is_active=True)))
+    tiles.update(Class.objects.aggregate(active_classes=Count("id", filter=Q(is_active=True))))
+    tiles.update(
+        StudentEnrollment.objects.aggregate(
+            total_enrollments=Count("id", filter=Q(status="active"))
+        )
+    )
+    tiles["total_classes"] = tiles["active_classes"]
+    return tiles
+
+
+def _assets(today):
+    from assets.models import PropertyUnit, Shop
+
+    tiles = {"total_shops": Shop.objects.count()}
+    tiles.update(
+        PropertyUnit.objects.aggregate(
+            total_properties=Count("id"),
+            occupied_properties=Count("id", filter=Q(is_occupied=True)),
+        )
+    )
+    total = tiles["total_properties"]
+    tiles["occupancy_rate"] = (tiles["occupied_properties"] / total * 100) if total else 0
+    return tiles
+
+
+def _amount_totals(queryset, date_field, prefix, today):
+    """Overall, current-month and current-year sums of ``amount`` in one query."""
+    month_start = today.replace(day=1)
+    year_start = today.replace(month=1, day=1)
+    totals = queryset.aggregate(
+        total=Sum("amount"),
+        month=Sum("amount", filter=Q(**{f"{date_field}__gte": month_start})),
+        year=Sum("amount", filter=Q(**{f"{date_field}__gte": year_start})),
+    )
+    return {
+        f"total_{prefix}": totals["total"] or ZERO,
+        f"monthly_{prefix}": totals["month"] or ZERO,
+        f"yearly_{prefix}": totals["year"] or ZERO,
+    }
+
+
+def _donations(today):
+    from finance.models import Donation
+
+    return _amount_totals(Donation.objects.all(), "date", "donations", today)
+
+
+def _expenses(today):
+    from finance.models import Expense
+
+    return _amount_totals(Expense.objects.all(), "date", "expenses", today)
+
+
+def _dues(today):
+    from membership.models import Payment
+
+    return _amount_totals(Payment.objects.all(), "payment_date", "dues_collected", today)
+
+
+def _bookings(today):
+    from operations.models import AuditoriumBooking
+
+    return AuditoriumBooking.objects.aggregate(
+        upcoming_bookings=Count(
+            "id", filter=Q(booking_date__gte=today, status="approved")
+        ),
+        today_bookings=Count("id", filter=Q(booking_date=today, status="approved")),
+        open_bookings=Count(
+            "id", filter=Q(booking_date__gte=today, status__in=["pending", "approved"])
+        ),
+        completed_bookings_this_year=Count(
+            "id", filter=Q(booking_date__year=today.year, status="completed")
+        ),
+    )
+
+
+KPI_GROUPS = {
+    "houses": _houses,
+    "members": _members,
+    "education": _education,
+    "assets": _assets,
+    "donations": _donations,
+    "expenses": _expenses,
+    "dues": _dues,
+    "bookings": _bookings,
+}
+
+ROLE_GROUPS = {
+    "admin": ("houses", "members", "education", "assets", "donations", "expenses", "dues"),
+    "executive": ("houses", "members", "assets", "donations", "dues", "bookings"),
+    "staff": ("members", "education", "bookings"),
+    "summary": ("houses", "members", "education", "donations", "dues", "bookings"),
+    "financial": ("donations", "expenses", "dues"),
+    "page": ("houses", "members", "education", "donations", "expenses"),
+}
+
+
+def _add_derived_tiles(tiles):
+    if "total_donations" in tiles and "total_expenses" in tiles:
+        tiles["net_income"] = tiles["total_donations"] - tiles["total_expenses"]
+    if "total_donations" in tiles and "total_dues_collected" in tiles:
+        tiles["total_income"] = tiles["total_donations"] + tiles["total_dues_collected"]
+    if all(f"monthly_{name}" in tiles for name in ("donations", "expenses", "dues_collected")):
+        tiles["monthly_net"] = (
+            tiles["monthly_dues_collected"]
+            + tiles["monthly_donations"]
+            - tiles["monthly_expenses"]
+        )
+    return tiles
+
+
+def get_dashboard_kpis(role="admin", today=None):
+    """Return every KPI tile needed by ``role`` as a flat dict.
+
+    ``role`` is a user type (``admin``, ``executive``, ``staff``), a live
+    feed payload name (``summary``, ``financial``) or ``page`` for
+    ``DashboardPage``. Unknown roles fall back to the staff tiles.
+    """
+    today = today or timezone.now().date()
+    if isinstance(today, datetime.datetime):
+        today = today.date()
+
+    tiles = {}
+    for group in ROLE_GROUPS.get(role, ROLE_GROUPS["staff"]):
+        tiles.update(KPI_GROUPS[group](today))
+    return _add_derived_tiles(tiles)
@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from home.query_audit import KEY_QUERIES, audit_queries
+
+
+class Command(BaseCommand):
+    help = (
+        'Run EXPLAIN on the key membership and ledger queries and flag sequential scans; '
+        'exits with an error if any query reads a table without an index'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--query', action='append', choices=sorted(KEY_QUERIES), dest='queries',
+                            help='Only explain this query (repeatable)')
+        parser.add_argument('--show-plans', action='store_true', help='Print every query plan')
+
+    def handle(self, *args, **options):
+        try:
+            plans = audit_queries(options['queries'])
+        except NotImplementedError as e:
+            raise CommandError(str(e))
+
+        flagged = 0
+        for result in plans:
+            query = result.query
+            if result.scans:
+                flagged += 1
+                self.stdout.write(self.style.WARNING(
+                    f'{query.name}: sequential scan on {", ".join(result.scans)} ({query.description})'
+                ))
+            else:
+                self.stdout.write(f'{query.name}: ok')
+            if result.scans or options['show_plans']:
+                for line in result.plan.splitlines():
+                    self.stdout.write(f'  {line}')
+
+        if flagged:
+            raise CommandError(f'{flagged} of {len(plans)} key queries use a sequential scan')
+        self.stdout.write(self.style.SUCCESS(f'All {len(plans)} key queries use indexes'))
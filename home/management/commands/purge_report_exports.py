@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from home.export_jobs import purge_expired_exports
+
+
+class Command(BaseCommand):
+    help = 'Delete expired report exports and their files'
+
+    def handle(self, *args, **options):
+        removed = purge_expired_exports()
+        self.stdout.write(self.style.SUCCESS(f'Purged {removed} expired report exports'))
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from home.cache import bump_dashboard_version
+from home.rollups import rebuild_rollups
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the monthly financial rollup table used by the dashboards'
+
+    def handle(self, *args, **options):
+        count = rebuild_rollups()
+        bump_dashboard_version()
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {count} monthly rollup rows'))
@@ -0,0 +1,34 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from home.export_jobs import process_pending_exports, purge_expired_exports, requeue_stale_exports
+
+PURGE_INTERVAL = 60 * 60
+
+
+class Command(BaseCommand):
+    help = 'Render queued report exports in the background and purge expired ones'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true',
+                            help='Process the current queue and exit (for cron)')
+        parser.add_argument('--interval', type=float, default=5,
+                            help='Seconds to wait between queue polls (default: 5)')
+
+    def handle(self, *args, **options):
+        last_purge = None
+        while True:
+            if last_purge is None or time.monotonic() - last_purge >= PURGE_INTERVAL:
+                requeued = requeue_stale_exports()
+                purged = purge_expired_exports()
+                last_purge = time.monotonic()
+                if requeued or purged:
+                    self.stdout.write(f'Requeued {requeued} stale and purged {purged} expired exports')
+
+            processed = process_pending_exports()
+            if processed:
+                self.stdout.write(self.style.SUCCESS(f'Processed {processed} report exports'))
+            if options['once']:
+                break
+            time.sleep(options['interval'])
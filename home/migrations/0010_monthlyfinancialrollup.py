@@ -0,0 +1,34 @@
+# Generated by Django 4.2.30 on 2026-10-17 21:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('home', '0009_systemsettings_module_accounting_enabled_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MonthlyFinancialRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField(help_text='First day of the month', unique=True)),
+                ('total_donations', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('total_expenses', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('total_dues_collected', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('active_members', models.PositiveIntegerField(default=0, help_text='Active members registered by the end of the month')),
+                ('donations_by_category', models.JSONField(blank=True, default=dict)),
+                ('donations_by_type', models.JSONField(blank=True, default=dict)),
+                ('expenses_by_category', models.JSONField(blank=True, default=dict)),
+                ('payments_by_method', models.JSONField(blank=True, default=dict)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Monthly Financial Rollup',
+                'verbose_name_plural': 'Monthly Financial Rollups',
+                'ordering': ['month'],
+            },
+        ),
+    ]
@@ -0,0 +1,47 @@
+# Generated by Django 4.2.30 on 2026-10-17 21:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('home', '0010_monthlyfinancialrollup'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='reportexport',
+            name='completed_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='reportexport',
+            name='error',
+            field=models.TextField(blank=True),
+        ),
+        migrations.AddField(
+            model_name='reportexport',
+            name='report_type',
+            field=models.CharField(blank=True, help_text='Registered exporter in home.exports', max_length=50),
+        ),
+        migrations.AddField(
+            model_name='reportexport',
+            name='started_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='reportexport',
+            name='status',
+            field=models.CharField(choices=[('pending', 'Pending'), ('running', 'Running'), ('completed', 'Completed'), ('failed', 'Failed')], default='pending', max_length=20),
+        ),
+        migrations.AlterField(
+            model_name='reportexport',
+            name='file_path',
+            field=models.FileField(blank=True, upload_to='exports/'),
+        ),
+        migrations.AddIndex(
+            model_name='reportexport',
+            index=models.Index(fields=['status', 'created_at'], name='home_report_status_17b8a1_idx'),
+        ),
+    ]
@@ -26,25 +26,17 @@ class DashboardPage(Page):
         context = super().get_context(request, *args, **kwargs)
 
         # Add dashboard data
-        from education.models import Class, StudentEnrollment
-        from finance.models import Donation, Expense
-        from membership.models import HouseRegistration, Member
-
-        context["total_houses"] = HouseRegistration.objects.count()
-        context["total_members"] = Member.objects.filter(is_active=True).count()
-        context["total_donations"] = (
-            Donation.objects.aggregate(total=models.Sum("amount"))["total"] or 0
-        )
-        context["total_expenses"] = (
-            Expense.objects.aggregate(total=models.Sum("amount"))["total"] or 0
-        )
-        context["net_financial"] = (
-            context["total_donations"] - context["total_expenses"]
-        )
-        context["active_classes"] = Class.objects.filter(is_active=True).count()
-        context["total_enrollments"] = StudentEnrollment.objects.filter(
-            status="active"
-        ).count()
+        from finance.models import Donation
+        from home.kpis import get_dashboard_kpis
+
+        kpis = get_dashboard_kpis("page")
+        context["total_houses"] = kpis["total_houses"]
+        context["total_members"] = kpis["total_members"]
+        context["total_donations"] = kpis["total_donations"]
+        context["total_expenses"] = kpis["total_expenses"]
+        context["net_financial"] = kpis["net_income"]
+        context["active_classes"] = kpis["active_classes"]
+        context["total_enrollments"] = kpis["total_enrollments"]
 
         # Recent donations
         context["recent_donations"] = Donation.objects.select_related(
@@ -118,24 +110,87 @@ class DashboardWidget(models.Model):
 
 
 class ReportExport(models.Model):
+    """A report rendered in the background by ``manage.py run_export_worker``.
+
+    Rows are created as ``pending`` by ``home.export_jobs.queue_export``; the
+    worker renders the report into ``file_path`` and the file is removed with
+    the row once ``expires_at`` has passed.
+    """
+
     EXPORT_TYPES = [
         ("csv", "CSV"),
         ("pdf", "PDF"),
         ("excel", "Excel"),
     ]
 
+    STATUS_CHOICES = [
+        ("pending", "Pending"),
+        ("running", "Running"),
+        ("completed", "Completed"),
+        ("failed", "Failed"),
+    ]
+
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     report_name = models.CharField(max_length=200)
+    report_type = models.CharField(
+        max_length=50, blank=True, help_text="Registered exporter in home.exports"
+    )
     export_type = models.CharField(max_length=10, choices=EXPORT_TYPES)
-    file_path = models.FileField(upload_to="exports/")
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default="pending")
+    error = models.TextField(blank=True)
+    file_path = models.FileField(upload_to="exports/", blank=True)
     created_at = models.DateTimeField(default=timezone.now)
+    started_at = models.DateTimeField(null=True, blank=True)
+    completed_at = models.DateTimeField(null=True, blank=True)
     expires_at = models.DateTimeField()
 
     def __str__(self):
         return f"{self.report_name} ({self.export_type}) - {self.user.username}"
 
+    @property
+    def is_ready(self):
+        return self.status == "completed" and bool(self.file_path)
+
     class Meta:
         ordering = ["-created_at"]
+        indexes = [models.Index(fields=["status", "created_at"])]
+
+
+class MonthlyFinancialRollup(models.Model):
+    """Pre-aggregated per-month totals that back the dashboard trend charts.
+
+    Rows are kept current by the signal handlers in ``home/signals.py`` and can
+    be rebuilt from scratch with ``manage.py rebuild_financial_rollups``.
+    Breakdown fields map a label (category name, donation type or payment
+    method) to the month's total as a decimal string.
+    """
+
+    month = models.DateField(unique=True, help_text="First day of the month")
+    total_donations = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    total_expenses = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    total_dues_collected = models.DecimalField(
+        max_digits=14, decimal_places=2, default=0
+    )
+    active_members = models.PositiveIntegerField(
+        default=0, help_text="Active members registered by the end of the month"
+    )
+    donations_by_category = models.JSONField(default=dict, blank=True)
+    donations_by_type = models.JSONField(default=dict, blank=True)
+    expenses_by_category = models.JSONField(default=dict, blank=True)
+    payments_by_method = models.JSONField(default=dict, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Financial rollup {self.month:%b %Y}"
+
+    @property
+    def net_income(self):
+        return self.total_donations - self.total_expenses
+
+    class Meta:
+        ordering = ["month"]
+        verbose_name = "Monthly Financial Rollup"
+        verbose_name_plural = "Monthly Financial Rollups"
 
 
 @register_setting
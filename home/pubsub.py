@@ -0,0 +1,101 @@
+"""In-process publish/subscribe for the live dashboard stream.
+
+``home.signals`` publishes a ``changed`` event after every committed change
+to a dashboard source row; each open Server-Sent Events connection
+(``home.views.live_data_stream``) holds a ``Subscription`` and wakes up to
+push the KPI fields that changed.
+
+Subscribers are asyncio queues owned by the ASGI event loop, while publishers
+are usually sync views running in a worker thread, so delivery goes through
+``loop.call_soon_threadsafe``. When the publisher already runs on the
+subscriber's loop (or there is no loop at all, as in tests) the event is put
+on the queue directly.
+
+The broker only reaches connections served by the same process. Streams also
+re-check the shared cache version on every heartbeat, so changes made in
+another worker are picked up within one heartbeat interval.
+"""
+import asyncio
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+
+class Subscription:
+    """A single listener; events are coalesced, only the latest matters."""
+
+    def __init__(self, broker, loop=None):
+        self.broker = broker
+        self.loop = loop
+        self.queue = asyncio.Queue(maxsize=1)
+
+    def notify(self, event):
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if self.loop is None or running is self.loop:
+            self._put(event)
+            return
+        try:
+            self.loop.call_soon_threadsafe(self._put, event)
+        except RuntimeError:
+            # The connection's loop has shut down
+            self.close()
+
+    def _put(self, event):
+        if self.queue.full():
+            self.queue.get_nowait()
+        self.queue.put_nowait(event)
+
+    async def wait(self, timeout):
+        """Return the latest event, or None if nothing arrived within ``timeout``."""
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    def get_nowait(self):
+        try:
+            return self.queue.get_nowait()
+        except asyncio.QueueEmpty:
+            return None
+
+    def close(self):
+        self.broker.unsubscribe(self)
+
+
+class LiveDataBroker:
+    def __init__(self):
+        self._subscribers = set()
+        self._lock = threading.Lock()
+
+    def subscribe(self):
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            loop = None
+        subscription = Subscription(self, loop)
+        with self._lock:
+            self._subscribers.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            self._subscribers.discard(subscription)
+
+    @property
+    def subscriber_count(self):
+        return len(self._subscribers)
+
+    def publish(self, event):
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for subscription in subscribers:
+            subscription.notify(event)
+        if subscribers:
+            logger.debug(f"Published {event} to {len(subscribers)} live data subscribers")
+
+
+broker = LiveDataBroker()
@@ -0,0 +1,170 @@
+"""EXPLAIN the project's hot-path queries and flag sequential scans.
+
+Each key query is a function returning an unevaluated queryset, registered
+with ``register_query``. ``audit_queries`` runs ``EXPLAIN`` on each one and
+reports every table the plan reads with a full scan, except those the
+query lists in ``allowed_scans`` (small lookup tables, or a table the query
+is meant to read in full).
+
+On PostgreSQL the plans are taken with ``enable_seqscan`` off, so a
+sequential scan in the plan means no usable index exists, however small the
+tables are. SQLite and MySQL have no such switch, but SQLite picks an index
+whenever one matches the query; MySQL may still choose a full scan ("ALL")
+of a table with only a few rows. ``manage.py explain_key_queries`` runs the audit.
+"""
+import re
+from datetime import timedelta
+
+from django.apps import apps
+from django.db import connection, transaction
+from django.utils import timezone
+
+KEY_QUERIES = {}
+
+# Plan lines that read a whole table; group 1 is the table name
+SEQUENTIAL_SCAN = {
+    "postgresql": re.compile(r"Seq Scan on (\w+)"),
+    "sqlite": re.compile(r"\bSCAN (?:TABLE )?(\w+)(?!.*\bINDEX\b)"),
+    # Tabular EXPLAIN rows: id, select_type, table, [partitions,] type
+    "mysql": re.compile(r"^\d+ \w+ (\w+) (?:\S+ )?ALL\b"),
+}
+
+
+class KeyQuery:
+    def __init__(self, name, description, build, allowed_scans=(), vendors=None):
+        self.name = name
+        self.description = description
+        self.build = build
+        self.allowed_scans = set(allowed_scans)
+        # Backends the query's indexes exist on; None for all
+        self.vendors = vendors
+
+
+def register_query(name, description, allowed_scans=(), vendors=None):
+    """Register the decorated function's queryset as key query ``name``."""
+    def decorator(build):
+        KEY_QUERIES[name] = KeyQuery(name, description, build, allowed_scans, vendors)
+        return build
+    return decorator
+
+
+class QueryPlan:
+    def __init__(self, query, plan, scans):
+        self.query = query
+        self.plan = plan
+        # Tables read with a full scan that the query does not allow
+        self.scans = scans
+
+
+def _table_names():
+    return {model._meta.db_table for model in apps.get_models(include_auto_created=True)}
+
+
+def sequential_scans(plan, vendor=None):
+    """Names of the project tables ``plan`` (EXPLAIN output) reads with a full scan, in plan order."""
+    pattern = SEQUENTIAL_SCAN[vendor or connection.vendor]
+    tables = _table_names()
+    scans = []
+    for line in plan.splitlines():
+        match = pattern.search(line)
+        if match and match.group(1) in tables and match.group(1) not in scans:
+            scans.append(match.group(1))
+    return scans
+
+
+def explain(queryset):
+    """EXPLAIN output for ``queryset``, with sequential scans discouraged where the backend allows it."""
+    if connection.vendor == "postgresql":
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute("SET LOCAL enable_seqscan = off")
+            return queryset.explain()
+    return queryset.explain()
+
+
+def audit_queries(names=None):
+    """``QueryPlan`` of every registered query (or those in ``names``) supported by the database."""
+    if connection.vendor not in SEQUENTIAL_SCAN:
+        raise NotImplementedError(f"Query plans cannot be checked on {connection.vendor}")
+    queries = [KEY_QUERIES[name] for name in names] if names else list(KEY_QUERIES.values())
+    plans = []
+    for query in queries:
+        if query.vendors and connection.vendor not in query.vendors:
+            continue
+        plan = explain(query.build())
+        scans = [table for table in sequential_scans(plan) if table not in query.allowed_scans]
+        plans.append(QueryPlan(query, plan, scans))
+    return plans
+
+
+@register_query("overdue_dues", "Overdue report and export: unpaid dues due before today")
+def overdue_dues():
+    from membership.reports import overdue_dues
+
+    return overdue_dues(timezone.now().date()).order_by("due_date")
+
+
+@register_query("overdue_house_summary", "Overdue report: unpaid dues grouped by house",
+                allowed_scans=["membership_ward"])
+def overdue_house_summary():
+    from membership.reports import overdue_dues, overdue_house_summary
+
+    return overdue_house_summary(overdue_dues(timezone.now().date()))
+
+
+@register_query("unpaid_house_dues", "Settling dues: a house's unpaid dues")
+def unpaid_house_dues():
+    from membership.models import MembershipDues
+
+    return MembershipDues.objects.filter(house_id__in=[1, 2], is_paid=False).order_by("house_id", "due_date")
+
+
+@register_query("houses_in_arrears", "Bulk payment: houses with unpaid dues, most owed first")
+def houses_in_arrears():
+    from membership.models import HouseRegistration
+
+    return (
+        HouseRegistration.objects.filter(balance__months_in_arrears__gt=0)
+        .select_related("balance")
+        .order_by("-balance__total_outstanding")
+    )
+
+
+@register_query("dues_for_month", "Dues generation: existing dues of a month")
+def dues_for_month():
+    from membership.models import MembershipDues
+
+    today = timezone.now().date()
+    return MembershipDues.objects.filter(year=today.year, month=today.month).order_by().values("house_id")
+
+
+@register_query("payments_in_range", "Dashboards and rollups: payments in a date range")
+def payments_in_range():
+    from membership.models import Payment
+
+    today = timezone.now().date()
+    return Payment.objects.filter(payment_date__range=[today - timedelta(days=30), today])
+
+
+# SQLite cannot use an index for LIKE ... ESCAPE; PostgreSQL adds a
+# pattern index next to the unique index of a CharField
+@register_query("receipts_for_day", "Receipt numbering: receipts issued on a day", vendors=["postgresql"])
+def receipts_for_day():
+    from membership.models import Payment
+
+    prefix = f"REC-{timezone.now().date():%Y%m%d}-"
+    return Payment.objects.filter(receipt_number__startswith=prefix).values("receipt_number")
+
+
+@register_query("account_journal_lines", "General ledger: an account's journal lines",
+                allowed_scans=["accounting_transaction"])
+def account_journal_lines():
+    from accounting.models import JournalEntry
+
+    return JournalEntry.objects.filter(account_id=1).select_related("transaction")
+
+
+@register_query("pending_ledger_outbox", "Ledger outbox: pending postings in id order")
+def pending_ledger_outbox():
+    from accounting.models import LedgerOutbox
+
+    return LedgerOutbox.objects.filter(status="pending").order_by("id")[:200]
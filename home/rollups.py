@@ -0,0 +1,232 @@
+"""Maintenance and lookup helpers for ``MonthlyFinancialRollup``.
+
+The dashboards read trend data from one precomputed row per month instead of
+aggregating the donation, expense and payment tables on every request. Rows
+are refreshed per month and per source by the signal handlers in
+``home/signals.py``; ``rebuild_rollups`` recomputes the whole table with one
+grouped query per source.
+"""
+import datetime
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncMonth
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from .models import MonthlyFinancialRollup
+
+SOURCES = ("donations", "expenses", "dues", "members")
+UNCATEGORIZED = "Uncategorized"
+CENTS = Decimal("0.01")
+
+
+def month_start(value):
+    """Return the first day of the month for a date, datetime or ISO string."""
+    if isinstance(value, str):
+        value = parse_date(value)
+    if isinstance(value, datetime.datetime):
+        value = timezone.localtime(value).date() if timezone.is_aware(value) else value.date()
+    return value.replace(day=1)
+
+
+def next_month(month):
+    return (month + datetime.timedelta(days=32)).replace(day=1)
+
+
+def last_n_months(count=12, today=None):
+    """First days of the last ``count`` months (oldest first), ending with the current one."""
+    current = month_start(today or timezone.now().date())
+    months = [current]
+    for _ in range(count - 1):
+        current = (current - datetime.timedelta(days=1)).replace(day=1)
+        months.append(current)
+    return list(reversed(months))
+
+
+def _breakdown(rows, key):
+    totals = defaultdict(Decimal)
+    for row in rows:
+        totals[row[key] or UNCATEGORIZED] += row["total"] or Decimal("0.00")
+    return {label: str(total.quantize(CENTS)) for label, total in totals.items()}
+
+
+def _total(rows):
+    return sum((row["total"] or Decimal("0.00") for row in rows), Decimal("0.00"))
+
+
+def _donation_figures(rows):
+    return {
+        "total_donations": _total(rows),
+        "donations_by_category": _breakdown(rows, "category__name"),
+        "donations_by_type": _breakdown(rows, "donation_type"),
+    }
+
+
+def _expense_figures(rows):
+    return {
+        "total_expenses": _total(rows),
+        "expenses_by_category": _breakdown(rows, "category__name"),
+    }
+
+
+def _payment_figures(rows):
+    return {
+        "total_dues_collected": _total(rows),
+        "payments_by_method": _breakdown(rows, "payment_method"),
+    }
+
+
+def _source_specs():
+    """(source name, queryset, date field, grouping fields, figures builder)"""
+    from finance.models import Donation, Expense
+    from membership.models import Payment
+
+    return [
+        ("donations", Donation.objects.all(), "date",
+         ("category__name", "donation_type"), _donation_figures),
+        ("expenses", Expense.objects.all(), "date",
+         ("category__name",), _expense_figures),
+        ("dues", Payment.objects.all(), "payment_date",
+         ("payment_method",), _payment_figures),
+    ]
+
+
+def refresh_month(month, sources=SOURCES):
+    """Recompute the given sources for a single month and return the row."""
+    from membership.models import Member
+
+    month = month_start(month)
+    end = next_month(month) - datetime.timedelta(days=1)
+    rollup, _ = MonthlyFinancialRollup.objects.get_or_create(month=month)
+
+    for name, queryset, date_field, group_fields, figures in _source_specs():
+        if name not in sources:
+            continue
+        rows = list(
+            queryset.filter(**{f"{date_field}__range": [month, end]})
+            .order_by()
+            .values(*group_fields)
+            .annotate(total=Sum("amount"))
+        )
+        for field, value in figures(rows).items():
+            setattr(rollup, field, value)
+
+    if "members" in sources:
+        rollup.active_members = Member.objects.filter(
+            is_active=True, created_at__date__lte=end
+        ).count()
+
+    rollup.save()
+    return rollup
+
+
+def _active_members_by_month():
+    """Active member counts as sorted ``(month, count)`` pairs by creation month."""
+    from membership.models import Member
+
+    counts = (
+        Member.objects.filter(is_active=True)
+        .order_by()
+        .annotate(month=TruncMonth("created_at"))
+        .values("month")
+        .annotate(count=Count("id"))
+    )
+    return sorted((month_start(row["month"]), row["count"]) for row in counts)
+
+
+def _cumulative_count(monthly_counts, month):
+    return sum(count for created, count in monthly_counts if created <= month)
+
+
+def refresh_active_members():
+    """Recompute ``active_members`` on every existing rollup row."""
+    monthly_counts = _active_members_by_month()
+    changed = []
+    for rollup in MonthlyFinancialRollup.objects.only("id", "month", "active_members"):
+        count = _cumulative_count(monthly_counts, rollup.month)
+        if rollup.active_members != count:
+            rollup.active_members = count
+            changed.append(rollup)
+    MonthlyFinancialRollup.objects.bulk_update(changed, ["active_members"])
+    return len(changed)
+
+
+def rebuild_rollups(today=None):
+    """Rebuild the whole rollup table from the source tables.
+
+    Each source is aggregated once, grouped by month, so the cost is a handful
+    of queries regardless of how many months of history exist. Months without
+    any activity get an empty row so the table has no gaps. Returns the number
+    of rows written.
+    """
+    grouped = defaultdict(dict)
+    for _name, queryset, date_field, group_fields, figures in _source_specs():
+        rows_by_month = defaultdict(list)
+        monthly_rows = (
+            queryset.order_by()
+            .annotate(month=TruncMonth(date_field))
+            .values("month", *group_fields)
+            .annotate(total=Sum("amount"))
+        )
+        for row in monthly_rows:
+            rows_by_month[month_start(row["month"])].append(row)
+        for month, rows in rows_by_month.items():
+            grouped[month].update(figures(rows))
+
+    monthly_counts = _active_members_by_month()
+    current = month_start(today or timezone.now().date())
+    first = min([current, *grouped, *(month for month, _ in monthly_counts)])
+    last = max([current, *grouped])
+
+    rollups = []
+    month = first
+    while month <= last:
+        rollups.append(
+            MonthlyFinancialRollup(
+                month=month,
+                active_members=_cumulative_count(monthly_counts, month),
+                **grouped.get(month, {}),
+            )
+        )
+        month = next_month(month)
+
+    with transaction.atomic():
+        MonthlyFinancialRollup.objects.all().delete()
+        MonthlyFinancialRollup.objects.bulk_create(rollups)
+    return len(rollups)
+
+
+def get_monthly_rollups(months=12, today=None):
+    """Return rollup rows for the last ``months`` months, oldest first.
+
+    An empty table is rebuilt once; individual months with no row yet (no
+    activity since the last rebuild) are filled in on first access.
+    """
+    window = last_n_months(months, today)
+    if not MonthlyFinancialRollup.objects.exists():
+        rebuild_rollups(today)
+
+    rows = {
+        rollup.month: rollup
+        for rollup in MonthlyFinancialRollup.objects.filter(
+            month__range=[window[0], window[-1]]
+        )
+    }
+    return [rows.get(month) or refresh_month(month) for month in window]
+
+
+def summarize_breakdown(field, rollups=None):
+    """Sum a breakdown field across rollup rows (all rows by default).
+
+    Returns ``(label, Decimal total)`` pairs sorted by total, largest first.
+    """
+    if rollups is None:
+        rollups = MonthlyFinancialRollup.objects.only(field)
+    totals = defaultdict(Decimal)
+    for rollup in rollups:
+        for label, total in (getattr(rollup, field) or {}).items():
+            totals[label] += Decimal(total)
+    return sorted(totals.items(), key=lambda item: item[1], reverse=True)
@@ -0,0 +1,101 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from assets.models import PropertyUnit, Shop
+from education.models import Class, StudentEnrollment, Teacher
+from finance.models import Donation, Expense
+from membership.models import HouseRegistration, Member, Payment
+from operations.models import AuditoriumBooking
+
+from .cache import bump_dashboard_version
+from .models import MonthlyFinancialRollup
+from .pubsub import broker
+from .rollups import month_start, refresh_active_members, refresh_month
+
+# Source model -> (rollup source name, date field)
+ROLLUP_SOURCES = {
+    Donation: ("donations", "date"),
+    Expense: ("expenses", "date"),
+    Payment: ("dues", "payment_date"),
+}
+
+
+def _rollups_initialized():
+    # Until the table has been built (by the dashboard or the rebuild command)
+    # there is nothing to keep current; a full rebuild will pick the row up.
+    return MonthlyFinancialRollup.objects.exists()
+
+
+@receiver(pre_save, sender=Donation)
+@receiver(pre_save, sender=Expense)
+@receiver(pre_save, sender=Payment)
+def remember_rollup_month(sender, instance, **kwargs):
+    """Remember the month a row used to fall in so a moved row updates both months."""
+    _source, date_field = ROLLUP_SOURCES[sender]
+    instance._rollup_previous_date = None
+    if instance.pk and _rollups_initialized():
+        instance._rollup_previous_date = (
+            sender.objects.filter(pk=instance.pk)
+            .values_list(date_field, flat=True)
+            .first()
+        )
+
+
+@receiver(post_save, sender=Donation)
+@receiver(post_save, sender=Expense)
+@receiver(post_save, sender=Payment)
+def update_rollup_on_save(sender, instance, **kwargs):
+    if not _rollups_initialized():
+        return
+    source, date_field = ROLLUP_SOURCES[sender]
+    months = {month_start(getattr(instance, date_field))}
+    previous = getattr(instance, "_rollup_previous_date", None)
+    if previous:
+        months.add(month_start(previous))
+    for month in months:
+        refresh_month(month, sources=(source,))
+
+
+@receiver(post_delete, sender=Donation)
+@receiver(post_delete, sender=Expense)
+@receiver(post_delete, sender=Payment)
+def update_rollup_on_delete(sender, instance, **kwargs):
+    if not _rollups_initialized():
+        return
+    source, date_field = ROLLUP_SOURCES[sender]
+    refresh_month(month_start(getattr(instance, date_field)), sources=(source,))
+
+
+@receiver(post_save, sender=Member)
+@receiver(post_delete, sender=Member)
+def update_rollup_member_counts(sender, instance, **kwargs):
+    if not _rollups_initialized():
+        return
+    refresh_active_members()
+
+
+# Connected after the rollup handlers above, so rollup rows are already
+# current when the cached dashboard payloads are invalidated. Every model
+# counted by home.kpis is listed.
+@receiver([post_save, post_delete], sender=Donation)
+@receiver([post_save, post_delete], sender=Expense)
+@receiver([post_save, post_delete], sender=Payment)
+@receiver([post_save, post_delete], sender=Member)
+@receiver([post_save, post_delete], sender=HouseRegistration)
+@receiver([post_save, post_delete], sender=Teacher)
+@receiver([post_save, post_delete], sender=Class)
+@receiver([post_save, post_delete], sender=StudentEnrollment)
+@receiver([post_save, post_delete], sender=Shop)
+@receiver([post_save, post_delete], sender=PropertyUnit)
+@receiver([post_save, post_delete], sender=AuditoriumBooking)
+def invalidate_dashboard_cache(sender, instance, **kwargs):
+    # Bump now so the rest of this request sees fresh data, and again on
+    # commit so a payload another worker cached from pre-commit data is
+    # discarded as well. Live streams are only notified once committed.
+    bump_dashboard_version()
+    transaction.on_commit(publish_dashboard_change)
+
+
+def publish_dashboard_change():
+    broker.publish({"event": "changed", "version": bump_dashboard_version()})
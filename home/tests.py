@@ -0,0 +1,531 @@
+import os
+import shutil
+import tempfile
+import tracemalloc
+from datetime import date, timedelta
+from decimal import Decimal
+from io import StringIO
+from unittest.mock import patch
+
+from asgiref.sync import async_to_sync, sync_to_async
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.db import connection, models
+from django.db.models import Q
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from assets.models import PropertyUnit, Shop
+from finance.models import Donation, DonationCategory, Expense
+from membership.models import (
+    City, Country, HouseRegistration, Member, MembershipDues, Payment, PostalCode, State, Taluk, Ward,
+)
+
+from .cache import get_dashboard_cache, get_dashboard_version
+from .export_jobs import process_pending_exports, purge_expired_exports, queue_export, run_export
+from .exports import OverdueDuesExporter
+from .kpis import get_dashboard_kpis
+from .models import MonthlyFinancialRollup, ReportExport, UserProfile
+from .pubsub import LiveDataBroker
+from .query_audit import audit_queries, sequential_scans
+from .signals import publish_dashboard_change
+from .rollups import get_monthly_rollups, rebuild_rollups, summarize_breakdown
+from .views import _live_event_stream, _live_summary_payload, get_admin_dashboard_data, get_executive_dashboard_data
+
+
+class MonthlyFinancialRollupTest(TestCase):
+    """Test cases for the monthly financial rollup table"""
+
+    def setUp(self):
+        self.member = Member.objects.create(first_name="Rollup", last_name="Member")
+        self.category = DonationCategory.objects.create(name="Zakat")
+        Donation.objects.create(
+            member=self.member,
+            category=self.category,
+            amount=Decimal("100.00"),
+            donation_type="cash",
+            date=date(2024, 1, 10),
+        )
+        Expense.objects.create(
+            amount=Decimal("40.00"), date=date(2024, 1, 15), description="Electricity"
+        )
+
+    def test_rebuild_creates_contiguous_months(self):
+        """Test that a rebuild writes one row per month up to today with no gaps"""
+        count = rebuild_rollups(today=date(2024, 3, 5))
+        months = list(MonthlyFinancialRollup.objects.values_list("month", flat=True))
+        self.assertEqual(count, len(months))
+        self.assertIn(date(2024, 1, 1), months)
+        self.assertIn(date(2024, 3, 1), months)
+
+        january = MonthlyFinancialRollup.objects.get(month=date(2024, 1, 1))
+        self.assertEqual(january.total_donations, Decimal("100.00"))
+        self.assertEqual(january.total_expenses, Decimal("40.00"))
+        self.assertEqual(january.donations_by_category, {"Zakat": "100.00"})
+        self.assertEqual(january.expenses_by_category, {"Uncategorized": "40.00"})
+
+    def test_rollup_updated_on_save_and_delete(self):
+        """Test that saving, moving and deleting a donation keeps rows current"""
+        rebuild_rollups(today=date(2024, 3, 5))
+        donation = Donation.objects.create(
+            amount=Decimal("50.00"), donation_type="online", date=date(2024, 2, 1)
+        )
+        february = MonthlyFinancialRollup.objects.get(month=date(2024, 2, 1))
+        self.assertEqual(february.total_donations, Decimal("50.00"))
+        self.assertEqual(february.donations_by_type, {"online": "50.00"})
+
+        donation.date = date(2024, 1, 20)
+        donation.save()
+        february.refresh_from_db()
+        january = MonthlyFinancialRollup.objects.get(month=date(2024, 1, 1))
+        self.assertEqual(february.total_donations, Decimal("0.00"))
+        self.assertEqual(january.total_donations, Decimal("150.00"))
+
+        donation.delete()
+        january.refresh_from_db()
+        self.assertEqual(january.total_donations, Decimal("100.00"))
+
+    def test_active_members_updated_on_member_change(self):
+        """Test that member changes refresh the active member counts"""
+        rebuild_rollups()
+        current = get_monthly_rollups(months=1)[0]
+        self.assertEqual(current.active_members, 1)
+
+        self.member.is_active = False
+        self.member.save()
+        current.refresh_from_db()
+        self.assertEqual(current.active_members, 0)
+
+    def test_get_monthly_rollups_returns_window(self):
+        """Test that the dashboard window always has the requested months"""
+        rollups = get_monthly_rollups(months=12, today=date(2024, 6, 15))
+        self.assertEqual(len(rollups), 12)
+        self.assertEqual(rollups[0].month, date(2023, 7, 1))
+        self.assertEqual(rollups[-1].month, date(2024, 6, 1))
+
+    def test_summarize_breakdown(self):
+        """Test that breakdowns are summed across months, largest first"""
+        rebuild_rollups(today=date(2024, 3, 5))
+        Donation.objects.create(
+            category=self.category, amount=Decimal("25.00"), date=date(2024, 2, 2)
+        )
+        self.assertEqual(
+            summarize_breakdown("donations_by_category"),
+            [("Zakat", Decimal("125.00"))],
+        )
+
+    def test_rebuild_command(self):
+        """Test the rebuild management command"""
+        call_command("rebuild_financial_rollups", stdout=StringIO())
+        self.assertTrue(MonthlyFinancialRollup.objects.filter(month=date(2024, 1, 1)).exists())
+
+
+class DashboardKpiTest(TestCase):
+    """Test cases for the shared dashboard KPI service"""
+
+    def setUp(self):
+        today = date.today()
+        self.member = Member.objects.create(first_name="Kpi", last_name="Member", gender="M")
+        Member.objects.create(first_name="Inactive", last_name="Member", is_active=False)
+        for amount in ("100.00", "50.00"):
+            Donation.objects.create(amount=Decimal(amount), date=today)
+        Donation.objects.create(amount=Decimal("25.00"), date=date(2020, 1, 1))
+        Expense.objects.create(amount=Decimal("30.00"), date=today, description="Water")
+        Payment.objects.create(
+            member=self.member, amount=Decimal("10.00"), payment_method="cash", payment_date=today
+        )
+        PropertyUnit.objects.create(name="Unit 1", unit_type="apartment", address="A", is_occupied=True)
+        PropertyUnit.objects.create(name="Unit 2", unit_type="apartment", address="B")
+
+    def test_admin_tiles(self):
+        """Test that admin tiles are computed correctly"""
+        kpis = get_dashboard_kpis("admin")
+        self.assertEqual(kpis["total_members"], 1)
+        self.assertEqual(kpis["male_members"], 1)
+        self.assertEqual(kpis["total_donations"], Decimal("175.00"))
+        self.assertEqual(kpis["monthly_donations"], Decimal("150.00"))
+        self.assertEqual(kpis["net_income"], Decimal("145.00"))
+        self.assertEqual(kpis["total_income"], Decimal("185.00"))
+        self.assertEqual(kpis["occupancy_rate"], 50)
+
+    def test_financial_tiles(self):
+        """Test the month-to-date tiles used by the live feed"""
+        kpis = get_dashboard_kpis("financial")
+        self.assertEqual(kpis["monthly_net"], Decimal("130.00"))
+
+    def test_query_budget(self):
+        """Pin the number of queries per role so regressions are caught"""
+        with self.assertNumQueries(10):
+            get_dashboard_kpis("admin")
+        with self.assertNumQueries(8):
+            get_dashboard_kpis("summary")
+        with self.assertNumQueries(3):
+            get_dashboard_kpis("financial")
+
+    def test_admin_dashboard_query_budget(self):
+        """Test that the admin dashboard cost does not grow with the data"""
+        get_monthly_rollups()
+        with self.assertNumQueries(15):
+            get_admin_dashboard_data()
+        for _ in range(20):
+            Donation.objects.create(amount=Decimal("5.00"), date=date.today())
+        with self.assertNumQueries(15):
+            get_admin_dashboard_data()
+
+
+class DashboardCacheTest(TestCase):
+    """Test cases for the versioned dashboard payload cache"""
+
+    def setUp(self):
+        get_dashboard_cache().clear()
+        self.user = User.objects.create_user(username="viewer", password="password")
+        UserProfile.objects.create(user=self.user, user_type="admin")
+        Donation.objects.create(amount=Decimal("100.00"), date=date.today())
+
+    def test_payload_reused_until_data_changes(self):
+        """Test that repeated dashboard loads are served from the cache"""
+        get_executive_dashboard_data()
+        get_admin_dashboard_data()
+        with self.assertNumQueries(0):
+            get_executive_dashboard_data()
+            get_admin_dashboard_data()  # recent activity querysets stay lazy
+
+    def test_signals_bump_version(self):
+        """Test that saving or deleting a source row invalidates cached payloads"""
+        version = get_dashboard_version()
+        expense = Expense.objects.create(amount=Decimal("5.00"), date=date.today(), description="Tea")
+        self.assertGreater(get_dashboard_version(), version)
+
+        version = get_dashboard_version()
+        expense.delete()
+        self.assertGreater(get_dashboard_version(), version)
+
+    def test_counted_models_invalidate_tiles(self):
+        """Test that the shop count tile is fresh after a shop is added"""
+        self.assertEqual(get_admin_dashboard_data()["total_shops"], 0)
+        Shop.objects.create(name="Corner Shop", shop_type="retail")
+        self.assertEqual(get_admin_dashboard_data()["total_shops"], 1)
+
+    def test_live_data_feed_reflects_changes(self):
+        """Test that the live feed is cached but never stale after a change"""
+        self.client.login(username="viewer", password="password")
+        url = reverse("home:live_data_feed") + "?type=financial"
+
+        first = self.client.get(url).json()
+        self.assertEqual(first["monthly_donations"], 100.0)
+        self.assertIn("timestamp", first)
+
+        Donation.objects.create(amount=Decimal("20.00"), date=date.today())
+        self.assertEqual(self.client.get(url).json()["monthly_donations"], 120.0)
+
+
+class LiveDataFeedConditionalTest(TestCase):
+    """Test cases for ETag and delta responses from the live data feed"""
+
+    def setUp(self):
+        get_dashboard_cache().clear()
+        user = User.objects.create_user(username="poller", password="password")
+        UserProfile.objects.create(user=user, user_type="admin")
+        self.client.login(username="poller", password="password")
+        self.url = reverse("home:live_data_feed") + "?type=summary"
+        Donation.objects.create(amount=Decimal("10.00"), date=date.today())
+
+    def test_not_modified_when_etag_matches(self):
+        """Test that an unchanged payload is answered with 304"""
+        response = self.client.get(self.url)
+        etag = response["ETag"]
+        self.assertEqual(response.status_code, 200)
+
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response["ETag"], etag)
+
+        Member.objects.create(first_name="New", last_name="Member")
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+
+    def test_since_returns_changed_fields_only(self):
+        """Test that ``since`` yields a delta with just the changed KPIs"""
+        etag = self.client.get(self.url)["ETag"]
+        Donation.objects.create(amount=Decimal("5.00"), date=date.today())
+
+        data = self.client.get(self.url + "&since=" + etag.strip('"')).json()
+        self.assertTrue(data["delta"])
+        self.assertEqual(data["changed"], {"total_donations": 15.0})
+        self.assertEqual(data["removed"], [])
+
+    def test_unknown_since_returns_full_payload(self):
+        """Test that an expired token falls back to the full payload"""
+        data = self.client.get(self.url + "&since=unknown").json()
+        self.assertNotIn("delta", data)
+        self.assertEqual(data["total_donations"], 10.0)
+
+
+class LiveDataStreamTest(TestCase):
+    """Test cases for the Server-Sent Events live data stream"""
+
+    def setUp(self):
+        get_dashboard_cache().clear()
+        user = User.objects.create_user(username="listener", password="password")
+        UserProfile.objects.create(user=user, user_type="admin")
+        self.client.login(username="listener", password="password")
+        Donation.objects.create(amount=Decimal("10.00"), date=date.today())
+
+    def test_broker_delivers_without_event_loop(self):
+        """Test the local fallback used when no event loop is running"""
+        broker = LiveDataBroker()
+        subscription = broker.subscribe()
+        broker.publish({"event": "changed", "version": 1})
+        broker.publish({"event": "changed", "version": 2})
+        self.assertEqual(subscription.get_nowait(), {"event": "changed", "version": 2})
+
+        subscription.close()
+        self.assertEqual(broker.subscriber_count, 0)
+
+    def test_wsgi_fallback_sends_single_snapshot(self):
+        """Test that WSGI requests get one event and a reconnect delay"""
+        response = self.client.get(reverse("home:live_data_stream"), {"type": "summary"})
+        self.assertEqual(response["Content-Type"], "text/event-stream")
+        body = b"".join(response.streaming_content).decode()
+        self.assertIn("retry: 30000", body)
+        self.assertIn("event: snapshot", body)
+        self.assertIn('"total_donations": 10.0', body)
+
+    def test_stream_pushes_delta_on_change(self):
+        """Test that a committed change is pushed to an open stream as a delta"""
+
+        async def read_stream():
+            stream = _live_event_stream("live:summary", _live_summary_payload)
+            await stream.__anext__()  # retry
+            snapshot = await stream.__anext__()
+            await sync_to_async(Donation.objects.create)(amount=Decimal("5.00"), date=date.today())
+            await sync_to_async(publish_dashboard_change)()
+            delta = await stream.__anext__()
+            await stream.aclose()
+            return snapshot, delta
+
+        snapshot, delta = async_to_sync(read_stream)()
+        self.assertIn("event: snapshot", snapshot)
+        self.assertIn("event: delta", delta)
+        self.assertIn('"changed": {"total_donations": 15.0}', delta)
+
+
+class ReportExportStreamingTest(TestCase):
+    """Test cases for the streaming report exporters"""
+
+    @classmethod
+    def setUpTestData(cls):
+        location = dict(
+            ward=Ward.objects.create(name="Ward"),
+            taluk=Taluk.objects.create(name="Taluk"),
+            city=City.objects.create(name="City"),
+            state=State.objects.create(name="State"),
+            country=Country.objects.create(name="Country"),
+            postal_code=PostalCode.objects.create(code="000000"),
+        )
+        cls.houses = HouseRegistration.objects.bulk_create(
+            [HouseRegistration(house_name=f"House {i}", house_number=f"E-{i}", **location) for i in range(100)]
+        )
+        cls.houses = list(HouseRegistration.objects.order_by("pk"))
+
+    def setUp(self):
+        user = User.objects.create_user(username="exporter", password="password")
+        UserProfile.objects.create(user=user, user_type="admin")
+        self.client.login(username="exporter", password="password")
+
+    def _create_overdue(self, months):
+        MembershipDues.objects.bulk_create(
+            [
+                MembershipDues(
+                    house=house, year=1900 + month // 12, month=month % 12 + 1,
+                    amount_due=Decimal("10.00"), due_date=date(1900 + month // 12, month % 12 + 1, 1),
+                )
+                for month in range(months)
+                for house in self.houses
+            ],
+            batch_size=5000,
+        )
+
+    def test_overdue_csv_is_streamed(self):
+        """Test that the overdue export streams rows in due date order"""
+        self._create_overdue(2)
+        response = self.client.get(reverse("home:export_report", args=["overdue_dues"]))
+        self.assertTrue(response.streaming)
+        lines = b"".join(response.streaming_content).decode().splitlines()
+        self.assertEqual(lines[0], "House,Year,Month,Amount Due,Due Date,Days Overdue")
+        self.assertEqual(len(lines), 201)
+        self.assertTrue(lines[1].startswith("House 0,1900,1,10.00,1900-01-01,"))
+
+    def test_every_report_supports_csv_and_pdf(self):
+        """Test that all registered report types export in both formats"""
+        for report_type in ("overdue_dues", "financial_summary", "membership_summary"):
+            url = reverse("home:export_report", args=[report_type])
+            self.assertEqual(self.client.get(url, {"format": "csv"})["Content-Type"], "text/csv")
+            self.assertEqual(self.client.get(url, {"format": "pdf"})["Content-Type"], "application/pdf")
+        self.assertEqual(
+            self.client.get(reverse("home:export_report", args=["unknown"])).status_code, 400
+        )
+
+    def test_constant_memory_for_100k_rows(self):
+        """Test that exporting 100k rows never holds the whole file in memory"""
+        self._create_overdue(1000)  # 100 houses x 1000 months
+
+        tracemalloc.start()
+        try:
+            total_bytes = 0
+            rows = 0
+            for line in OverdueDuesExporter().iter_csv():
+                total_bytes += len(line)
+                rows += 1
+            _current, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+
+        self.assertEqual(rows, 100001)
+        self.assertGreater(total_bytes, 3 * 1024 * 1024)
+        # Peak usage stays at a few chunks' worth of rows, far below the output size
+        self.assertLess(peak, 2 * 1024 * 1024)
+
+
+class ReportExportJobTest(TestCase):
+    """Test cases for background report export jobs"""
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+        media = override_settings(MEDIA_ROOT=self.media_root)
+        media.enable()
+        self.addCleanup(media.disable)
+
+        self.user = User.objects.create_user(username="reporter", password="password")
+        UserProfile.objects.create(user=self.user, user_type="admin")
+        self.client.login(username="reporter", password="password")
+
+    def test_queue_process_and_download(self):
+        """Test the full queue, poll and download cycle"""
+        response = self.client.post(reverse("home:queue_export", args=["financial_summary"]), {"format": "pdf"})
+        self.assertEqual(response.status_code, 202)
+        job = response.json()
+        self.assertEqual(job["status"], "pending")
+        self.assertEqual(job["format"], "pdf")
+
+        self.assertEqual(process_pending_exports(), 1)
+
+        status = self.client.get(job["status_url"]).json()
+        self.assertEqual(status["status"], "completed")
+        download = self.client.get(status["download_url"])
+        self.assertEqual(download.status_code, 200)
+        self.assertTrue(b"".join(download.streaming_content).startswith(b"%PDF"))
+
+    def test_queue_format(self):
+        """Test that queued exports default to CSV like the direct export and reject unsupported formats"""
+        url = reverse("home:queue_export", args=["membership_summary"])
+        self.assertEqual(self.client.post(url).json()["format"], "csv")
+        response = self.client.post(url, {"format": "excel"})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("Unsupported export format", response.json()["error"])
+
+    def test_csv_job_writes_file(self):
+        """Test that CSV jobs are written to the export's file"""
+        job = run_export(queue_export(self.user, "membership_summary", "csv"))
+        self.assertEqual(job.status, "completed")
+        with job.file_path.open("rb") as f:
+            self.assertTrue(f.read().startswith(b"Metric,Count"))
+
+    def test_failure_is_recorded(self):
+        """Test that a failing export is marked failed with the error"""
+        job = queue_export(self.user, "membership_summary", "csv")
+        ReportExport.objects.filter(pk=job.pk).update(report_type="missing")
+        process_pending_exports()
+        job.refresh_from_db()
+        self.assertEqual(job.status, "failed")
+        self.assertIn("missing", job.error)
+
+    def test_exports_are_private(self):
+        """Test that users cannot poll or download other users' exports"""
+        other = User.objects.create_user(username="other", password="password")
+        job = run_export(queue_export(other, "membership_summary", "csv"))
+        self.assertEqual(self.client.get(reverse("home:export_status", args=[job.pk])).status_code, 404)
+        self.assertEqual(self.client.get(reverse("home:download_export", args=[job.pk])).status_code, 404)
+
+    def test_purge_expired(self):
+        """Test that expired exports are deleted along with their files"""
+        job = run_export(queue_export(self.user, "membership_summary", "csv"))
+        path = job.file_path.path
+        kept = run_export(queue_export(self.user, "membership_summary", "csv"))
+        ReportExport.objects.filter(pk=job.pk).update(expires_at=timezone.now() - timedelta(minutes=1))
+
+        self.assertEqual(purge_expired_exports(), 1)
+        self.assertFalse(os.path.exists(path))
+        self.assertEqual(list(ReportExport.objects.values_list("pk", flat=True)), [kept.pk])
+
+    def test_worker_command_runs_once(self):
+        """Test the worker command in --once mode"""
+        queue_export(self.user, "overdue_dues", "pdf")
+        call_command("run_export_worker", once=True, stdout=StringIO())
+        self.assertEqual(ReportExport.objects.get().status, "completed")
+
+
+class QueryAuditTest(TestCase):
+    """Tests for the EXPLAIN audit of key queries"""
+
+    def test_sequential_scans_parsed_from_plans(self):
+        """Test that full table scans are picked out of SQLite and PostgreSQL plans"""
+        sqlite_plan = (
+            "3 0 0 SCAN membership_houseregistration\n"
+            "5 0 0 SEARCH membership_membershipdues USING INDEX dues_unpaid_house_idx (house_id=?)\n"
+            "9 0 0 SCAN membership_payment USING INDEX payment_date_created_idx\n"
+            "12 0 0 SCAN CONSTANT ROW"
+        )
+        self.assertEqual(sequential_scans(sqlite_plan, "sqlite"), ["membership_houseregistration"])
+
+        postgres_plan = (
+            "Hash Join  (cost=1.04..2.20 rows=1 width=8)\n"
+            "  ->  Seq Scan on membership_payment  (cost=0.00..1.02 rows=2 width=4)\n"
+            "  ->  Index Scan using dues_unpaid_house_idx on membership_membershipdues  (cost=0.15..8.17)"
+        )
+        self.assertEqual(sequential_scans(postgres_plan, "postgresql"), ["membership_payment"])
+
+        mysql_plan = (
+            "1 SIMPLE membership_membershipdues None range dues_unpaid_due_date_idx "
+            "dues_unpaid_due_date_idx 4 None 12 100.0 Using index condition\n"
+            "1 SIMPLE membership_houseregistration None ALL PRIMARY None None None 40 10.0 Using where"
+        )
+        self.assertEqual(sequential_scans(mysql_plan, "mysql"), ["membership_houseregistration"])
+
+    def test_partial_index_falls_back_to_composite(self):
+        """Test that backends without partial indexes get the condition's field as the leading column"""
+        index = next(index for index in MembershipDues._meta.indexes if index.name == "dues_unpaid_house_idx")
+        # Not entered: SQLite's schema editor refuses to open inside the test transaction
+        editor = connection.SchemaEditorClass(connection, collect_sql=True)
+        partial = str(index.create_sql(MembershipDues, editor))
+        with patch.object(connection.features, "supports_partial_indexes", False):
+            composite = str(index.create_sql(MembershipDues, editor))
+        self.assertIn("WHERE", partial)
+        self.assertNotIn("WHERE", composite)
+        self.assertIn('("is_paid", "house_id", "due_date")', composite)
+
+    def test_partial_index_fallback_is_not_flagged(self):
+        """Test that only the fallback indexes are exempt from the unsupported condition warning"""
+        with patch.object(connection.features, "supports_partial_indexes", False):
+            dues_warnings = [error.id for error in MembershipDues.check(databases=["default"])]
+            plain = models.Index(fields=["due_date"], condition=Q(is_paid=False), name="dues_plain_idx")
+            with patch.object(MembershipDues._meta, "indexes", [*MembershipDues._meta.indexes, plain]):
+                plain_warnings = [error.id for error in MembershipDues.check(databases=["default"])]
+        self.assertNotIn("models.W037", dues_warnings)
+        self.assertIn("models.W037", plain_warnings)
+
+    def test_key_queries_use_indexes(self):
+        """Test that every key query runs against an index on this database"""
+        plans = audit_queries()
+        self.assertTrue(plans)
+        self.assertEqual({plan.query.name: plan.scans for plan in plans if plan.scans}, {})
+
+    def test_command_reports_queries(self):
+        """Test that the command lists each query and passes when none are flagged"""
+        out = StringIO()
+        call_command("explain_key_queries", query=["overdue_dues"], show_plans=True, stdout=out)
+        self.assertIn("overdue_dues: ok", out.getvalue())
+        self.assertIn("dues_unpaid_due_date_idx", out.getvalue())
@@ -7,5 +7,9 @@ app_name = 'home'
 
 urlpatterns = [
     path('export/<str:report_type>/', views.export_report_view, name='export_report'),
+    path('export/<str:report_type>/queue/', views.queue_export_view, name='queue_export'),
+    path('export/jobs/<int:export_id>/', views.export_status_view, name='export_status'),
+    path('export/jobs/<int:export_id>/download/', views.download_export_view, name='download_export'),
     path('api/live-data/', views.live_data_feed, name='live_data_feed'),
+    path('api/live-data/stream/', views.live_data_stream, name='live_data_stream'),
 ]
\ No newline at end of file
@@ -1,34 +1,42 @@
-import csv
+import asyncio
 import json
 import logging
-from datetime import datetime, timedelta
+import os
+from datetime import datetime
 from decimal import Decimal
 
+from asgiref.sync import sync_to_async
 from django.contrib import messages
 from django.contrib.auth import authenticate, login, logout
 from django.contrib.auth.decorators import login_required
+from django.contrib.auth.views import redirect_to_login
+from django.core.handlers.asgi import ASGIRequest
 from django.core.paginator import Paginator
-from django.db.models import Count, Q, Sum
-from django.http import HttpResponse, JsonResponse
-from django.shortcuts import redirect, render
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Count, Q
+from django.http import FileResponse, JsonResponse, StreamingHttpResponse
+from django.shortcuts import get_object_or_404, redirect, render
+from django.urls import reverse
 from django.utils import timezone
+from django.utils.cache import get_conditional_response, patch_cache_control
 
 logger = logging.getLogger(__name__)
-from reportlab.lib import colors
-from reportlab.lib.pagesizes import letter
-from reportlab.lib.styles import getSampleStyleSheet
 from reportlab.pdfgen import canvas
-from reportlab.platypus import Paragraph, SimpleDocTemplate, Table, TableStyle
 
-from assets.models import PropertyUnit, Shop
 from education.models import Class, StudentEnrollment, Teacher
-from finance.models import Donation, DonationCategory, Expense, ExpenseCategory
-from membership.models import HouseRegistration, Member, MembershipDues, Payment
+from finance.models import Donation, DonationCategory, ExpenseCategory
+from membership.models import Payment
 from operations.models import AuditoriumBooking
 from hijri_converter import Hijri
 from home.admin_menu import get_modeladmin_url
 
+from .cache import cached_payload, get_dashboard_version, get_payload_snapshot, payload_token
+from .export_jobs import queue_export
+from .exports import REPORT_EXPORTERS
+from .kpis import get_dashboard_kpis
 from .models import DashboardWidget, ReportExport, UserProfile
+from .pubsub import broker
+from .rollups import get_monthly_rollups, summarize_breakdown
 
 
 
@@ -145,49 +153,8 @@ def get_dashboard_actions(user):
 def get_admin_dashboard_data():
     """Get comprehensive dashboard data for administrators"""
     today = timezone.now().date()
-    current_year = today.year
 
-    # Basic counts
-    data = {
-        'total_houses': HouseRegistration.objects.count(),
-        'total_members': Member.objects.filter(is_active=True).count(),
-        'total_teachers': Teacher.objects.filter(is_active=True).count(),
-        'total_classes': Class.objects.filter(is_active=True).count(),
-        'total_shops': Shop.objects.count(),
-        'total_properties': PropertyUnit.objects.count(),
-    }
-
-    # Financial data
-    total_donations = Donation.objects.aggregate(total=Sum('amount'))['total'] or Decimal('0.00')
-    total_expenses = Expense.objects.aggregate(total=Sum('amount'))['total'] or Decimal('0.00')
-    total_dues_collected = Payment.objects.aggregate(total=Sum('amount'))['total'] or Decimal('0.00')
-
-    data.update({
-        'total_donations': total_donations,
-        'total_expenses': total_expenses,
-        'net_income': total_donations - total_expenses,
-        'total_dues_collected': total_dues_collected,
-    })
-
-    # Monthly trends (last 12 months)
-    monthly_data = []
-    for i in range(11, -1, -1):
-        month_date = today - timedelta(days=30*i)
-        month_start = month_date.replace(day=1)
-        month_end = (month_start + timedelta(days=32)).replace(day=1) - timedelta(days=1)
-
-        donations = Donation.objects.filter(date__range=[month_start, month_end]).aggregate(total=Sum('amount'))['total'] or 0
-        expenses = Expense.objects.filter(date__range=[month_start, month_end]).aggregate(total=Sum('amount'))['total'] or 0
-        dues = Payment.objects.filter(payment_date__range=[month_start, month_end]).aggregate(total=Sum('amount'))['total'] or 0
-        member_count = Member.objects.filter(created_at__lte=month_end, is_active=True).count()
-
-        monthly_data.append({
-            'month': month_date.strftime('%b %Y'),
-            'donations': float(donations),
-            'expenses': float(expenses),
-            'dues': float(dues),
-            'members': member_count,
-        })
+    data = dict(cached_payload('admin', _admin_dashboard_figures))
 
     # Recent activities
     data['recent_donations'] = Donation.objects.select_related('member', 'category').order_by('-date')[:5]
@@ -197,36 +164,54 @@ def get_admin_dashboard_data():
         status='approved'
     ).order_by('booking_date')[:5]
 
+    return data
+
+
+def _admin_dashboard_figures():
+    """Cacheable part of the admin dashboard: KPI tiles and chart data"""
+    kpis = get_dashboard_kpis('admin')
+
+    # Basic counts and financial totals
+    data = {
+        key: kpis[key]
+        for key in (
+            'total_houses', 'total_members', 'total_teachers', 'total_classes',
+            'total_shops', 'total_properties', 'total_donations', 'total_expenses',
+            'net_income', 'total_dues_collected',
+        )
+    }
+
+    # Monthly trends (last 12 months) from the precomputed rollup table
+    monthly_data = [
+        {
+            'month': rollup.month.strftime('%b %Y'),
+            'donations': float(rollup.total_donations),
+            'expenses': float(rollup.total_expenses),
+            'dues': float(rollup.total_dues_collected),
+            'members': rollup.active_members,
+        }
+        for rollup in get_monthly_rollups()
+    ]
+
     # Chart Data: Expenses by Category
-    expenses_by_category_raw = Expense.objects.select_related('category').values('category__name').annotate(
-        total=Sum('amount')
-    ).order_by('-total')
     expenses_by_category = [
-        {'category__name': e['category__name'], 'total': float(e['total'] or 0)} 
-        for e in expenses_by_category_raw
+        {'category__name': label, 'total': float(total)}
+        for label, total in summarize_breakdown('expenses_by_category')
     ]
     data['expenses_by_category'] = json.dumps(expenses_by_category)
 
     # Chart Data: Revenue Sources
-    donations_by_type = Donation.objects.values('donation_type').annotate(
-        total=Sum('amount')
-    ).order_by('-total')
     # Map display names
     donation_type_display = dict(Donation.DONATION_TYPES)
     payment_method_display = dict(Payment.PAYMENT_METHOD_CHOICES)
 
     revenue_sources = [
-        {'label': donation_type_display.get(d['donation_type'], d['donation_type']), 'total': float(d['total'])}
-        for d in donations_by_type
+        {'label': donation_type_display.get(label, label), 'total': float(total)}
+        for label, total in summarize_breakdown('donations_by_type')
     ]
-    
-    payments_by_method = Payment.objects.values('payment_method').annotate(
-        total=Sum('amount')
-    ).order_by('-total')
-    
     revenue_sources.extend([
-        {'label': f"Payment: {payment_method_display.get(p['payment_method'], p['payment_method'])}", 'total': float(p['total'])}
-        for p in payments_by_method
+        {'label': f"Payment: {payment_method_display.get(label, label)}", 'total': float(total)}
+        for label, total in summarize_breakdown('payments_by_method')
     ])
 
     data['monthly_trends'] = json.dumps(monthly_data)
@@ -237,34 +222,28 @@ def get_admin_dashboard_data():
 
 def get_executive_dashboard_data():
     """Get executive dashboard data with KPIs and trends"""
-    today = timezone.now().date()
-    current_year = today.year
+    return dict(cached_payload('executive', _executive_dashboard_figures))
 
-    # Key Performance Indicators
-    total_members = Member.objects.filter(is_active=True).count()
-    total_houses = HouseRegistration.objects.count()
 
-    # Income data
-    total_donations = Donation.objects.aggregate(total=Sum('amount'))['total'] or Decimal('0.00')
-    total_dues = Payment.objects.aggregate(total=Sum('amount'))['total'] or Decimal('0.00')
-    total_income = total_donations + total_dues
+def _executive_dashboard_figures():
+    # Key Performance Indicators
+    kpis = get_dashboard_kpis('executive')
+    total_members = kpis['total_members']
+    total_houses = kpis['total_houses']
+    total_income = kpis['total_income']
+    occupancy_rate = kpis['occupancy_rate']
 
-    # Occupancy data
-    occupied_units = PropertyUnit.objects.filter(is_occupied=True).count()
-    total_units = PropertyUnit.objects.count()
-    occupancy_rate = (occupied_units / total_units * 100) if total_units > 0 else 0
+    rollups = get_monthly_rollups()
 
     # Monthly targets vs actual (simplified)
-    monthly_dues_target = total_families * 10  # ₹10 per family per month
-    current_month_dues = Payment.objects.filter(
-        payment_date__year=current_year,
-        payment_date__month=today.month
-    ).aggregate(total=Sum('amount'))['total'] or Decimal('0.00')
+    monthly_dues_target = total_houses * 10  # ₹10 per house per month
+    current_month_dues = rollups[-1].total_dues_collected
 
     data = {
         'kpis': {
             'total_members': total_members,
-            'total_families': total_families,
+            'total_houses': total_houses,
+            'total_families': total_houses,
             'total_income': total_income,
             'occupancy_rate': occupancy_rate,
         },
@@ -275,28 +254,19 @@ def get_executive_dashboard_data():
     }
 
     # Trend data for charts
-    monthly_income_data = []
-    for i in range(11, -1, -1):
-        month_date = today - timedelta(days=30*i)
-        month_start = month_date.replace(day=1)
-        month_end = (month_start + timedelta(days=32)).replace(day=1) - timedelta(days=1)
-
-        donations = Donation.objects.filter(date__range=[month_start, month_end]).aggregate(total=Sum('amount'))['total'] or 0
-        dues = Payment.objects.filter(payment_date__range=[month_start, month_end]).aggregate(total=Sum('amount'))['total'] or 0
-
-        monthly_income_data.append({
-            'month': month_date.strftime('%b %Y'),
-            'income': float(donations + dues),
+    monthly_income_data = [
+        {
+            'month': rollup.month.strftime('%b %Y'),
+            'income': float(rollup.total_donations + rollup.total_dues_collected),
             'target': monthly_dues_target,
-        })
+        }
+        for rollup in rollups
+    ]
 
     data['monthly_income_trends'] = json.dumps(monthly_income_data)
 
     # Auditorium revenue (from bookings)
-    auditorium_bookings = AuditoriumBooking.objects.filter(
-        status='completed',
-        booking_date__year=current_year
-    ).count()
+    auditorium_bookings = kpis['completed_bookings_this_year']
     # Assume average revenue per booking
     avg_revenue_per_booking = Decimal('5000.00')
     total_auditorium_revenue = auditorium_bookings * avg_revenue_per_booking
@@ -352,16 +322,13 @@ def get_manager_dashboard_data():
 
 def get_staff_dashboard_data():
     """Get basic staff dashboard data"""
-    today = timezone.now().date()
+    kpis = cached_payload('staff', lambda: get_dashboard_kpis('staff'))
 
     data = {
         'today_overview': {
-            'total_members': Member.objects.filter(is_active=True).count(),
-            'active_classes': Class.objects.filter(is_active=True).count(),
-            'today_bookings': AuditoriumBooking.objects.filter(
-                booking_date=today,
-                status='approved'
-            ).count(),
+            'total_members': kpis['total_members'],
+            'active_classes': kpis['active_classes'],
+            'today_bookings': kpis['today_bookings'],
         },
         'quick_actions': [
             {'name': 'Add Member', 'url': '/cms/membership/member/create/', 'icon': 'user'},
@@ -380,88 +347,71 @@ def export_report_view(request, report_type):
     if not user_profile:
         return JsonResponse({'error': 'User profile not found'}, status=403)
 
-    if report_type == 'overdue_dues':
-        return export_overdue_dues_report(request)
-    elif report_type == 'financial_summary':
-        return export_financial_summary_report(request)
-    elif report_type == 'membership_summary':
-        return export_membership_summary_report(request)
-    else:
+    exporter_class = REPORT_EXPORTERS.get(report_type)
+    if exporter_class is None:
         return JsonResponse({'error': 'Invalid report type'}, status=400)
 
-
-def export_overdue_dues_report(request):
-    """Export overdue dues report"""
+    exporter = exporter_class()
     export_format = request.GET.get('format', 'csv')
-    today = timezone.now().date()
+    if export_format == 'csv':
+        return exporter.csv_response()
+    elif export_format == 'pdf':
+        return exporter.pdf_response()
 
-    # Get overdue dues
-    overdue_dues = MembershipDues.objects.filter(
-        is_paid=False,
-        due_date__lt=today
-    ).select_related('house').order_by('due_date', 'house__house_name', 'house__house_number')
+    return JsonResponse({'error': 'Format not implemented'}, status=400)
 
-    if export_format == 'csv':
-        response = HttpResponse(content_type='text/csv')
-        response['Content-Disposition'] = f'attachment; filename="overdue_dues_{today}.csv"'
 
-        writer = csv.writer(response)
-        writer.writerow(['House', 'Year', 'Month', 'Amount Due', 'Due Date', 'Days Overdue'])
+@login_required
+def queue_export_view(request, report_type):
+    """Queue a report for rendering by the export worker"""
+    if request.method != 'POST':
+        return JsonResponse({'error': 'POST required'}, status=405)
+    if not getattr(request.user, 'profile', None):
+        return JsonResponse({'error': 'User profile not found'}, status=403)
 
-        for due in overdue_dues:
-            days_overdue = (today - due.due_date).days
-            writer.writerow([
-                str(due.house),
-                due.year,
-                due.month,
-                due.amount_due,
-                due.due_date,
-                days_overdue
-            ])
+    try:
+        job = queue_export(request.user, report_type, request.POST.get('format', 'csv'))
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
 
-        return response
+    return JsonResponse(_export_status(job), status=202)
 
-    elif export_format == 'pdf':
-        response = HttpResponse(content_type='application/pdf')
-        response['Content-Disposition'] = f'attachment; filename="overdue_dues_{today}.pdf"'
-
-        doc = SimpleDocTemplate(response, pagesize=letter)
-        elements = []
-
-        styles = getSampleStyleSheet()
-        elements.append(Paragraph("Overdue Membership Dues Report", styles['Heading1']))
-        elements.append(Paragraph(f"Generated on {today}", styles['Normal']))
-        elements.append(Paragraph("", styles['Normal']))
-
-        # Create table data
-        data = [['House', 'Year', 'Month', 'Amount Due', 'Due Date', 'Days Overdue']]
-        for due in overdue_dues:
-            days_overdue = (today - due.due_date).days
-            data.append([
-                str(due.house),
-                str(due.year),
-                str(due.month),
-                f"₹{due.amount_due}",
-                due.due_date.strftime('%Y-%m-%d'),
-                str(days_overdue)
-            ])
-
-        table = Table(data)
-        table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
-            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, 0), 14),
-            ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-            ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
-            ('GRID', (0, 0), (-1, -1), 1, colors.black)
-        ]))
-
-        elements.append(table)
-        doc.build(elements)
-
-        return response
+
+@login_required
+def export_status_view(request, export_id):
+    """Poll the status of a queued export"""
+    job = get_object_or_404(ReportExport, pk=export_id, user=request.user)
+    return JsonResponse(_export_status(job))
+
+
+@login_required
+def download_export_view(request, export_id):
+    """Download a completed export"""
+    job = get_object_or_404(ReportExport, pk=export_id, user=request.user)
+    if not job.is_ready:
+        return JsonResponse({'error': 'Export is not ready', **_export_status(job)}, status=409)
+    return FileResponse(
+        job.file_path.open('rb'),
+        as_attachment=True,
+        filename=os.path.basename(job.file_path.name),
+    )
+
+
+def _export_status(job):
+    data = {
+        'id': job.pk,
+        'report_name': job.report_name,
+        'format': job.export_type,
+        'status': job.status,
+        'created_at': job.created_at.isoformat(),
+        'expires_at': job.expires_at.isoformat(),
+        'status_url': reverse('home:export_status', args=[job.pk]),
+    }
+    if job.is_ready:
+        data['download_url'] = reverse('home:download_export', args=[job.pk])
+    if job.status == 'failed':
+        data['error'] = job.error
+    return data
 
 
 def redirect_finance_donation_create(request):
@@ -500,102 +450,189 @@ def redirect_finance_reports(request):
         return redirect('/cms/')
 
 
-def export_financial_summary_report(request):
-    """Export financial summary report"""
-    export_format = request.GET.get('format', 'csv')
-    today = timezone.now().date()
-    current_year = today.year
+@login_required
+def live_data_feed(request):
+    """API endpoint for live dashboard data
+
+    Responses carry an ETag of the payload content (timestamp excluded), and
+    a matching ``If-None-Match`` gets a 304. Passing a previous ETag value as
+    ``since`` returns only the changed fields as ``{"delta": true,
+    "changed": {...}, "removed": [...]}``; if that version is no longer
+    known the full payload is returned instead.
+    """
+    user_profile = getattr(request.user, 'profile', None)
+    if not user_profile:
+        return JsonResponse({'error': 'User profile not found'}, status=403)
 
-    # Get financial data
-    donations = Donation.objects.filter(date__year=current_year)
-    expenses = Expense.objects.filter(date__year=current_year)
-    payments = Payment.objects.filter(payment_date__year=current_year)
+    data_type = request.GET.get('type', 'summary')
+    builder = LIVE_DATA_PAYLOADS.get(data_type)
+    if builder is None:
+        return JsonResponse({'error': 'Invalid data type'}, status=400)
 
-    total_donations = donations.aggregate(total=Sum('amount'))['total'] or Decimal('0.00')
-    total_expenses = expenses.aggregate(total=Sum('amount'))['total'] or Decimal('0.00')
-    total_payments = payments.aggregate(total=Sum('amount'))['total'] or Decimal('0.00')
+    name = f'live:{data_type}'
+    payload = cached_payload(name, builder)
+    token = payload_token(name, payload)
+    etag = f'"{token}"'
+
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        since = request.GET.get('since', '').strip('"')
+        previous = get_payload_snapshot(name, since) if since else None
+        if previous is not None:
+            data = {'delta': True, **_live_delta(previous, payload)}
+        else:
+            data = dict(payload)
+        data['timestamp'] = timezone.now().isoformat()
+        response = JsonResponse(data)
+
+    response['ETag'] = etag
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+
+def _live_summary_payload():
+    kpis = get_dashboard_kpis('summary')
+    return {
+        'total_houses': kpis['total_houses'],
+        'total_members': kpis['total_members'],
+        'total_donations': float(kpis['total_donations']),
+        'total_dues_collected': float(kpis['total_dues_collected']),
+        'active_classes': kpis['active_classes'],
+        'upcoming_bookings': kpis['upcoming_bookings'],
+    }
 
-    if export_format == 'csv':
-        response = HttpResponse(content_type='text/csv')
-        response['Content-Disposition'] = f'attachment; filename="financial_summary_{current_year}.csv"'
 
-        writer = csv.writer(response)
-        writer.writerow(['Category', 'Amount'])
-        writer.writerow(['Total Donations', total_donations])
-        writer.writerow(['Total Expenses', total_expenses])
-        writer.writerow(['Total Membership Payments', total_payments])
-        writer.writerow(['Net Income', total_donations + total_payments - total_expenses])
+def _live_financial_payload():
+    kpis = get_dashboard_kpis('financial')
+    return {
+        'monthly_donations': float(kpis['monthly_donations']),
+        'monthly_expenses': float(kpis['monthly_expenses']),
+        'monthly_dues': float(kpis['monthly_dues_collected']),
+        'monthly_net': float(kpis['monthly_net']),
+    }
 
-        return response
 
-    return JsonResponse({'error': 'Format not implemented'}, status=400)
+# Live feed payload type -> builder. Payloads are cached per dashboard data
+# version and exclude the timestamp, which is added per response.
+LIVE_DATA_PAYLOADS = {
+    'summary': _live_summary_payload,
+    'financial': _live_financial_payload,
+}
 
+# Seconds between keep-alive comments on an idle stream
+LIVE_STREAM_HEARTBEAT = 15
+# Streams are closed after this many seconds; EventSource reconnects with
+# Last-Event-ID and receives a delta, so nothing is missed.
+LIVE_STREAM_MAX_AGE = 300
+# EventSource reconnect delay (ms); also the poll interval under WSGI
+LIVE_STREAM_RETRY = 30000
 
-def export_membership_summary_report(request):
-    """Export membership summary report"""
-    export_format = request.GET.get('format', 'csv')
-    today = timezone.now().date()
 
-    houses = HouseRegistration.objects.all()
-    members = Member.objects.filter(is_active=True)
+def _live_delta(previous, payload):
+    return {
+        'changed': {key: value for key, value in payload.items() if previous.get(key) != value},
+        'removed': [key for key in previous if key not in payload],
+    }
 
-    if export_format == 'csv':
-        response = HttpResponse(content_type='text/csv')
-        response['Content-Disposition'] = f'attachment; filename="membership_summary_{today}.csv"'
 
-        writer = csv.writer(response)
-        writer.writerow(['Metric', 'Count'])
-        writer.writerow(['Total Houses', houses.count()])
-        writer.writerow(['Total Active Members', members.count()])
-        writer.writerow(['Male Members', members.filter(gender='M').count()])
-        writer.writerow(['Female Members', members.filter(gender='F').count()])
+def _sse_message(event, data, event_id=None):
+    lines = [f'id: {event_id}'] if event_id else []
+    lines.append(f'event: {event}')
+    lines.append(f'data: {json.dumps(data, cls=DjangoJSONEncoder)}')
+    return '\n'.join(lines) + '\n\n'
 
-        return response
 
-    return JsonResponse({'error': 'Format not implemented'}, status=400)
+def _current_live_payload(name, builder):
+    payload = cached_payload(name, builder)
+    return payload, payload_token(name, payload)
 
 
-@login_required
-def live_data_feed(request):
-    """API endpoint for live dashboard data"""
-    user_profile = getattr(request.user, 'profile', None)
+def _live_payload_message(name, builder, last_token=None):
+    """First message of a stream: a delta against ``last_token`` if it is still known"""
+    payload, token = _current_live_payload(name, builder)
+    previous = get_payload_snapshot(name, last_token) if last_token else None
+    timestamp = timezone.now().isoformat()
+    if previous is not None:
+        message = _sse_message('delta', {**_live_delta(previous, payload), 'timestamp': timestamp}, token)
+    else:
+        message = _sse_message('snapshot', {**payload, 'timestamp': timestamp}, token)
+    return message, payload, token
+
+
+def _live_stream_state():
+    return get_dashboard_version(), timezone.localdate()
+
+
+async def _live_event_stream(name, builder, last_token=None):
+    """Yield SSE messages: the current payload, then a delta per change"""
+    subscription = broker.subscribe()
+    try:
+        message, payload, token = await sync_to_async(_live_payload_message)(name, builder, last_token)
+        yield f'retry: {LIVE_STREAM_RETRY}\n\n'
+        yield message
+
+        state = await sync_to_async(_live_stream_state)()
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + LIVE_STREAM_MAX_AGE
+        while loop.time() < deadline:
+            event = await subscription.wait(LIVE_STREAM_HEARTBEAT)
+            # The cache version also catches changes made in other workers
+            current_state = await sync_to_async(_live_stream_state)()
+            if event is None and current_state == state:
+                yield ': keep-alive\n\n'
+                continue
+            state = current_state
+
+            new_payload, new_token = await sync_to_async(_current_live_payload)(name, builder)
+            if new_token != token:
+                delta = {**_live_delta(payload, new_payload), 'timestamp': timezone.now().isoformat()}
+                yield _sse_message('delta', delta, new_token)
+                payload, token = new_payload, new_token
+    finally:
+        subscription.close()
+
+
+def _get_stream_profile(request):
+    if not request.user.is_authenticated:
+        return None, False
+    return getattr(request.user, 'profile', None), True
+
+
+async def live_data_stream(request):
+    """Server-Sent Events stream of live dashboard data
+
+    Sends a ``snapshot`` event with the full payload (or a ``delta`` when
+    reconnecting with a known ``Last-Event-ID``), then a ``delta`` event
+    whenever a dashboard source row changes. Event ids are the same content
+    tokens used as ETags by ``live_data_feed``.
+
+    Under WSGI a long-lived stream would tie up a worker, so only the first
+    event is sent and the browser reconnects after ``retry`` milliseconds,
+    which degrades to polling at the old interval.
+    """
+    user_profile, authenticated = await sync_to_async(_get_stream_profile)(request)
+    if not authenticated:
+        return redirect_to_login(request.get_full_path())
     if not user_profile:
         return JsonResponse({'error': 'User profile not found'}, status=403)
 
     data_type = request.GET.get('type', 'summary')
+    builder = LIVE_DATA_PAYLOADS.get(data_type)
+    if builder is None:
+        return JsonResponse({'error': 'Invalid data type'}, status=400)
 
-    if data_type == 'summary':
-        data = {
-            'total_houses': HouseRegistration.objects.count(),
-            'total_members': Member.objects.filter(is_active=True).count(),
-            'total_donations': float(Donation.objects.aggregate(total=Sum('amount'))['total'] or 0),
-            'total_dues_collected': float(Payment.objects.aggregate(total=Sum('amount'))['total'] or 0),
-            'active_classes': Class.objects.filter(is_active=True).count(),
-            'upcoming_bookings': AuditoriumBooking.objects.filter(
-                booking_date__gte=timezone.now().date(),
-                status='approved'
-            ).count(),  # Count query doesn't need select_related
-            'timestamp': timezone.now().isoformat(),
-        }
-    elif data_type == 'financial':
-        today = timezone.now().date()
-        month_start = today.replace(day=1)
-
-        monthly_donations = Donation.objects.filter(date__gte=month_start).aggregate(total=Sum('amount'))['total'] or 0
-        monthly_expenses = Expense.objects.filter(date__gte=month_start).aggregate(total=Sum('amount'))['total'] or 0
-        monthly_dues = Payment.objects.filter(payment_date__gte=month_start).aggregate(total=Sum('amount'))['total'] or 0
-
-        data = {
-            'monthly_donations': float(monthly_donations),
-            'monthly_expenses': float(monthly_expenses),
-            'monthly_dues': float(monthly_dues),
-            'monthly_net': float(monthly_dues + monthly_donations - monthly_expenses),
-            'timestamp': timezone.now().isoformat(),
-        }
+    name = f'live:{data_type}'
+    last_token = request.headers.get('Last-Event-ID')
+    if isinstance(request, ASGIRequest):
+        stream = _live_event_stream(name, builder, last_token)
     else:
-        return JsonResponse({'error': 'Invalid data type'}, status=400)
+        message, _payload, _token = await sync_to_async(_live_payload_message)(name, builder, last_token)
+        stream = [f'retry: {LIVE_STREAM_RETRY}\n\n', message]
 
-    return JsonResponse(data)
+    response = StreamingHttpResponse(stream, content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
 
 
 @login_required
@@ -0,0 +1,152 @@
+"""Per-house outstanding balances.
+
+``HouseBalance`` holds what each house owes: its unpaid dues (amount,
+count and oldest), the unpaid amount of its open invoices and the date of
+its last payment. ``refresh_house_balances`` recomputes the rows of a set
+of houses with four grouped queries and one upsert per batch of houses,
+whatever the number of dues.
+
+``generate_dues`` and ``settle_dues`` refresh the houses they touch; the
+signals in ``membership.signals`` refresh a house, after commit, when one
+of its dues or invoices, or a payment by its members or for its dues, is
+saved or deleted. Inside
+``deferred_house_balances`` those refreshes are collected and run once when
+the block ends. ``manage.py rebuild_house_balances`` rebuilds every row.
+"""
+import threading
+from contextlib import contextmanager
+from decimal import Decimal
+from itertools import islice
+
+from django.db import connection, transaction
+from django.db.models import Count, F, Max, Min, Sum
+from django.utils import timezone
+
+from .models import HouseBalance, HouseRegistration, MembershipDues, Payment
+
+DEFAULT_BATCH_SIZE = 500
+
+UPDATE_FIELDS = [
+    "outstanding_dues", "months_in_arrears", "oldest_unpaid_due", "invoice_balance",
+    "total_outstanding", "last_payment_date", "refreshed_at",
+]
+
+
+def _amount(value):
+    # SQLite drops the scale of summed decimals
+    return Decimal(value or 0).quantize(Decimal("0.01"))
+
+
+def _refresh_batch(house_ids):
+    from billing.models import Invoice
+
+    dues = {
+        row["house"]: row
+        for row in MembershipDues.objects.filter(house_id__in=house_ids, is_paid=False)
+        .order_by()
+        .values("house")
+        .annotate(amount=Sum("amount_due"), count=Count("id"), oldest=Min("due_date"))
+    }
+    invoices = dict(
+        Invoice.objects.filter(house_id__in=house_ids, total_amount__gt=F("amount_paid"))
+        .exclude(status="cancelled")
+        .order_by()
+        .values("house")
+        .annotate(balance=Sum(F("total_amount") - F("amount_paid")))
+        .values_list("house", "balance")
+    )
+    # A bulk payment is made by a member of one house but settles the dues
+    # of several, so payments count for the houses of the dues they cover
+    # as well as the payer's house
+    payments = dict(
+        Payment.objects.filter(member__house_id__in=house_ids)
+        .order_by()
+        .values("member__house")
+        .annotate(last=Max("payment_date"))
+        .values_list("member__house", "last")
+    )
+    for house_id, last in (
+        Payment.objects.filter(membership_dues__house_id__in=house_ids)
+        .order_by()
+        .values("membership_dues__house")
+        .annotate(last=Max("payment_date"))
+        .values_list("membership_dues__house", "last")
+    ):
+        if house_id not in payments or last > payments[house_id]:
+            payments[house_id] = last
+
+    now = timezone.now()
+    rows = []
+    for house_id in house_ids:
+        due = dues.get(house_id, {})
+        outstanding = _amount(due.get("amount"))
+        invoice_balance = _amount(invoices.get(house_id))
+        rows.append(HouseBalance(
+            house_id=house_id,
+            outstanding_dues=outstanding,
+            months_in_arrears=due.get("count", 0),
+            oldest_unpaid_due=due.get("oldest"),
+            invoice_balance=invoice_balance,
+            total_outstanding=outstanding + invoice_balance,
+            last_payment_date=payments.get(house_id),
+            refreshed_at=now,
+        ))
+    # MySQL upserts on any unique key and rejects a conflict target
+    unique_fields = ["house"] if connection.features.supports_update_conflicts_with_target else None
+    HouseBalance.objects.bulk_create(
+        rows, update_conflicts=True, unique_fields=unique_fields, update_fields=UPDATE_FIELDS
+    )
+    return len(rows)
+
+
+def refresh_house_balances(house_ids=None, batch_size=DEFAULT_BATCH_SIZE):
+    """Recompute the balances of ``house_ids`` (every house when None). Returns the number of rows written."""
+    if house_ids is None:
+        house_ids = HouseRegistration.objects.order_by("pk").values_list("pk", flat=True).iterator(batch_size)
+        existing = None
+    else:
+        house_ids = iter(sorted(set(house_ids)))
+        existing = HouseRegistration.objects.order_by("pk").values_list("pk", flat=True)
+    written = 0
+    while True:
+        batch = list(islice(house_ids, batch_size))
+        if not batch:
+            break
+        if existing is not None:
+            # Houses deleted since their ids were queued
+            batch = list(existing.filter(pk__in=batch))
+        if batch:
+            written += _refresh_batch(batch)
+    return written
+
+
+_pending = threading.local()
+
+
+def queue_house_balances(house_ids):
+    """Refresh ``house_ids`` when the enclosing ``deferred_house_balances`` block ends, else on commit."""
+    house_ids = {house_id for house_id in house_ids if house_id is not None}
+    if not house_ids:
+        return
+    pending = getattr(_pending, "house_ids", None)
+    if pending is not None:
+        pending.update(house_ids)
+    else:
+        # After commit, so a house deleted with its dues is not given a new row
+        transaction.on_commit(lambda: refresh_house_balances(house_ids))
+
+
+@contextmanager
+def deferred_house_balances():
+    """Collect the balance refreshes queued inside the block and run them once, inside it, when it succeeds."""
+    if getattr(_pending, "house_ids", None) is not None:
+        yield
+        return
+    _pending.house_ids = set()
+    try:
+        yield
+        house_ids = _pending.house_ids
+    finally:
+        _pending.house_ids = None
+    if house_ids:
+        refresh_house_balances(house_ids)
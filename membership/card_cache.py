@@ -0,0 +1,192 @@
+"""On-disk cache of membership card QR codes and card PDFs.
+
+Entries are content addressed: the key is a SHA-256 of everything the
+rendered bytes depend on (the card fields, the photo's file hash and
+``CARD_TEMPLATE_VERSION``), so a changed member or photo simply misses and
+stale entries are never served. Files live under
+``MEDIA_ROOT/card_cache/<kind>/`` and their modification time doubles as
+the last-used time: a hit touches the file. Each process keeps a running
+estimate of the cache size, read from disk once and raised by every write;
+only when it passes ``MEMBERSHIP_CARD_CACHE_MAX_BYTES`` (0 disables the
+cache) is the directory scanned and the least recently used files deleted,
+down to ``EVICT_TO`` of the limit.
+"""
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+from pathlib import Path
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+# Bump when the card layout or QR payload changes, so old renders are not reused
+CARD_TEMPLATE_VERSION = 1
+
+CACHE_DIR = "card_cache"
+KIND_SUFFIXES = {"qr": ".png", "card": ".pdf"}
+# Eviction frees space down to this share of the limit, so the next
+# writes do not each trigger another scan
+EVICT_TO = 0.9
+
+
+def get_cache_max_bytes():
+    return getattr(settings, "MEMBERSHIP_CARD_CACHE_MAX_BYTES", 256 * 1024 * 1024)
+
+
+def photo_hash(member):
+    """Hash of the member's photo file, or "" without a photo"""
+    if not member.photo_id:
+        return ""
+    photo = member.photo
+    # Wagtail fills file_hash on upload; fall back to the file name for older images
+    return photo.file_hash or f"{photo.pk}:{photo.file.name}"
+
+
+def cache_key(*parts):
+    """Hex SHA-256 of ``parts`` (JSON-serialisable) and the card template version"""
+    payload = json.dumps([CARD_TEMPLATE_VERSION, *parts], sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class CardCache:
+    """Size-bounded LRU file cache of card renders under ``root``"""
+
+    def __init__(self, root=None, max_bytes=None):
+        self.root = Path(root or Path(settings.MEDIA_ROOT) / CACHE_DIR)
+        self.max_bytes = get_cache_max_bytes() if max_bytes is None else max_bytes
+        # Estimated bytes on disk; None until first needed
+        self._size = None
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self):
+        return self.max_bytes > 0
+
+    def path(self, kind, key):
+        return self.root / kind / f"{key}{KIND_SUFFIXES[kind]}"
+
+    def get(self, kind, key):
+        """Cached bytes of ``key``, or None on a miss"""
+        if not self.enabled:
+            return None
+        path = self.path(kind, key)
+        try:
+            data = path.read_bytes()
+        except FileNotFoundError:
+            return None
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            # Evicted by another process since it was read
+            pass
+        return data
+
+    def set(self, kind, key, data):
+        """Store ``data`` under ``key``, evicting old entries if the cache grows past its limit"""
+        if not self.enabled:
+            return
+        path = self.path(kind, key)
+        temp_path = None
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            # Written aside and renamed, so readers never see a partial file
+            fd, temp_path = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(temp_path, path)
+        except OSError as e:
+            logger.warning(f"Could not write card cache entry {path}: {e}")
+            if temp_path is not None:
+                try:
+                    os.remove(temp_path)
+                except FileNotFoundError:
+                    pass
+            return
+        with self._lock:
+            if self._size is None:
+                self._size = self.size()
+            else:
+                self._size += len(data)
+            full = self._size > self.max_bytes
+        if full:
+            self.evict()
+
+    def get_or_render(self, kind, key, render):
+        """Cached bytes of ``key``, calling ``render()`` and storing its result on a miss"""
+        data = self.get(kind, key)
+        if data is None:
+            data = render()
+            self.set(kind, key, data)
+        return data
+
+    def _entries(self):
+        entries = []
+        for kind, suffix in KIND_SUFFIXES.items():
+            directory = self.root / kind
+            if not directory.is_dir():
+                continue
+            with os.scandir(directory) as it:
+                for entry in it:
+                    if not entry.name.endswith(suffix):
+                        continue
+                    try:
+                        stat = entry.stat()
+                    except FileNotFoundError:
+                        continue
+                    entries.append((stat.st_mtime, stat.st_size, entry.path))
+        return entries
+
+    def size(self):
+        """Total bytes of the cached files"""
+        return sum(size for _mtime, size, _path in self._entries())
+
+    def evict(self):
+        """Delete the least recently used files if the cache is over its limit. Returns the number deleted."""
+        if not self.enabled:
+            return 0
+        entries = self._entries()
+        total = sum(size for _mtime, size, _path in entries)
+        target = self.max_bytes * EVICT_TO if total > self.max_bytes else total
+        deleted = 0
+        for _mtime, size, path in sorted(entries):
+            if total <= target:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+            deleted += 1
+        with self._lock:
+            self._size = total
+        return deleted
+
+    def clear(self):
+        """Delete every cached file. Returns the number deleted."""
+        deleted = 0
+        for _mtime, _size, path in self._entries():
+            try:
+                os.remove(path)
+                deleted += 1
+            except FileNotFoundError:
+                pass
+        with self._lock:
+            self._size = None
+        return deleted
+
+
+_caches = {}
+
+
+def get_card_cache():
+    """The process-wide cache for the current ``MEDIA_ROOT`` and size limit"""
+    root = Path(settings.MEDIA_ROOT) / CACHE_DIR
+    max_bytes = get_cache_max_bytes()
+    cache = _caches.get((root, max_bytes))
+    if cache is None:
+        cache = _caches.setdefault((root, max_bytes), CardCache(root, max_bytes))
+    return cache
@@ -0,0 +1,41 @@
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from membership.services import DEFAULT_BATCH_SIZE, generate_dues
+
+
+def parse_month(value):
+    try:
+        parsed = datetime.strptime(value, '%Y-%m')
+    except ValueError:
+        raise CommandError(f'Invalid month "{value}", expected YYYY-MM')
+    return parsed.year, parsed.month
+
+
+class Command(BaseCommand):
+    help = 'Generate membership dues for every house for one month or a range of months'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--month', help='First month to generate (YYYY-MM, default: current month)')
+        parser.add_argument('--through', help='Last month to generate (YYYY-MM, default: same as --month)')
+        parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE,
+                            help=f'Rows per INSERT (default: {DEFAULT_BATCH_SIZE})')
+
+    def handle(self, *args, **options):
+        today = timezone.now().date()
+        start = parse_month(options['month']) if options['month'] else (today.year, today.month)
+        end = parse_month(options['through']) if options['through'] else start
+
+        def report_batch(number, rows, seconds):
+            self.stdout.write(f'Batch {number}: {rows} rows in {seconds * 1000:.1f} ms')
+
+        try:
+            result = generate_dues(start, end, batch_size=options['batch_size'], on_batch=report_batch)
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Generated {result} at ₹{result.amount} in {result.elapsed:.2f}s'
+        ))
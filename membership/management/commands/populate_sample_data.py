@@ -1,5 +1,6 @@
 import random
 from accounting.models import Account, AccountCategory, Transaction, JournalEntry
+from accounting.outbox import batch_posting
 from billing.models import Invoice, InvoiceLineItem, BillingPayment
 from wagtail.signal_handlers import disable_reference_index_auto_update
 from datetime import date, time, timedelta
@@ -37,7 +38,8 @@ class Command(BaseCommand):
     help = 'Populate database with sample data for all MMS modules'
 
     def handle(self, *args, **options):
-        with disable_reference_index_auto_update():
+        # Documents created here are posted to the ledger in one batch at the end
+        with disable_reference_index_auto_update(), batch_posting():
             self.stdout.write('Starting sample data population...')
 
             # Create sample data for each module
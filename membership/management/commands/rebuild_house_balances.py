@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from membership.balances import DEFAULT_BATCH_SIZE, refresh_house_balances
+
+
+class Command(BaseCommand):
+    help = 'Recompute the outstanding balance of every house from its dues, invoices and payments'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE,
+                            help=f'Houses per batch (default: {DEFAULT_BATCH_SIZE})')
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            count = refresh_house_balances(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt the balances of {count} houses'))
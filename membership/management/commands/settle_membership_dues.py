@@ -0,0 +1,95 @@
+import csv
+import sys
+from datetime import datetime
+
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+
+from membership.models import HouseRegistration, Payment
+from membership.services import settle_dues
+
+PAYMENT_METHODS = {method for method, _label in Payment.PAYMENT_METHOD_CHOICES}
+
+
+class Command(BaseCommand):
+    help = (
+        'Settle unpaid membership dues from a cash-collection CSV. Each row creates one '
+        'payment for a house; columns: house_id or house_number, payment_method, and '
+        'optionally payment_date (YYYY-MM-DD), through (YYYY-MM) and notes'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('csv_file', help='Path to the CSV file, or - for stdin')
+        parser.add_argument('--method', choices=sorted(PAYMENT_METHODS),
+                            help='Payment method for rows that do not specify one')
+
+    def handle(self, *args, **options):
+        if options['csv_file'] == '-':
+            rows = list(csv.DictReader(sys.stdin))
+        else:
+            try:
+                with open(options['csv_file'], newline='', encoding='utf-8-sig') as f:
+                    rows = list(csv.DictReader(f))
+            except OSError as e:
+                raise CommandError(f'Cannot read {options["csv_file"]}: {e}')
+
+        house_numbers = self._house_numbers(rows)
+        settled = failed = 0
+        for line, row in enumerate(rows, start=2):
+            try:
+                result = self._settle_row(row, house_numbers, options['method'])
+            except (ValidationError, ValueError) as e:
+                failed += 1
+                message = '; '.join(e.messages) if isinstance(e, ValidationError) else str(e)
+                self.stderr.write(self.style.ERROR(f'Line {line}: {message}'))
+                continue
+
+            if result is None:
+                self.stdout.write(f'Line {line}: no unpaid dues')
+            else:
+                settled += 1
+                self.stdout.write(f'Line {line}: {result}')
+
+        summary = f'Settled {settled} of {len(rows)} rows'
+        if failed:
+            raise CommandError(f'{summary}; {failed} rows failed')
+        self.stdout.write(self.style.SUCCESS(summary))
+
+    def _house_numbers(self, rows):
+        """house_number -> house ids, resolved with one query for the whole file"""
+        numbers = {row['house_number'].strip() for row in rows if (row.get('house_number') or '').strip()}
+        mapping = {}
+        for house_number, pk in HouseRegistration.objects.filter(
+            house_number__in=numbers
+        ).values_list('house_number', 'pk'):
+            mapping.setdefault(house_number, []).append(pk)
+        return mapping
+
+    def _settle_row(self, row, house_numbers, default_method):
+        house_id = (row.get('house_id') or '').strip()
+        house_number = (row.get('house_number') or '').strip()
+        if not house_id:
+            matches = house_numbers.get(house_number, [])
+            if len(matches) != 1:
+                raise ValueError(
+                    f'House number "{house_number}" matches {len(matches)} houses; use house_id'
+                )
+            house_id = matches[0]
+
+        payment_method = (row.get('payment_method') or '').strip() or default_method
+        if payment_method not in PAYMENT_METHODS:
+            raise ValueError(f'Invalid payment method "{payment_method}"')
+
+        payment_date = (row.get('payment_date') or '').strip()
+        through = (row.get('through') or '').strip()
+        if through:
+            parsed = datetime.strptime(through, '%Y-%m')
+            through = (parsed.year, parsed.month)
+
+        return settle_dues(
+            [house_id],
+            payment_method,
+            payment_date=datetime.strptime(payment_date, '%Y-%m-%d').date() if payment_date else None,
+            notes=(row.get('notes') or '').strip() or 'Cash collection upload',
+            through=through or None,
+        )
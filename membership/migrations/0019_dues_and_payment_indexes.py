@@ -0,0 +1,30 @@
+# Generated by Django 4.2.30 on 2026-10-17 22:21
+
+from django.db import migrations, models
+import membership.models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('membership', '0018_receiptsequence'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='membershipdues',
+            index=membership.models.PartialIndex(condition=models.Q(('is_paid', False)), fields=['due_date'], name='dues_unpaid_due_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='membershipdues',
+            index=membership.models.PartialIndex(condition=models.Q(('is_paid', False)), fields=['house', 'due_date'], name='dues_unpaid_house_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='membershipdues',
+            index=models.Index(fields=['year', 'month'], name='dues_year_month_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='payment',
+            index=models.Index(fields=['payment_date', 'created_at'], name='payment_date_created_idx'),
+        ),
+    ]
@@ -0,0 +1,86 @@
+# Generated by Django 4.2.30 on 2026-10-17 22:26
+
+from decimal import Decimal
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+def populate_house_balances(apps, schema_editor):
+    # Same figures as membership.balances, from the historical models
+    Invoice = apps.get_model("billing", "Invoice")
+    HouseBalance = apps.get_model("membership", "HouseBalance")
+    MembershipDues = apps.get_model("membership", "MembershipDues")
+    Payment = apps.get_model("membership", "Payment")
+    db_alias = schema_editor.connection.alias
+
+    dues = (
+        MembershipDues.objects.using(db_alias).filter(is_paid=False).order_by().values("house")
+        .annotate(amount=models.Sum("amount_due"), count=models.Count("id"), oldest=models.Min("due_date"))
+    )
+    balances = {
+        row["house"]: HouseBalance(
+            house_id=row["house"],
+            outstanding_dues=Decimal(row["amount"]).quantize(Decimal("0.01")),
+            total_outstanding=Decimal(row["amount"]).quantize(Decimal("0.01")),
+            months_in_arrears=row["count"],
+            oldest_unpaid_due=row["oldest"],
+        )
+        for row in dues
+    }
+    payments = (
+        Payment.objects.using(db_alias).exclude(member__house=None).order_by().values("member__house")
+        .annotate(last=models.Max("payment_date"))
+    )
+    for row in payments:
+        balance = balances.setdefault(row["member__house"], HouseBalance(house_id=row["member__house"]))
+        balance.last_payment_date = row["last"]
+    # Payments also count for the houses of the dues they cover
+    covered = (
+        Payment.objects.using(db_alias).filter(membership_dues__isnull=False).order_by()
+        .values("membership_dues__house").annotate(last=models.Max("payment_date"))
+    )
+    for row in covered:
+        balance = balances.setdefault(row["membership_dues__house"], HouseBalance(house_id=row["membership_dues__house"]))
+        if balance.last_payment_date is None or row["last"] > balance.last_payment_date:
+            balance.last_payment_date = row["last"]
+    invoices = (
+        Invoice.objects.using(db_alias).exclude(house=None).exclude(status="cancelled")
+        .filter(total_amount__gt=models.F("amount_paid")).order_by().values("house")
+        .annotate(balance=models.Sum(models.F("total_amount") - models.F("amount_paid")))
+    )
+    for row in invoices:
+        balance = balances.setdefault(row["house"], HouseBalance(house_id=row["house"]))
+        balance.invoice_balance = Decimal(row["balance"]).quantize(Decimal("0.01"))
+        balance.total_outstanding = balance.outstanding_dues + balance.invoice_balance
+    HouseBalance.objects.using(db_alias).bulk_create(balances.values(), batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('billing', '0002_invoice_house_and_migrate_from_family'),
+        ('membership', '0019_dues_and_payment_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='HouseBalance',
+            fields=[
+                ('house', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='balance', serialize=False, to='membership.houseregistration')),
+                ('outstanding_dues', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=12)),
+                ('months_in_arrears', models.PositiveIntegerField(default=0, help_text='Number of unpaid dues')),
+                ('oldest_unpaid_due', models.DateField(blank=True, null=True)),
+                ('invoice_balance', models.DecimalField(decimal_places=2, default=Decimal('0.00'), help_text='Unpaid amount of open invoices', max_digits=12)),
+                ('total_outstanding', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=12)),
+                ('last_payment_date', models.DateField(blank=True, null=True)),
+                ('refreshed_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'verbose_name': 'House Balance',
+                'verbose_name_plural': 'House Balances',
+                'indexes': [models.Index(fields=['months_in_arrears'], name='house_balance_arrears_idx'), models.Index(fields=['total_outstanding'], name='house_balance_total_idx')],
+            },
+        ),
+        migrations.RunPython(populate_house_balances, migrations.RunPython.noop),
+    ]
@@ -2,12 +2,37 @@ import logging
 from decimal import Decimal
 
 from django.core.exceptions import ValidationError
-from django.db import models
+from django.db import IntegrityError, models, transaction
+from django.db.models import F, Q
 from django.utils import timezone
 
 logger = logging.getLogger(__name__)
 
 
+class PartialIndex(models.Index):
+    """Index limited to the rows matching ``condition``.
+
+    Backends without partial indexes (MySQL) ignore the condition, so there
+    the fields the condition tests lead a plain composite index instead,
+    e.g. ``(is_paid, due_date)`` for unpaid dues by due date.
+    """
+
+    def condition_fields(self):
+        return [
+            child[0].split("__")[0]
+            for child in self.condition.children
+            if isinstance(child, tuple) and child[0].split("__")[0] not in self.fields
+        ]
+
+    def create_sql(self, model, schema_editor, using="", **kwargs):
+        if schema_editor.connection.features.supports_partial_indexes:
+            return super().create_sql(model, schema_editor, using=using, **kwargs)
+        composite = models.Index(
+            fields=[*self.condition_fields(), *self.fields], name=self.name, db_tablespace=self.db_tablespace
+        )
+        return composite.create_sql(model, schema_editor, using=using, **kwargs)
+
+
 class Ward(models.Model):
     name = models.CharField(max_length=50, unique=True)
     created_at = models.DateTimeField(default=timezone.now)
@@ -273,12 +298,29 @@ class MembershipDues(models.Model):
     class Meta:
         unique_together = ["house", "year", "month"]
         ordering = ["-year", "-month", "house__house_name", "house__house_number"]
+        indexes = [
+            # Overdue report and exports: unpaid dues by due date
+            PartialIndex(fields=["due_date"], condition=Q(is_paid=False), name="dues_unpaid_due_date_idx"),
+            # Settling and listing a house's unpaid dues
+            PartialIndex(fields=["house", "due_date"], condition=Q(is_paid=False), name="dues_unpaid_house_idx"),
+            # Dues generation and the default ordering; unique_together leads with house
+            models.Index(fields=["year", "month"], name="dues_year_month_idx"),
+        ]
         verbose_name = "Membership Due"
         verbose_name_plural = "Membership Dues"
 
     def __str__(self):
         return f"{self.house} - {self.year}-{self.month:02d} (₹{self.amount_due})"
 
+    @classmethod
+    def check(cls, **kwargs):
+        errors = super().check(**kwargs)
+        # The conditional indexes are PartialIndex, which falls back to a
+        # composite index instead of ignoring the condition
+        if all(isinstance(index, PartialIndex) for index in cls._meta.indexes if index.condition is not None):
+            errors = [error for error in errors if error.id != "models.W037"]
+        return errors
+
     def clean(self):
         if self.amount_due <= 0:
             raise ValidationError("Amount due must be greater than zero")
@@ -292,34 +334,9 @@ class MembershipDues(models.Model):
 
         # Use system setting for default amount if new and amount is default
         if self.pk is None and self.amount_due == Decimal("10.00"):
-            from wagtail.models import Site
-
-            from home.models import SystemSettings
-
-            try:
-                # Try to get the default site
-                site = Site.objects.filter(is_default_site=True).first()
-                if not site:
-                    site = Site.objects.first()
-
-                if site:
-                    settings = SystemSettings.for_site(site)
-                    self.amount_due = settings.monthly_membership_dues
-            except (
-                SystemSettings.DoesNotExist,
-                Site.DoesNotExist,
-                AttributeError,
-            ) as e:
-                # Fallback to hardcoded default if any issues with settings/site
-                logger.warning(
-                    f"Could not load system settings for membership dues, using default: {e}"
-                )
-            except Exception as e:
-                # Catch any other unexpected errors
-                logger.error(
-                    f"Unexpected error loading system settings for membership dues: {e}",
-                    exc_info=True,
-                )
+            from .services import get_monthly_dues_amount
+
+            self.amount_due = get_monthly_dues_amount()
 
         super().save(*args, **kwargs)
 
@@ -329,6 +346,88 @@ class MembershipDues(models.Model):
         return not self.is_paid and self.due_date < timezone.now().date()
 
 
+class HouseBalance(models.Model):
+    """What a house owes, kept current by ``membership.balances``.
+
+    Refreshed from the unpaid dues, open invoices and payments of the house
+    whenever dues are generated or settled and when a due, payment or
+    invoice is saved or deleted, so lists can sort and filter houses by
+    arrears without aggregating. Houses without a row owe nothing.
+    """
+
+    house = models.OneToOneField(
+        HouseRegistration, on_delete=models.CASCADE, primary_key=True, related_name="balance"
+    )
+    outstanding_dues = models.DecimalField(max_digits=12, decimal_places=2, default=Decimal("0.00"))
+    months_in_arrears = models.PositiveIntegerField(default=0, help_text="Number of unpaid dues")
+    oldest_unpaid_due = models.DateField(null=True, blank=True)
+    invoice_balance = models.DecimalField(
+        max_digits=12, decimal_places=2, default=Decimal("0.00"), help_text="Unpaid amount of open invoices"
+    )
+    total_outstanding = models.DecimalField(max_digits=12, decimal_places=2, default=Decimal("0.00"))
+    last_payment_date = models.DateField(null=True, blank=True)
+    refreshed_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["months_in_arrears"], name="house_balance_arrears_idx"),
+            models.Index(fields=["total_outstanding"], name="house_balance_total_idx"),
+        ]
+        verbose_name = "House Balance"
+        verbose_name_plural = "House Balances"
+
+    def __str__(self):
+        return f"{self.house} - ₹{self.total_outstanding} ({self.months_in_arrears} months)"
+
+
+class ReceiptSequence(models.Model):
+    """Counter behind receipt numbers, one row per receipt prefix (per day).
+
+    Numbers are handed out by incrementing ``last_number`` with a single
+    ``UPDATE ... SET last_number = last_number + n``. The row stays locked
+    until the surrounding transaction ends, so concurrent cashiers queue on
+    this one row instead of racing on the ``Payment.receipt_number`` unique
+    constraint.
+    """
+
+    prefix = models.CharField(max_length=20, unique=True)
+    last_number = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.prefix} (last {self.last_number})"
+
+    class Meta:
+        verbose_name = "Receipt Sequence"
+        verbose_name_plural = "Receipt Sequences"
+
+    @classmethod
+    def allocate(cls, prefix, count=1):
+        """Reserve ``count`` consecutive numbers for ``prefix`` and return them as a range."""
+        if count < 1:
+            raise ValueError("count must be at least 1")
+        with transaction.atomic():
+            if not cls.objects.filter(prefix=prefix).update(last_number=F("last_number") + count):
+                try:
+                    with transaction.atomic():
+                        cls.objects.create(prefix=prefix, last_number=cls._highest_issued(prefix) + count)
+                except IntegrityError:
+                    # Another session created the row first; take the next numbers after theirs
+                    cls.objects.filter(prefix=prefix).update(last_number=F("last_number") + count)
+            last = cls.objects.filter(prefix=prefix).values_list("last_number", flat=True).get()
+        return range(last - count + 1, last + 1)
+
+    @staticmethod
+    def _highest_issued(prefix):
+        # Receipts issued before this sequence row existed (e.g. earlier the
+        # same day, before the upgrade); only read when a day's row is created.
+        receipts = Payment.objects.filter(receipt_number__startswith=f"{prefix}-").values_list(
+            "receipt_number", flat=True
+        )
+        suffixes = (number.rsplit("-", 1)[-1] for number in receipts)
+        # Manually entered receipts may not end in a number; they cannot clash
+        return max((int(suffix) for suffix in suffixes if suffix.isdigit()), default=0)
+
+
 class Payment(models.Model):
     PAYMENT_METHOD_CHOICES = [
         ("cash", "Cash"),
@@ -364,6 +463,7 @@ class Payment(models.Model):
 
     class Meta:
         ordering = ["-payment_date", "-created_at"]
+        indexes = [models.Index(fields=["payment_date", "created_at"], name="payment_date_created_idx")]
         verbose_name = "Payment"
         verbose_name_plural = "Payments"
 
@@ -373,25 +473,17 @@ class Payment(models.Model):
     def save(self, *args, **kwargs):
         if not self.receipt_number:
             # Generate auto receipt number: REC-YYYYMMDD-XXXX
-            today = timezone.now().date()
-            prefix = f"REC-{today.strftime('%Y%m%d')}"
-            # Find the next available number for today
-            existing_receipts = Payment.objects.filter(
-                receipt_number__startswith=prefix
-            ).order_by("-receipt_number")
-
-            if existing_receipts.exists():
-                last_number = int(
-                    existing_receipts.first().receipt_number.split("-")[-1]
-                )
-                next_number = last_number + 1
-            else:
-                next_number = 1
-
-            self.receipt_number = f"{prefix}-{next_number:04d}"
+            self.receipt_number = Payment.allocate_receipt_numbers()[0]
 
         super().save(*args, **kwargs)
 
+    @staticmethod
+    def allocate_receipt_numbers(count=1, day=None):
+        """Reserve ``count`` receipt numbers for ``day`` (default today), e.g. for bulk imports"""
+        day = day or timezone.now().date()
+        prefix = f"REC-{day.strftime('%Y%m%d')}"
+        return [f"{prefix}-{number:04d}" for number in ReceiptSequence.allocate(prefix, count)]
+
     @property
     def total_dues_covered(self):
         """Total amount of dues covered by this payment"""
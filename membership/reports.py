@@ -0,0 +1,89 @@
+"""Overdue membership dues report.
+
+The per-house summary is one grouped query (``values('house').annotate()``)
+and the report totals one aggregate, so neither loads the dues rows. Only
+the dues of the houses on the current page of the summary are fetched, in
+one query, for their month lists.
+"""
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db.models import Count, F, Min, Sum
+
+from .models import MembershipDues
+
+# (key, label, fewest days overdue, most days overdue)
+AGE_BUCKETS = [
+    ("0-30", "Up to 30 days", 0, 30),
+    ("31-90", "31 to 90 days", 31, 90),
+    ("91-180", "91 to 180 days", 91, 180),
+    ("180+", "Over 180 days", 181, None),
+]
+
+SUMMARY_PAGE_SIZE = 50
+
+# Orderings of the house summary; "arrears" sorts on the indexed HouseBalance total
+SUMMARY_ORDER = {
+    "oldest": ["oldest_due"],
+    "arrears": [F("house__balance__total_outstanding").desc(nulls_last=True)],
+}
+
+
+def overdue_dues(today, ward=None, area="", age=None, min_months=None):
+    """Unpaid dues due before ``today``, optionally limited by ward id, area and age bucket key.
+
+    ``min_months`` keeps the houses with at least that many unpaid dues in
+    all (from ``HouseBalance``, whatever the other filters). Ordered by due
+    date, the order of the unpaid dues index, rather than the model's
+    default ordering, which joins the house table.
+    """
+    dues = MembershipDues.objects.filter(is_paid=False, due_date__lt=today).order_by("due_date")
+    if ward:
+        dues = dues.filter(house__ward_id=ward)
+    if area:
+        dues = dues.filter(house__area__icontains=area)
+    if min_months:
+        dues = dues.filter(house__balance__months_in_arrears__gte=min_months)
+    for key, _label, fewest, most in AGE_BUCKETS:
+        if key == age:
+            dues = dues.filter(due_date__lte=today - timedelta(days=fewest))
+            if most is not None:
+                dues = dues.filter(due_date__gte=today - timedelta(days=most))
+    return dues
+
+
+def overdue_totals(dues):
+    """Amount, number of dues and number of houses in ``dues``."""
+    totals = dues.aggregate(
+        total_amount=Sum("amount_due"),
+        dues_count=Count("id"),
+        house_count=Count("house", distinct=True),
+    )
+    totals["total_amount"] = totals["total_amount"] or Decimal("0.00")
+    return totals
+
+
+def overdue_house_summary(dues, order="oldest"):
+    """One row per house with its number of dues, total amount and oldest due date.
+
+    Ordered oldest due first, or by what the house owes in all with ``order="arrears"``.
+    """
+    return (
+        dues.order_by()
+        .values(
+            "house", "house__house_name", "house__house_number", "house__area", "house__ward__name",
+            "house__balance__total_outstanding",
+        )
+        .annotate(dues_count=Count("id"), total_amount=Sum("amount_due"), oldest_due=Min("due_date"))
+        .order_by(*SUMMARY_ORDER[order], "house__house_name", "house__house_number", "house")
+    )
+
+
+def attach_house_dues(rows, dues):
+    """Set ``rows[i]["dues"]`` to the house's dues in ``dues``, fetched in one query."""
+    by_house = {row["house"]: row for row in rows}
+    for row in rows:
+        row["dues"] = []
+    for due in dues.filter(house_id__in=list(by_house)).order_by("house_id", "due_date"):
+        by_house[due.house_id]["dues"].append(due)
+    return rows
@@ -0,0 +1,231 @@
+"""Bulk operations on membership dues.
+
+These functions work on whole sets of rows with a fixed number of queries
+instead of saving one model instance at a time. They bypass
+``MembershipDues.save`` so every value ``save`` would fill in (amount,
+due date, ``updated_at``) is resolved here up front.
+"""
+import logging
+import time
+from datetime import date
+from decimal import Decimal
+from itertools import islice
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.db.models import Count, Q
+from django.utils import timezone
+
+from .balances import deferred_house_balances, queue_house_balances, refresh_house_balances
+from .models import HouseRegistration, Member, MembershipDues, Payment
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_DUES_AMOUNT = Decimal("10.00")
+DEFAULT_BATCH_SIZE = 1000
+
+
+def get_monthly_dues_amount():
+    """Monthly dues amount from System Settings of the default site.
+
+    Falls back to ``DEFAULT_DUES_AMOUNT`` when no site or settings exist.
+    """
+    from wagtail.models import Site
+
+    from home.models import SystemSettings
+
+    try:
+        site = Site.objects.filter(is_default_site=True).first() or Site.objects.first()
+        if site:
+            return SystemSettings.for_site(site).monthly_membership_dues
+    except (SystemSettings.DoesNotExist, Site.DoesNotExist, AttributeError) as e:
+        logger.warning(f"Could not load system settings for membership dues, using default: {e}")
+    except Exception as e:
+        logger.error(
+            f"Unexpected error loading system settings for membership dues: {e}",
+            exc_info=True,
+        )
+    return DEFAULT_DUES_AMOUNT
+
+
+def month_range(start, end=None):
+    """List of ``(year, month)`` pairs from ``start`` to ``end`` inclusive."""
+    end = end or start
+    if (end[0], end[1]) < (start[0], start[1]):
+        raise ValueError("End month must not be before the start month")
+    year, month = start
+    months = []
+    while (year, month) <= (end[0], end[1]):
+        months.append((year, month))
+        year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+    return months
+
+
+class DuesGenerationResult:
+    def __init__(self, months, amount):
+        self.months = months
+        self.amount = amount
+        self.created = 0
+        self.skipped = 0
+        # (rows in batch, seconds) per bulk INSERT
+        self.batches = []
+
+    @property
+    def elapsed(self):
+        return sum(seconds for _rows, seconds in self.batches)
+
+    def __str__(self):
+        first, last = self.months[0], self.months[-1]
+        period = f"{first[0]}-{first[1]:02d}"
+        if last != first:
+            period += f" to {last[0]}-{last[1]:02d}"
+        return f"{self.created} dues records for {period} ({self.skipped} already existed)"
+
+
+def _existing_dues_count(months):
+    months = set(months)
+    years = {year for year, _month in months}
+    counts = (
+        MembershipDues.objects.filter(year__in=years)
+        .order_by()
+        .values("year", "month")
+        .annotate(count=Count("id"))
+    )
+    return sum(row["count"] for row in counts if (row["year"], row["month"]) in months)
+
+
+def generate_dues(start, end=None, amount=None, houses=None,
+                  batch_size=DEFAULT_BATCH_SIZE, on_batch=None):
+    """Create dues for every house for each month from ``start`` to ``end``.
+
+    ``start``/``end`` are ``(year, month)`` pairs. The amount is resolved once
+    from System Settings unless given. Rows are inserted with
+    ``bulk_create(ignore_conflicts=True)``, so dues that already exist (per
+    ``unique_together``) are left untouched and the run can be repeated
+    safely. ``on_batch(number, rows, seconds)`` is called after each INSERT.
+    The ``HouseBalance`` rows of the houses are refreshed when any dues
+    were created.
+    """
+    months = month_range(start, end)
+    amount = amount if amount is not None else get_monthly_dues_amount()
+    houses = houses if houses is not None else HouseRegistration.objects.all()
+    house_ids = list(houses.order_by("pk").values_list("pk", flat=True))
+
+    result = DuesGenerationResult(months, amount)
+    rows = (
+        MembershipDues(
+            house_id=house_id,
+            year=year,
+            month=month,
+            amount_due=amount,
+            due_date=date(year, month, 1),
+        )
+        for year, month in months
+        for house_id in house_ids
+    )
+
+    with transaction.atomic():
+        before = _existing_dues_count(months)
+        while True:
+            batch = list(islice(rows, batch_size))
+            if not batch:
+                break
+            started = time.perf_counter()
+            MembershipDues.objects.bulk_create(batch, batch_size=batch_size, ignore_conflicts=True)
+            seconds = time.perf_counter() - started
+            result.batches.append((len(batch), seconds))
+            if on_batch:
+                on_batch(len(result.batches), len(batch), seconds)
+        result.created = _existing_dues_count(months) - before
+        if result.created:
+            refresh_house_balances(house_ids)
+
+    result.skipped = len(months) * len(house_ids) - result.created
+    logger.info(f"Generated {result} in {result.elapsed:.2f}s")
+    return result
+
+
+class SettlementResult:
+    def __init__(self, payment, due_ids, house_ids):
+        self.payment = payment
+        self.due_ids = due_ids
+        self.house_ids = house_ids
+
+    @property
+    def total_amount(self):
+        return self.payment.amount
+
+    def __str__(self):
+        return (
+            f"Receipt #{self.payment.receipt_number} for ₹{self.payment.amount} "
+            f"({len(self.due_ids)} dues, {len(self.house_ids)} houses)"
+        )
+
+
+def _payer_for_house(house_id):
+    """Head of family of the house, or any member if no head is recorded."""
+    return (
+        Member.objects.filter(house_id=house_id)
+        .order_by("-is_head_of_family", "pk")
+        .first()
+    )
+
+
+def settle_dues(house_ids, payment_method, payment_date=None, notes="", through=None, member=None):
+    """Pay every unpaid due of the given houses with a single Payment.
+
+    Only dues up to and including the ``through`` ``(year, month)`` are
+    settled when it is given. The payment is linked to ``member`` or, by
+    default, to the head of family of the first house. The unpaid dues are
+    read and locked with one query, linked to the payment with one
+    ``bulk_create`` of M2M through rows and marked paid with one
+    ``update()``, so the cost does not grow with the number of dues. The
+    ``HouseBalance`` rows of the paid houses are refreshed once at the end.
+
+    Returns a ``SettlementResult``, or None when there is nothing to pay.
+    Raises ``ValidationError`` if no member can be linked to the payment.
+    """
+    house_ids = sorted({int(house_id) for house_id in house_ids})
+    unpaid = MembershipDues.objects.filter(house_id__in=house_ids, is_paid=False)
+    if through:
+        year, month = through
+        unpaid = unpaid.filter(Q(year__lt=year) | Q(year=year, month__lte=month))
+
+    with transaction.atomic(), deferred_house_balances():
+        dues = list(
+            unpaid.select_for_update()
+            .order_by("year", "month", "house_id")
+            .values_list("pk", "house_id", "amount_due")
+        )
+        if not dues:
+            return None
+
+        member = member or _payer_for_house(house_ids[0])
+        if member is None:
+            first_house = HouseRegistration.objects.get(pk=house_ids[0])
+            raise ValidationError(
+                f"Cannot create payment: No members found in {first_house}. Payment requires a Member."
+            )
+
+        due_ids = [pk for pk, _house_id, _amount in dues]
+        total_amount = sum((amount for _pk, _house_id, amount in dues), Decimal("0.00"))
+        paid_house_ids = sorted({house_id for _pk, house_id, _amount in dues})
+
+        payment = Payment.objects.create(
+            member=member,
+            amount=total_amount,
+            payment_method=payment_method,
+            payment_date=payment_date or timezone.now().date(),
+            notes=notes,
+        )
+        Through = Payment.membership_dues.through
+        Through.objects.bulk_create(
+            [Through(payment_id=payment.pk, membershipdues_id=due_id) for due_id in due_ids],
+            batch_size=DEFAULT_BATCH_SIZE,
+        )
+        MembershipDues.objects.filter(payments=payment).update(is_paid=True, updated_at=timezone.now())
+        queue_house_balances(paid_house_ids)
+
+    result = SettlementResult(payment, due_ids, paid_house_ids)
+    logger.info(f"Settled dues: {result}")
+    return result
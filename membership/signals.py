@@ -0,0 +1,44 @@
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from billing.models import Invoice
+
+from .balances import queue_house_balances
+from .models import Member, MembershipDues, Payment
+
+# Keep HouseBalance current for single-row changes (admin edits, imports).
+# generate_dues and settle_dues refresh the houses they touch themselves.
+
+
+@receiver([post_save, post_delete], sender=MembershipDues)
+@receiver([post_save, post_delete], sender=Invoice)
+def refresh_house_balance(sender, instance, **kwargs):
+    queue_house_balances([instance.house_id])
+
+
+def _payment_house_ids(payment):
+    """The payer's house and the houses of the dues ``payment`` covers"""
+    house_ids = set(MembershipDues.objects.filter(payments=payment).values_list("house_id", flat=True))
+    if payment.member_id:
+        house_ids.add(Member.objects.filter(pk=payment.member_id).values_list("house_id", flat=True).first())
+    return house_ids
+
+
+# pre_delete rather than post_delete: the links to the dues are gone by then
+@receiver(post_save, sender=Payment)
+@receiver(pre_delete, sender=Payment)
+def refresh_payment_house_balances(sender, instance, **kwargs):
+    queue_house_balances(_payment_house_ids(instance))
+
+
+@receiver(m2m_changed, sender=Payment.membership_dues.through)
+def refresh_paid_dues_house_balances(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ("post_add", "post_remove", "pre_clear"):
+        return
+    if reverse:
+        # instance is a due, pk_set payments
+        queue_house_balances([instance.house_id])
+    elif action == "pre_clear":
+        queue_house_balances(_payment_house_ids(instance))
+    else:
+        queue_house_balances(MembershipDues.objects.filter(pk__in=pk_set).values_list("house_id", flat=True))
@@ -2,16 +2,33 @@
 Tests for critical business logic: payments and dues
 """
 import logging
+import os
+import tempfile
+import threading
 from decimal import Decimal
 from datetime import date, timedelta
+from io import StringIO
+
+from django.contrib.auth.models import User
+from django.core.exceptions import ValidationError
+from django.core.management import call_command
+from django.db import close_old_connections, connection
 from django.test import TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
 from django.db import transaction
 from django.utils import timezone
+from wagtail.models import Site
+
+from billing.models import Invoice
+from home.models import SystemSettings
 
 from .models import (
-    HouseRegistration, Member, MembershipDues, Payment,
+    HouseBalance, HouseRegistration, Member, MembershipDues, Payment, ReceiptSequence,
     Ward, Taluk, City, State, Country, PostalCode
 )
+from .balances import refresh_house_balances
+from .services import generate_dues, month_range, settle_dues
 
 
 class PaymentBusinessLogicTest(TransactionTestCase):
@@ -313,3 +330,358 @@ class DuesBusinessLogicTest(TestCase):
             house_dues = dues.filter(house=house)
             self.assertEqual(house_dues.count(), 1)
 
+
+class DuesGenerationServiceTest(TestCase):
+    """Test bulk dues generation"""
+
+    def setUp(self):
+        location = dict(
+            ward=Ward.objects.create(name="Test Ward"),
+            taluk=Taluk.objects.create(name="Test Taluk"),
+            city=City.objects.create(name="Test City"),
+            state=State.objects.create(name="Test State"),
+            country=Country.objects.create(name="Test Country"),
+            postal_code=PostalCode.objects.create(code="123456"),
+        )
+        self.houses = [
+            HouseRegistration.objects.create(house_name=f"House {i}", house_number=f"H-{i}", **location)
+            for i in range(5)
+        ]
+        settings = SystemSettings.for_site(Site.objects.get(is_default_site=True))
+        settings.monthly_membership_dues = Decimal("25.00")
+        settings.save()
+
+    def test_month_range_crosses_year(self):
+        """Test that month ranges roll over into the next year"""
+        self.assertEqual(month_range((2024, 11), (2025, 2)), [(2024, 11), (2024, 12), (2025, 1), (2025, 2)])
+        with self.assertRaises(ValueError):
+            month_range((2024, 3), (2024, 1))
+
+    def test_generate_range_in_batches(self):
+        """Test that a range of months is created in batches with the settings amount"""
+        batches = []
+        result = generate_dues((2024, 1), (2024, 3), batch_size=4,
+                               on_batch=lambda number, rows, seconds: batches.append(rows))
+
+        self.assertEqual(result.created, 15)
+        self.assertEqual(batches, [4, 4, 4, 3])
+        self.assertEqual(MembershipDues.objects.count(), 15)
+        due = MembershipDues.objects.get(house=self.houses[0], year=2024, month=2)
+        self.assertEqual(due.amount_due, Decimal("25.00"))
+        self.assertEqual(due.due_date, date(2024, 2, 1))
+
+    def test_generate_skips_existing_dues(self):
+        """Test that rerunning over existing months only fills the gaps"""
+        MembershipDues.objects.create(house=self.houses[0], year=2024, month=1, amount_due=Decimal("40.00"))
+        result = generate_dues((2024, 1))
+        self.assertEqual(result.created, 4)
+        self.assertEqual(result.skipped, 1)
+        self.assertEqual(
+            MembershipDues.objects.get(house=self.houses[0], year=2024, month=1).amount_due,
+            Decimal("40.00"),
+        )
+
+    def test_settings_resolved_once(self):
+        """Test that the query count does not depend on the number of houses or months"""
+        # site lookup, settings, house ids, savepoint, count before,
+        # one INSERT per batch, count after, house balance refresh
+        # (houses, dues, invoices, payments twice, upsert), release savepoint
+        with self.assertNumQueries(15):
+            generate_dues((2024, 1), (2024, 12), batch_size=30)
+
+    def test_management_command(self):
+        """Test the generate_monthly_dues command"""
+        out = StringIO()
+        call_command("generate_monthly_dues", month="2024-05", through="2024-06", stdout=out)
+        self.assertIn("Batch 1: 10 rows", out.getvalue())
+        self.assertEqual(MembershipDues.objects.filter(year=2024, month__in=[5, 6]).count(), 10)
+
+
+class DuesSettlementServiceTest(TestCase):
+    """Test set-based settlement of unpaid dues"""
+
+    def setUp(self):
+        location = dict(
+            ward=Ward.objects.create(name="Test Ward"),
+            taluk=Taluk.objects.create(name="Test Taluk"),
+            city=City.objects.create(name="Test City"),
+            state=State.objects.create(name="Test State"),
+            country=Country.objects.create(name="Test Country"),
+            postal_code=PostalCode.objects.create(code="123456"),
+        )
+        self.houses = [
+            HouseRegistration.objects.create(house_name=f"House {i}", house_number=f"S-{i}", **location)
+            for i in range(4)
+        ]
+        for house in self.houses[:3]:
+            Member.objects.create(first_name="Member", last_name=house.house_number, house=house)
+        self.head = Member.objects.create(
+            first_name="Head", last_name="Zero", house=self.houses[0], is_head_of_family=True
+        )
+        generate_dues((2024, 1), (2024, 12), amount=Decimal("10.00"))
+
+    def test_settle_marks_dues_paid(self):
+        """Test that one payment covers every unpaid due of the selected houses"""
+        result = settle_dues([self.houses[0].pk, self.houses[1].pk], "cash", notes="Drive")
+
+        self.assertEqual(result.payment.amount, Decimal("240.00"))
+        self.assertEqual(result.payment.member, self.head)
+        self.assertEqual(result.payment.membership_dues.count(), 24)
+        self.assertFalse(MembershipDues.objects.filter(house__in=self.houses[:2], is_paid=False).exists())
+        self.assertEqual(MembershipDues.objects.filter(house=self.houses[2], is_paid=True).count(), 0)
+
+    def test_settle_through_month(self):
+        """Test that only dues up to the given month are settled"""
+        result = settle_dues([self.houses[1].pk], "upi", through=(2024, 3))
+        self.assertEqual(len(result.due_ids), 3)
+        self.assertEqual(MembershipDues.objects.filter(house=self.houses[1], is_paid=False).count(), 9)
+
+    def test_nothing_to_settle(self):
+        """Test that settling houses without unpaid dues creates no payment"""
+        MembershipDues.objects.update(is_paid=True)
+        self.assertIsNone(settle_dues([self.houses[0].pk], "cash"))
+        self.assertFalse(Payment.objects.exists())
+
+    def test_house_without_members(self):
+        """Test that a payment cannot be created without a member to link"""
+        with self.assertRaises(ValidationError):
+            settle_dues([self.houses[3].pk], "cash")
+        self.assertFalse(MembershipDues.objects.filter(is_paid=True).exists())
+
+    def test_query_count_independent_of_dues(self):
+        """Test that settling many dues costs the same number of queries as one"""
+        settle_dues([self.houses[2].pk], "cash", through=(2024, 1))  # warm up ledger accounts
+        with CaptureQueriesContext(connection) as single:
+            settle_dues([self.houses[2].pk], "cash", through=(2024, 2))
+        with CaptureQueriesContext(connection) as many:
+            settle_dues([self.houses[0].pk, self.houses[1].pk], "cash")
+        self.assertEqual(len(many), len(single))
+
+    def test_management_command(self):
+        """Test settling dues from a cash-collection CSV"""
+        with tempfile.NamedTemporaryFile("w", suffix=".csv", delete=False) as f:
+            f.write("house_number,payment_method,through\nS-1,cash,2024-06\nS-2,bank,\n")
+        self.addCleanup(os.remove, f.name)
+        out = StringIO()
+        call_command("settle_membership_dues", f.name, stdout=out)
+
+        self.assertIn("Settled 2 of 2 rows", out.getvalue())
+        self.assertEqual(MembershipDues.objects.filter(house=self.houses[1], is_paid=True).count(), 6)
+        self.assertEqual(MembershipDues.objects.filter(house=self.houses[2], is_paid=True).count(), 12)
+
+
+class HouseBalanceTest(TestCase):
+    """Test the precomputed per-house balances"""
+
+    def setUp(self):
+        location = dict(
+            ward=Ward.objects.create(name="Test Ward"),
+            taluk=Taluk.objects.create(name="Test Taluk"),
+            city=City.objects.create(name="Test City"),
+            state=State.objects.create(name="Test State"),
+            country=Country.objects.create(name="Test Country"),
+            postal_code=PostalCode.objects.create(code="123456"),
+        )
+        self.houses = [
+            HouseRegistration.objects.create(house_name=f"House {i}", house_number=f"B-{i}", **location)
+            for i in range(3)
+        ]
+        for house in self.houses:
+            Member.objects.create(first_name="Member", last_name=house.house_number, house=house)
+        generate_dues((2024, 1), (2024, 12), amount=Decimal("10.00"), houses=HouseRegistration.objects.filter(
+            pk__in=[self.houses[0].pk, self.houses[1].pk]
+        ))
+
+    def balance(self, house):
+        return HouseBalance.objects.get(house=house)
+
+    def test_generation_creates_balances(self):
+        """Test that generating dues fills in the balances of the houses"""
+        balance = self.balance(self.houses[0])
+        self.assertEqual(balance.outstanding_dues, Decimal("120.00"))
+        self.assertEqual(balance.months_in_arrears, 12)
+        self.assertEqual(balance.oldest_unpaid_due, date(2024, 1, 1))
+        self.assertEqual(balance.total_outstanding, Decimal("120.00"))
+        self.assertFalse(HouseBalance.objects.filter(house=self.houses[2]).exists())
+
+    def test_settlement_updates_balances(self):
+        """Test that settling dues lowers the balance and records the payment date"""
+        settle_dues([self.houses[0].pk], "cash", payment_date=date(2024, 7, 5), through=(2024, 6))
+        balance = self.balance(self.houses[0])
+        self.assertEqual(balance.outstanding_dues, Decimal("60.00"))
+        self.assertEqual(balance.months_in_arrears, 6)
+        self.assertEqual(balance.oldest_unpaid_due, date(2024, 7, 1))
+        self.assertEqual(balance.last_payment_date, date(2024, 7, 5))
+        self.assertEqual(self.balance(self.houses[1]).months_in_arrears, 12)
+
+    def test_bulk_settlement_records_payment_for_every_house(self):
+        """Test that one payment settling two houses sets the payment date of both"""
+        settle_dues([self.houses[0].pk, self.houses[1].pk], "cash", payment_date=date(2024, 7, 5))
+        for house in self.houses[:2]:
+            balance = self.balance(house)
+            self.assertEqual(balance.months_in_arrears, 0)
+            self.assertEqual(balance.last_payment_date, date(2024, 7, 5))
+
+    def test_payment_changes_refresh_covered_houses(self):
+        """Test that editing or deleting a payment refreshes the houses of the dues it covers"""
+        payment = settle_dues([self.houses[0].pk, self.houses[1].pk], "cash", payment_date=date(2024, 7, 5)).payment
+        with self.captureOnCommitCallbacks(execute=True):
+            payment.payment_date = date(2024, 8, 1)
+            payment.save()
+        self.assertEqual(self.balance(self.houses[1]).last_payment_date, date(2024, 8, 1))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            payment.delete()
+        self.assertIsNone(self.balance(self.houses[1]).last_payment_date)
+
+    def test_single_due_changes_refresh_on_commit(self):
+        """Test that saving or deleting one due refreshes its house after commit"""
+        due = MembershipDues.objects.get(house=self.houses[1], year=2024, month=1)
+        with self.captureOnCommitCallbacks(execute=True):
+            due.is_paid = True
+            due.save()
+        self.assertEqual(self.balance(self.houses[1]).oldest_unpaid_due, date(2024, 2, 1))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            MembershipDues.objects.get(house=self.houses[1], year=2024, month=2).delete()
+        self.assertEqual(self.balance(self.houses[1]).months_in_arrears, 10)
+
+    def test_invoices_count_towards_total(self):
+        """Test that open invoices are added to the total and paid ones drop out"""
+        Invoice.objects.bulk_create([
+            Invoice(invoice_number="INV-TEST-1", house=self.houses[2], due_date=date(2024, 1, 15),
+                    total_amount=Decimal("500.00"), amount_paid=Decimal("200.00"), status="partially_paid"),
+            Invoice(invoice_number="INV-TEST-2", house=self.houses[2], due_date=date(2024, 1, 15),
+                    total_amount=Decimal("80.00"), status="cancelled"),
+            Invoice(invoice_number="INV-TEST-3", house=self.houses[0], due_date=date(2024, 1, 15),
+                    total_amount=Decimal("50.00"), amount_paid=Decimal("50.00"), status="paid"),
+        ])
+        refresh_house_balances([self.houses[0].pk, self.houses[2].pk])
+
+        balance = self.balance(self.houses[2])
+        self.assertEqual(balance.invoice_balance, Decimal("300.00"))
+        self.assertEqual(balance.total_outstanding, Decimal("300.00"))
+        self.assertEqual(balance.months_in_arrears, 0)
+        self.assertEqual(self.balance(self.houses[0]).total_outstanding, Decimal("120.00"))
+
+    def test_deleted_house_gets_no_balance(self):
+        """Test that deleting a house with dues does not recreate its balance"""
+        house = self.houses[0]
+        with self.captureOnCommitCallbacks(execute=True):
+            house.delete()
+        self.assertFalse(HouseBalance.objects.filter(house_id=house.pk).exists())
+
+    def test_rebuild_command(self):
+        """Test that the rebuild command recomputes every house"""
+        HouseBalance.objects.update(outstanding_dues=Decimal("0.00"), months_in_arrears=0)
+        out = StringIO()
+        call_command("rebuild_house_balances", batch_size=2, stdout=out)
+        self.assertIn("3 houses", out.getvalue())
+        self.assertEqual(self.balance(self.houses[1]).months_in_arrears, 12)
+        self.assertEqual(self.balance(self.houses[2]).total_outstanding, Decimal("0.00"))
+
+    def test_bulk_payment_lists_houses_in_arrears(self):
+        """Test that the bulk payment picker reads and sorts by the balances"""
+        settle_dues([self.houses[0].pk], "cash", through=(2024, 10))
+        User.objects.create_user(username="cashier", password="password")
+        self.client.login(username="cashier", password="password")
+
+        response = self.client.get(reverse("membership:bulk_payment"), {"sort": "arrears"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(list(response.context["houses"]), [self.houses[1], self.houses[0]])
+        self.assertContains(response, "12 unpaid dues")
+
+    def test_refresh_uses_constant_queries(self):
+        """Test that refreshing a batch of houses does not depend on the number of dues"""
+        # existing houses, dues, invoices, payments by members and for dues, upsert
+        with self.assertNumQueries(6):
+            refresh_house_balances([house.pk for house in self.houses])
+
+
+class ReceiptSequenceTest(TestCase):
+    """Test the receipt number allocator"""
+
+    def test_numbers_are_consecutive_per_day(self):
+        """Test that numbers continue per day and restart on a new day"""
+        day = date(2024, 5, 1)
+        self.assertEqual(Payment.allocate_receipt_numbers(day=day), ["REC-20240501-0001"])
+        self.assertEqual(
+            Payment.allocate_receipt_numbers(3, day=day),
+            ["REC-20240501-0002", "REC-20240501-0003", "REC-20240501-0004"],
+        )
+        self.assertEqual(Payment.allocate_receipt_numbers(day=date(2024, 5, 2)), ["REC-20240502-0001"])
+
+    def test_continues_after_existing_receipts(self):
+        """Test that a new day's sequence starts after receipts issued without it"""
+        member = Member.objects.create(first_name="Legacy", last_name="Payer")
+        Payment.objects.create(member=member, amount=Decimal("10.00"), payment_method="cash")
+        prefix = Payment.objects.get().receipt_number.rsplit("-", 1)[0]
+        ReceiptSequence.objects.filter(prefix=prefix).delete()
+
+        self.assertEqual(Payment.allocate_receipt_numbers(), [f"{prefix}-0002"])
+
+    def test_ignores_legacy_receipt_numbers(self):
+        """Test that receipts without a numeric suffix do not break allocation"""
+        member = Member.objects.create(first_name="Legacy", last_name="Payer")
+        Payment.objects.bulk_create([
+            Payment(member=member, amount=Decimal("10.00"), payment_method="cash", receipt_number=number)
+            for number in ("REC-20240701-0003", "REC-20240701-MANUAL", "REC-20240701-")
+        ])
+
+        self.assertEqual(Payment.allocate_receipt_numbers(day=date(2024, 7, 1)), ["REC-20240701-0004"])
+
+    def test_allocation_uses_constant_queries(self):
+        """Test that allocating a block does not scan existing receipts"""
+        ReceiptSequence.allocate("REC-20240601")
+        # savepoint, UPDATE, SELECT, release
+        with self.assertNumQueries(4):
+            ReceiptSequence.allocate("REC-20240601", count=500)
+
+
+class ReceiptSequenceConcurrencyTest(TransactionTestCase):
+    """Stress test receipt allocation from concurrent threads"""
+
+    THREADS = 8
+    ALLOCATIONS_PER_THREAD = 25
+
+    def test_concurrent_allocations_are_unique(self):
+        """Test that concurrent cashiers never receive the same receipt number"""
+        if connection.vendor == "sqlite" and connection.is_in_memory_db():
+            # Shared-cache in-memory SQLite fails concurrent writers with
+            # "table is locked" instead of waiting; use PostgreSQL, MySQL or
+            # a file-based test database to run this test.
+            self.skipTest("needs a database that serializes concurrent writers")
+        allocated = []
+        errors = []
+        lock = threading.Lock()
+        start = threading.Barrier(self.THREADS)
+
+        def cashier(block_size):
+            try:
+                start.wait()
+                for _ in range(self.ALLOCATIONS_PER_THREAD):
+                    numbers = Payment.allocate_receipt_numbers(block_size, day=date(2024, 7, 1))
+                    with lock:
+                        allocated.extend(numbers)
+            except Exception as e:
+                errors.append(e)
+            finally:
+                close_old_connections()
+                connection.close()
+
+        threads = [
+            threading.Thread(target=cashier, args=(1 + i % 3,)) for i in range(self.THREADS)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        expected = sum(1 + i % 3 for i in range(self.THREADS)) * self.ALLOCATIONS_PER_THREAD
+        self.assertEqual(len(allocated), expected)
+        self.assertEqual(len(set(allocated)), expected)
+        self.assertEqual(
+            sorted(int(number.rsplit("-", 1)[-1]) for number in allocated),
+            list(range(1, expected + 1)),
+        )
@@ -1,9 +1,15 @@
+import io
 import logging
+import os
+import re
+import shutil
+import tempfile
 from datetime import date, timedelta
 from decimal import Decimal
+from unittest.mock import patch
 
 from django.contrib.auth.models import User
-from django.test import Client, TestCase
+from django.test import Client, TestCase, override_settings
 from django.urls import reverse
 from django.utils import timezone
 from wagtail.models import Site
@@ -14,6 +20,11 @@ from .models import (
     HouseRegistration, Member, MembershipDues, Payment,
     Ward, Taluk, City, State, Country, PostalCode
 )
+from .reports import attach_house_dues, overdue_dues, overdue_house_summary, overdue_totals
+from .card_cache import CardCache, cache_key
+from .utils import (
+    _qr_codes, generate_membership_card, generate_membership_cards, membership_card_data, membership_qr_png,
+)
 
 
 class BulkPaymentViewTest(TestCase):
@@ -116,6 +127,22 @@ class BulkPaymentViewTest(TestCase):
         )
         self.assertEqual(response.status_code, 302)  # Redirects with error message
 
+    def test_bulk_payment_rejects_invalid_date(self):
+        """Test bulk payment with an unparseable payment date"""
+        response = self.client.post(
+            reverse("membership:bulk_payment"),
+            {
+                "house_ids": [self.house1.id],
+                "payment_method": "cash",
+                "payment_date": "31/02/2024",
+            },
+            follow=True,
+        )
+        self.assertIn("Please enter a valid payment date.", [str(m) for m in response.context["messages"]])
+        self.assertFalse(Payment.objects.exists())
+        self.due1.refresh_from_db()
+        self.assertFalse(self.due1.is_paid)
+
     def test_bulk_payment_no_unpaid_dues(self):
         """Test bulk payment when houses have no unpaid dues"""
         # Mark all dues as paid
@@ -209,13 +236,10 @@ class GenerateMonthlyDuesViewTest(TestCase):
         )
         self.client.login(username="testuser", password="testpass123")
 
-        # Create site and system settings
-        self.site = Site.objects.create(
-            hostname="test.com", port=80, site_name="Test Site", is_default_site=True
-        )
-        SystemSettings.objects.create(
-            site=self.site, monthly_membership_dues=Decimal("10.00")
-        )
+        # System settings of the default site created by the Wagtail migrations
+        settings = SystemSettings.for_site(Site.objects.get(is_default_site=True))
+        settings.monthly_membership_dues = Decimal("10.00")
+        settings.save()
 
         # Create geographic dependencies
         self.ward = Ward.objects.create(name="Test Ward")
@@ -238,7 +262,7 @@ class GenerateMonthlyDuesViewTest(TestCase):
 
     def test_generate_monthly_dues_get(self):
         """Test GET request to generate monthly dues view"""
-        response = self.client.get(reverse("generate_monthly_dues"))
+        response = self.client.get(reverse("membership:generate_monthly_dues"))
         self.assertEqual(response.status_code, 200)
 
     def test_generate_monthly_dues_post_success(self):
@@ -247,7 +271,7 @@ class GenerateMonthlyDuesViewTest(TestCase):
         month = 3
 
         response = self.client.post(
-            reverse("generate_monthly_dues"), {"year": year, "month": month}
+            reverse("membership:generate_monthly_dues"), {"year": year, "month": month}
         )
 
         self.assertEqual(response.status_code, 302)  # Redirects after success
@@ -267,12 +291,12 @@ class GenerateMonthlyDuesViewTest(TestCase):
 
         # Create dues first time
         self.client.post(
-            reverse("generate_monthly_dues"), {"year": year, "month": month}
+            reverse("membership:generate_monthly_dues"), {"year": year, "month": month}
         )
 
         # Try to create again
         response = self.client.post(
-            reverse("generate_monthly_dues"), {"year": year, "month": month}
+            reverse("membership:generate_monthly_dues"), {"year": year, "month": month}
         )
 
         self.assertEqual(response.status_code, 302)  # Redirects with warning
@@ -281,10 +305,265 @@ class GenerateMonthlyDuesViewTest(TestCase):
         dues = MembershipDues.objects.filter(year=year, month=month)
         self.assertEqual(dues.count(), 2)
 
+    def test_generate_monthly_dues_post_range(self):
+        """Test generating dues for a range of months"""
+        response = self.client.post(
+            reverse("membership:generate_monthly_dues"),
+            {"year": 2024, "month": 11, "end_year": 2025, "end_month": 2},
+        )
+
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(response.url, reverse("membership:generate_monthly_dues"))
+        dues = MembershipDues.objects.filter(house__in=[self.house1, self.house2])
+        self.assertEqual(dues.count(), 8)  # 4 months for each of the 2 houses
+        self.assertEqual(
+            sorted({(due.year, due.month) for due in dues}),
+            [(2024, 11), (2024, 12), (2025, 1), (2025, 2)],
+        )
+
     def test_generate_monthly_dues_invalid_month(self):
         """Test generation with invalid month"""
         response = self.client.post(
-            reverse("generate_monthly_dues"),
+            reverse("membership:generate_monthly_dues"),
             {"year": 2024, "month": 13},  # Invalid month
         )
         self.assertEqual(response.status_code, 302)  # Redirects with error
+
+
+class OverdueReportSummaryTest(TestCase):
+    """Grouped summary, filters and pagination of the overdue report"""
+
+    def setUp(self):
+        self.client = Client()
+        self.user = User.objects.create_user(username="testuser", password="testpass123")
+        self.client.login(username="testuser", password="testpass123")
+
+        self.ward = Ward.objects.create(name="North Ward")
+        self.other_ward = Ward.objects.create(name="South Ward")
+        taluk = Taluk.objects.create(name="Test Taluk")
+        city = City.objects.create(name="Test City")
+        state = State.objects.create(name="Test State")
+        country = Country.objects.create(name="Test Country")
+        postal_code = PostalCode.objects.create(code="123456")
+        address = dict(taluk=taluk, city=city, state=state, country=country, postal_code=postal_code)
+
+        self.today = timezone.now().date()
+        self.house1 = HouseRegistration.objects.create(
+            house_name="House 1", house_number="H-O1", ward=self.ward, area="Hill Road", **address
+        )
+        self.house2 = HouseRegistration.objects.create(
+            house_name="House 2", house_number="H-O2", ward=self.other_ward, area="Market", **address
+        )
+        self.house3 = HouseRegistration.objects.create(
+            house_name="House 3", house_number="H-O3", ward=self.ward, area="Market", **address
+        )
+        MembershipDues.objects.bulk_create([
+            self._due(self.house1, 1, 200),
+            self._due(self.house1, 2, 10),
+            self._due(self.house2, 1, 60),
+            self._due(self.house3, 1, 5),
+            self._due(self.house3, 2, 400, is_paid=True),
+            self._due(self.house3, 3, -5),
+        ])
+
+    def _due(self, house, month, days_overdue, is_paid=False):
+        return MembershipDues(
+            house=house, year=2020, month=month, amount_due=Decimal("10.00"),
+            due_date=self.today - timedelta(days=days_overdue), is_paid=is_paid,
+        )
+
+    def test_summary_groups_dues_by_house(self):
+        """Each house gets one row with its count, total and oldest due date"""
+        dues = overdue_dues(self.today)
+        with self.assertNumQueries(1):
+            rows = list(overdue_house_summary(dues))
+
+        self.assertEqual([row["house"] for row in rows], [self.house1.pk, self.house2.pk, self.house3.pk])
+        self.assertEqual(rows[0]["dues_count"], 2)
+        self.assertEqual(Decimal(rows[0]["total_amount"]), Decimal("20.00"))
+        self.assertEqual(rows[0]["oldest_due"], self.today - timedelta(days=200))
+        self.assertEqual(rows[1]["house__ward__name"], "South Ward")
+        self.assertEqual(
+            overdue_totals(dues),
+            {"total_amount": Decimal("40.00"), "dues_count": 4, "house_count": 3},
+        )
+
+    def test_house_dues_loaded_in_one_query(self):
+        """Month lists for a page of houses come from a single query"""
+        dues = overdue_dues(self.today)
+        rows = list(overdue_house_summary(dues)[:2])
+        with self.assertNumQueries(1):
+            attach_house_dues(rows, dues)
+
+        self.assertEqual([due.month for due in rows[0]["dues"]], [1, 2])
+        self.assertEqual([due.month for due in rows[1]["dues"]], [1])
+
+    def test_filters(self):
+        """Ward, area and age bucket narrow the overdue dues"""
+        self.assertEqual(overdue_dues(self.today, ward=self.ward.pk).count(), 3)
+        self.assertEqual(overdue_dues(self.today, area="market").count(), 2)
+        self.assertEqual(overdue_dues(self.today, age="0-30").count(), 2)
+        self.assertEqual(overdue_dues(self.today, age="31-90").count(), 1)
+        self.assertEqual(overdue_dues(self.today, age="180+").count(), 1)
+        self.assertEqual(overdue_dues(self.today, ward=self.ward.pk, area="market", age="0-30").count(), 1)
+
+    def test_view_filters_and_paginates(self):
+        """The view applies the filters and pages the house summary"""
+        url = reverse("membership:overdue_report")
+        with patch("membership.views.SUMMARY_PAGE_SIZE", 2):
+            response = self.client.get(url, {"ward": self.ward.pk, "page": 2})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context["overdue_count"], 3)
+        self.assertEqual(response.context["house_count"], 2)
+        self.assertEqual(response.context["page_obj"].paginator.num_pages, 1)
+        self.assertEqual([row["house"] for row in response.context["house_summary"]],
+                         [self.house1.pk, self.house3.pk])
+        self.assertEqual(response.context["filter_query"], f"ward={self.ward.pk}")
+
+        with patch("membership.views.SUMMARY_PAGE_SIZE", 2):
+            response = self.client.get(url, {"page": 2})
+        self.assertEqual([row["house"] for row in response.context["house_summary"]], [self.house3.pk])
+        self.assertEqual([due.month for due in response.context["house_summary"][0]["dues"]], [1])
+
+
+class PrintMembershipCardsTest(TestCase):
+    """Batch printing of membership cards on A4 sheets"""
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+        media = override_settings(MEDIA_ROOT=self.media_root)
+        media.enable()
+        self.addCleanup(media.disable)
+
+        self.client = Client()
+        self.user = User.objects.create_user(username="testuser", password="testpass123")
+        self.client.login(username="testuser", password="testpass123")
+
+        self.ward = Ward.objects.create(name="North Ward")
+        address = dict(
+            taluk=Taluk.objects.create(name="Test Taluk"),
+            city=City.objects.create(name="Test City"),
+            state=State.objects.create(name="Test State"),
+            country=Country.objects.create(name="Test Country"),
+            postal_code=PostalCode.objects.create(code="123456"),
+        )
+        self.house = HouseRegistration.objects.create(
+            house_name="House 1", house_number="H-C1", ward=self.ward, **address
+        )
+        self.other_house = HouseRegistration.objects.create(
+            house_name="House 2", house_number="H-C2", ward=Ward.objects.create(name="South Ward"), **address
+        )
+        Member.objects.bulk_create(
+            [Member(first_name="Member", last_name=str(i), house=self.house) for i in range(11)]
+            + [Member(first_name="Former", last_name="Member", house=self.house, is_active=False)]
+            + [Member(first_name="Other", last_name="Member", house=self.other_house)]
+        )
+
+    def _page_count(self, pdf):
+        return len(re.findall(rb"/Type /Page\b(?!s)", pdf))
+
+    def test_cards_fill_sheets(self):
+        """Eleven cards take two A4 sheets"""
+        output = io.BytesIO()
+        count = generate_membership_cards(Member.objects.filter(house=self.house, is_active=True), output)
+        self.assertEqual(count, 11)
+        self.assertTrue(output.getvalue().startswith(b"%PDF"))
+        self.assertEqual(self._page_count(output.getvalue()), 2)
+
+    def test_view_prints_a_ward(self):
+        """The view returns the cards of a ward's active members as a PDF download"""
+        response = self.client.get(reverse("membership:print_membership_cards"), {"ward": self.ward.pk})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Content-Type"], "application/pdf")
+        self.assertIn("membership_cards.pdf", response["Content-Disposition"])
+        self.assertEqual(self._page_count(b"".join(response.streaming_content)), 2)
+
+    def test_view_without_selection_shows_form(self):
+        """Without a house, ward or members the view shows the selection form"""
+        response = self.client.get(reverse("membership:print_membership_cards"))
+        self.assertEqual(response.status_code, 200)
+        self.assertTemplateUsed(response, "membership/print_cards.html")
+
+    def test_cards_are_served_from_the_cache(self):
+        """A reprint of an unchanged card reuses the cached PDF; a changed member misses"""
+        member = Member.objects.filter(house=self.house).first()
+        first = generate_membership_card(member).getvalue()
+        cached = list(CardCache().root.glob("*/*"))
+        self.assertEqual(sorted(path.suffix for path in cached), [".pdf", ".png"])
+
+        with patch("membership.utils._render_membership_card") as render:
+            self.assertEqual(generate_membership_card(member).getvalue(), first)
+        render.assert_not_called()
+
+        member.phone = "9999999999"
+        with patch("membership.utils._render_membership_card", return_value=b"%PDF-new") as render:
+            self.assertEqual(generate_membership_card(member).getvalue(), b"%PDF-new")
+        render.assert_called_once()
+
+    def test_batch_renders_only_missing_qr_codes(self):
+        """QR codes already in the cache are not rendered again by a batch"""
+        cards = [membership_card_data(member) for member in Member.objects.order_by("pk")]
+        _qr_codes(cards[:4])
+        with patch("membership.utils.membership_qr_png", wraps=membership_qr_png) as render:
+            pngs = _qr_codes(cards)
+        self.assertEqual(render.call_count, len(cards) - 4)
+        self.assertTrue(all(png.startswith(b"\x89PNG") for png in pngs))
+
+    def test_qr_view_returns_png(self):
+        """The card preview's QR code is served as a PNG"""
+        member = Member.objects.first()
+        response = self.client.get(reverse("membership:membership_card_qr", args=[member.pk]))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Content-Type"], "image/png")
+
+
+class CardCacheTest(TestCase):
+    """Size-bounded LRU eviction of the card cache"""
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root, ignore_errors=True)
+
+    def test_keys_are_content_addressed(self):
+        """Equal inputs give equal keys and any changed input a new key"""
+        card = {"id": 1, "first_name": "A", "last_name": "B", "full_name": "A B", "phone": "1"}
+        self.assertEqual(cache_key("card", card, "hash"), cache_key("card", dict(card), "hash"))
+        self.assertNotEqual(cache_key("card", card, "hash"), cache_key("card", card, "other"))
+        self.assertNotEqual(cache_key("card", card, "hash"), cache_key("card", {**card, "phone": "2"}, "hash"))
+
+    def test_least_recently_used_entries_are_evicted(self):
+        """A write past the size limit deletes the entries used longest ago"""
+        cache = CardCache(self.root, max_bytes=250)
+        for i, key in enumerate(["a", "b"]):
+            cache.set("qr", key, b"x" * 100)
+            os.utime(cache.path("qr", key), (1000 + i, 1000 + i))
+        # "a" is oldest but a hit makes it the most recently used
+        self.assertIsNotNone(cache.get("qr", "a"))
+
+        cache.set("qr", "c", b"x" * 100)
+        self.assertIsNone(cache.get("qr", "b"))
+        self.assertEqual(cache.get("qr", "a"), b"x" * 100)
+        self.assertEqual(cache.size(), 200)
+
+    def test_writes_under_the_limit_do_not_scan(self):
+        """The cache directory is scanned once for its size, not on every write"""
+        cache = CardCache(self.root, max_bytes=10000)
+        with patch.object(CardCache, "_entries", wraps=cache._entries) as entries:
+            for key in "abcdef":
+                cache.set("qr", key, b"x" * 100)
+        self.assertEqual(entries.call_count, 1)
+
+    def test_failed_write_leaves_no_temp_file(self):
+        """A write that fails removes its partly written temporary file"""
+        cache = CardCache(self.root, max_bytes=10000)
+        with patch("membership.card_cache.os.replace", side_effect=OSError("disk full")):
+            cache.set("qr", "a", b"x" * 100)
+        self.assertEqual(os.listdir(cache.root / "qr"), [])
+
+    def test_zero_size_disables_cache(self):
+        """A limit of 0 stores nothing"""
+        cache = CardCache(self.root, max_bytes=0)
+        cache.set("card", "a", b"%PDF")
+        self.assertIsNone(cache.get("card", "a"))
+        self.assertFalse(os.path.exists(cache.path("card", "a")))
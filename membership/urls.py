@@ -27,6 +27,16 @@ urlpatterns = [
         views.print_membership_card_view,
         name="print_membership_card",
     ),
+    path(
+        "print-cards/",
+        views.print_membership_cards_view,
+        name="print_membership_cards",
+    ),
+    path(
+        "card-qr/<int:member_id>/",
+        views.membership_card_qr_view,
+        name="membership_card_qr",
+    ),
     path(
         "preview-card/<int:member_id>/",
         views.preview_membership_card_view,
@@ -1,11 +1,19 @@
 import io
+import logging
+
 import qrcode
 from reportlab.lib import colors
-from reportlab.lib.pagesizes import letter, mm
+from reportlab.lib.pagesizes import A4, letter, mm
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle, Image
+from reportlab.pdfgen import canvas
+from reportlab.platypus import Frame, SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle, Image
 from reportlab.lib.units import inch
 
+from .card_cache import cache_key, get_card_cache, photo_hash
+
+logger = logging.getLogger(__name__)
+
+
 def generate_membership_questionnaire():
     """Generates a blank PDF questionnaire form for data collection"""
     buffer = io.BytesIO()
@@ -60,19 +68,59 @@ def generate_membership_questionnaire():
     buffer.seek(0)
     return buffer
 
-def generate_membership_card(member):
-    """Generates a membership card PDF with a QR code"""
-    buffer = io.BytesIO()
-    
-    # ID card size roughly 85.6mm x 54mm (standard)
-    card_width = 85.6 * mm
-    card_height = 54 * mm
-    
-    doc = SimpleDocTemplate(buffer, pagesize=(card_width, card_height),
-                            rightMargin=5*mm, leftMargin=5*mm,
-                            topMargin=5*mm, bottomMargin=5*mm)
+# ID card size roughly 85.6mm x 54mm (standard)
+CARD_WIDTH = 85.6 * mm
+CARD_HEIGHT = 54 * mm
+CARD_PADDING = 5 * mm
+
+# Batch printing: cards 2 across and 5 down on an A4 sheet
+SHEET_COLUMNS = 2
+SHEET_ROWS = 5
+CARDS_PER_SHEET = SHEET_COLUMNS * SHEET_ROWS
+
+# Photos are read from a rendition at card size (20 x 25 mm at 300 dpi)
+CARD_PHOTO_RENDITION = "fill-240x300"
+
+
+def membership_card_data(member):
+    """The fields a card shows, as a plain dict that can be sent to worker processes"""
+    return {
+        "id": member.id,
+        "first_name": member.first_name,
+        "last_name": member.last_name,
+        "full_name": member.full_name,
+        "phone": member.phone,
+    }
+
+
+def membership_qr_data(card):
+    """Text encoded in the card's QR code"""
+    return f"MMS-M-{card['id']}-{card['first_name']}-{card['last_name']}"
+
+
+def membership_qr_png(card):
+    """PNG bytes of the QR code printed on the card"""
+    qr_data = membership_qr_data(card)
+    qr = qrcode.QRCode(version=1, box_size=1, border=1) # Smaller box size for card
+    qr.add_data(qr_data)
+    qr.make(fit=True)
+    qr_img = qr.make_image(fill_color="black", back_color="white")
+
+    qr_buffer = io.BytesIO()
+    qr_img.save(qr_buffer, format='PNG')
+    return qr_buffer.getvalue()
+
+
+def cached_qr_png(card, cache=None):
+    """``membership_qr_png(card)``, served from the card cache when already rendered"""
+    cache = cache or get_card_cache()
+    return cache.get_or_render("qr", cache_key("qr", membership_qr_data(card)), lambda: membership_qr_png(card))
+
+
+def _card_flowables(card, qr_png, photo=None):
+    """Flowables of one card; ``photo`` is a file path or file-like object, or None"""
     elements = []
-    
+
     styles = getSampleStyleSheet()
     card_title_style = ParagraphStyle(
         'CardTitle',
@@ -101,42 +149,27 @@ def generate_membership_card(member):
     elements.append(Paragraph("MEMBERSHIP CARD", ParagraphStyle('Sub', parent=card_title_style, fontSize=6, textColor=colors.black)))
     elements.append(Spacer(1, 2*mm))
     
-    # QR Code generation
-    qr_data = f"MMS-M-{member.id}-{member.first_name}-{member.last_name}"
-    qr = qrcode.QRCode(version=1, box_size=1, border=1) # Smaller box size for card
-    qr.add_data(qr_data)
-    qr.make(fit=True)
-    qr_img = qr.make_image(fill_color="black", back_color="white")
-    
-    # Convert PIL image to BytesIO for reportlab
-    qr_buffer = io.BytesIO()
-    qr_img.save(qr_buffer, format='PNG')
-    qr_buffer.seek(0)
-    
-    qr_image = Image(qr_buffer, width=15*mm, height=15*mm)
+    qr_image = Image(io.BytesIO(qr_png), width=15*mm, height=15*mm)
     
     # Photo and QR layout
     photo_image = None
-    if member.photo:
+    if photo is not None:
         try:
-            # Wagtail images have a file property that points to the actual file
-            photo_path = member.photo.file.path
-            photo_image = Image(photo_path, width=20*mm, height=25*mm)
+            photo_image = Image(photo, width=20*mm, height=25*mm)
         except Exception as e:
-            import logging
-            logging.getLogger(__name__).warning(f"Could not load photo for card: {e}")
+            logger.warning(f"Could not load photo for card: {e}")
 
     # Info Table
     if photo_image:
         info_data = [
-            [photo_image, Paragraph(f"<b>{member.full_name}</b>", name_style), qr_image],
-            ["", Paragraph(f"ID: MMS-{member.id:04d}", detail_style), ""],
-            ["", Paragraph(f"Phone: {member.phone}", detail_style), ""],
+            [photo_image, Paragraph(f"<b>{card['full_name']}</b>", name_style), qr_image],
+            ["", Paragraph(f"ID: MMS-{card['id']:04d}", detail_style), ""],
+            ["", Paragraph(f"Phone: {card['phone']}", detail_style), ""],
         ]
         table = Table(info_data, colWidths=[22*mm, 35*mm, 15*mm])
         table.setStyle(TableStyle([
-            ('SPAN', (0, 0), (0, 3)), # Photo spans all rows
-            ('SPAN', (2, 0), (2, 3)), # QR spans all rows
+            ('SPAN', (0, 0), (0, -1)), # Photo spans all rows
+            ('SPAN', (2, 0), (2, -1)), # QR spans all rows
             ('ALIGN', (2, 0), (2, 3), 'CENTER'),
             ('VALIGN', (2, 0), (2, 3), 'MIDDLE'),
             ('VALIGN', (0, 0), (0, 3), 'TOP'),
@@ -144,20 +177,114 @@ def generate_membership_card(member):
         ]))
     else:
         info_data = [
-            [Paragraph(f"<b>{member.full_name}</b>", name_style), qr_image],
-            [Paragraph(f"ID: MMS-{member.id:04d}", detail_style), ""],
-            [Paragraph(f"Phone: {member.phone}", detail_style), ""],
+            [Paragraph(f"<b>{card['full_name']}</b>", name_style), qr_image],
+            [Paragraph(f"ID: MMS-{card['id']:04d}", detail_style), ""],
+            [Paragraph(f"Phone: {card['phone']}", detail_style), ""],
         ]
         table = Table(info_data, colWidths=[55*mm, 15*mm])
         table.setStyle(TableStyle([
-            ('SPAN', (1, 0), (1, 3)),
+            ('SPAN', (1, 0), (1, -1)),
             ('ALIGN', (1, 0), (1, 3), 'CENTER'),
             ('VALIGN', (1, 0), (1, 3), 'MIDDLE'),
             ('VALIGN', (0, 0), (0, 3), 'TOP'),
         ]))
     
     elements.append(table)
+    return elements
+
+
+def generate_membership_card(member):
+    """Generates a membership card PDF with a QR code, reusing the cached PDF when the card is unchanged"""
+    cache = get_card_cache()
+    card = membership_card_data(member)
+    key = cache_key("card", card, photo_hash(member))
+    return io.BytesIO(cache.get_or_render("card", key, lambda: _render_membership_card(member, card, cache)))
+
+
+def _render_membership_card(member, card, cache):
+    buffer = io.BytesIO()
     
-    doc.build(elements)
-    buffer.seek(0)
-    return buffer
+    doc = SimpleDocTemplate(buffer, pagesize=(CARD_WIDTH, CARD_HEIGHT),
+                            rightMargin=CARD_PADDING, leftMargin=CARD_PADDING,
+                            topMargin=CARD_PADDING, bottomMargin=CARD_PADDING)
+
+    photo = None
+    if member.photo:
+        try:
+            # Wagtail images have a file property that points to the actual file
+            photo = member.photo.file.path
+        except Exception as e:
+            logger.warning(f"Could not load photo for card: {e}")
+
+    doc.build(_card_flowables(card, cached_qr_png(card, cache), photo))
+    return buffer.getvalue()
+
+
+def prefetch_card_photos(members):
+    """``members`` with their photos and card-size photo renditions loaded in two queries"""
+    from django.db.models import Prefetch
+    from wagtail.images import get_image_model
+
+    images = get_image_model().objects.prefetch_renditions(CARD_PHOTO_RENDITION)
+    return members.prefetch_related(Prefetch("photo", queryset=images))
+
+
+def _card_photo(member):
+    """Bytes of the member's card-size photo rendition, or None"""
+    if not member.photo:
+        return None
+    try:
+        # Uses the prefetched renditions; a missing one is created once
+        rendition = member.photo.get_rendition(CARD_PHOTO_RENDITION)
+        with rendition.file.open("rb") as f:
+            return f.read()
+    except Exception as e:
+        logger.warning(f"Could not load photo for card of member {member.pk}: {e}")
+        return None
+
+
+def _qr_codes(cards):
+    """QR code PNGs of ``cards``; those not in the card cache are rendered and stored"""
+    cache = get_card_cache()
+    keys = [cache_key("qr", membership_qr_data(card)) for card in cards]
+    pngs = [cache.get("qr", key) for key in keys]
+    missing = [i for i, png in enumerate(pngs) if png is None]
+    for i in missing:
+        pngs[i] = membership_qr_png(cards[i])
+        cache.set("qr", keys[i], pngs[i])
+    return pngs
+
+
+def generate_membership_cards(members, output):
+    """Write the cards of ``members`` (a queryset) to ``output``, ``CARDS_PER_SHEET`` per A4 sheet.
+
+    Photos and their renditions are prefetched in bulk and QR codes come
+    from the card cache, so only new cards render a QR code. Cards are
+    outlined as cutting guides. Returns the number of cards.
+    """
+    members = list(prefetch_card_photos(members))
+    cards = [membership_card_data(member) for member in members]
+    photos = [_card_photo(member) for member in members]
+    qr_codes = _qr_codes(cards)
+
+    page_width, page_height = A4
+    left = (page_width - SHEET_COLUMNS * CARD_WIDTH) / 2
+    top = page_height - (page_height - SHEET_ROWS * CARD_HEIGHT) / 2
+
+    pdf = canvas.Canvas(output, pagesize=A4)
+    pdf.setTitle("Membership Cards")
+    for index, (card, qr_png, photo) in enumerate(zip(cards, qr_codes, photos)):
+        position = index % CARDS_PER_SHEET
+        if index and not position:
+            pdf.showPage()
+        x = left + (position % SHEET_COLUMNS) * CARD_WIDTH
+        y = top - (position // SHEET_COLUMNS + 1) * CARD_HEIGHT
+
+        pdf.setStrokeColor(colors.lightgrey)
+        pdf.setLineWidth(0.25)
+        pdf.rect(x, y, CARD_WIDTH, CARD_HEIGHT)
+        frame = Frame(x, y, CARD_WIDTH, CARD_HEIGHT, leftPadding=CARD_PADDING, rightPadding=CARD_PADDING,
+                      topPadding=CARD_PADDING, bottomPadding=CARD_PADDING)
+        frame.addFromList(_card_flowables(card, qr_png, io.BytesIO(photo) if photo else None), pdf)
+    pdf.save()
+    return len(cards)
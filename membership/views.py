@@ -1,21 +1,38 @@
 import logging
-from decimal import Decimal
+import tempfile
+from datetime import date
 from urllib.parse import quote
 
 from django.contrib import messages
 from django.core.exceptions import ValidationError
-from django.db import transaction
-from django.db.models import Q, Sum
-from django.http import HttpResponse
+from django.core.paginator import Paginator
+from django.http import FileResponse, HttpResponse
 from django.shortcuts import get_object_or_404, redirect, render
 from django.utils import timezone
 
 from .forms import WhatsAppMessageForm
-from .models import HouseRegistration, Member, MembershipDues, Payment
-from .utils import generate_membership_card, generate_membership_questionnaire
+from .models import HouseRegistration, Member, Payment, Ward
+from .reports import (
+    AGE_BUCKETS, SUMMARY_ORDER, SUMMARY_PAGE_SIZE, attach_house_dues, overdue_dues, overdue_house_summary, overdue_totals,
+)
+from .services import generate_dues, get_monthly_dues_amount, settle_dues
+from .utils import (
+    CARDS_PER_SHEET, cached_qr_png, generate_membership_card, generate_membership_cards,
+    generate_membership_questionnaire, membership_card_data,
+)
 
 logger = logging.getLogger(__name__)
 
+# Largest batch of membership cards printed in one request
+MAX_BATCH_CARDS = 2000
+
+# Orderings of the bulk payment house picker
+BULK_PAYMENT_ORDER = {
+    "name": ["house_name", "house_number"],
+    "arrears": ["-balance__months_in_arrears", "house_name", "house_number"],
+    "amount": ["-balance__total_outstanding", "house_name", "house_number"],
+}
+
 
 def bulk_payment_view(request):
     """View for bulk payment processing"""
@@ -27,82 +44,38 @@ def bulk_payment_view(request):
 
         if not house_ids:
             messages.error(request, "Please select at least one house.")
-            return redirect("bulk_payment")
+            return redirect("membership:bulk_payment")
 
         if not payment_method:
             messages.error(request, "Please select a payment method.")
-            return redirect("bulk_payment")
+            return redirect("membership:bulk_payment")
+
+        if payment_date:
+            try:
+                payment_date = date.fromisoformat(payment_date)
+            except ValueError:
+                messages.error(request, "Please enter a valid payment date.")
+                return redirect("membership:bulk_payment")
 
         try:
-            with transaction.atomic():
-                total_amount = Decimal("0.00")
-                selected_dues = []
-
-                # Optimize: Get all houses and dues in bulk
-                houses = HouseRegistration.objects.filter(id__in=house_ids)
-                # Get all unpaid dues for selected houses in one query
-                dues = (
-                    MembershipDues.objects.filter(house__in=houses, is_paid=False)
-                    .select_related("house")
-                    .order_by("year", "month")
-                )
-
-                # Group dues by house
-                for house in houses:
-                    house_dues = [due for due in dues if due.house_id == house.id]
-                    if house_dues:
-                        selected_dues.extend(house_dues)
-                        total_amount += sum(due.amount_due for due in house_dues)
-
-                if not selected_dues:
-                    messages.warning(
-                        request, "No unpaid dues found for selected houses."
-                    )
-                    return redirect("bulk_payment")
-
-                # Create payment record
-                # Find the head of family (or if not available, any member) of the first house to link the payment to
-                first_house = HouseRegistration.objects.filter(id__in=house_ids).first()
-                member_to_link = Member.objects.filter(
-                    house=first_house, is_head_of_family=True
-                ).first()
-                if not member_to_link:
-                    member_to_link = Member.objects.filter(house=first_house).first()
-
-                if not member_to_link:
-                    # Fallback or error if house has no members?
-                    # For now, we will create a dummy member or raise an error?
-                    # Let's skip with a warning if no member found? But we already processed potential dues.
-                    # We'll assume for now that house registration implies members exist or we can proceed
-                    # but we can't create Payment without Member due to ForeignKey.
-                    messages.error(
-                        request,
-                        f"Cannot create payment: No members found in {first_house}. Payment requires a Member.",
-                    )
-                    return redirect("bulk_payment")
-
-                payment = Payment.objects.create(
-                    member=member_to_link,
-                    amount=total_amount,
-                    payment_method=payment_method,
-                    payment_date=payment_date or timezone.now().date(),
-                    notes=f"Bulk payment for {len(house_ids)} houses - {notes}",
-                )
-
-                # Associate dues with payment and mark as paid
-                for due in selected_dues:
-                    payment.membership_dues.add(due)
-                    due.is_paid = True
-                    due.save()
-
-                messages.success(
-                    request,
-                    f"Bulk payment processed successfully! Receipt #{payment.receipt_number} for ₹{total_amount}",
-                )
-                logger.info(
-                    f"Bulk payment processed: Receipt #{payment.receipt_number}, "
-                    f"Amount: ₹{total_amount}, Houses: {len(house_ids)}"
-                )
+            result = settle_dues(
+                house_ids,
+                payment_method,
+                payment_date=payment_date or None,
+                notes=f"Bulk payment for {len(house_ids)} houses - {notes}",
+            )
+            if result is None:
+                messages.warning(request, "No unpaid dues found for selected houses.")
+                return redirect("membership:bulk_payment")
+
+            messages.success(
+                request,
+                f"Bulk payment processed successfully! Receipt #{result.payment.receipt_number} for ₹{result.total_amount}",
+            )
+            logger.info(
+                f"Bulk payment processed: Receipt #{result.payment.receipt_number}, "
+                f"Amount: ₹{result.total_amount}, Houses: {len(house_ids)}"
+            )
 
         except ValidationError as e:
             messages.error(request, f"Validation error: {str(e)}")
@@ -117,60 +90,67 @@ def bulk_payment_view(request):
             )
             logger.error(f"Unexpected error in bulk payment: {e}", exc_info=True)
 
-        return redirect("bulk_payment")
+        return redirect("membership:bulk_payment")
 
     # GET request - show form
-    # Get houses with unpaid dues
+    # Houses with unpaid dues, from the precomputed balances
+    sort = request.GET.get("sort", "")
+    order = BULK_PAYMENT_ORDER.get(sort, BULK_PAYMENT_ORDER["name"])
     houses_with_dues = (
-        HouseRegistration.objects.filter(membership_dues__is_paid=False)
-        .distinct()
-        .order_by("house_name", "house_number")
+        HouseRegistration.objects.filter(balance__months_in_arrears__gt=0)
+        .select_related("balance")
+        .order_by(*order)
     )
 
     context = {
         "houses": houses_with_dues,
         "payment_methods": Payment.PAYMENT_METHOD_CHOICES,
+        "sort": sort if sort in BULK_PAYMENT_ORDER else "name",
     }
     return render(request, "membership/bulk_payment.html", context)
 
 
 def overdue_report_view(request):
     """View for overdue membership dues report"""
-    # Get current date
     today = timezone.now().date()
-
-    # Get overdue dues with optimized query
-    overdue_dues = (
-        MembershipDues.objects.filter(is_paid=False, due_date__lt=today)
-        .select_related("house")
-        .prefetch_related("payments")
-        .order_by("due_date", "house__house_name", "house__house_number")
-    )
-
-    # Calculate totals
-    total_overdue_amount = overdue_dues.aggregate(total=Sum("amount_due"))[
-        "total"
-    ] or Decimal("0.00")
-
-    # Group by house for summary
-    house_summary = {}
-    for due in overdue_dues:
-        house_name = str(due.house)
-        if house_name not in house_summary:
-            house_summary[house_name] = {
-                "house": due.house,
-                "dues_count": 0,
-                "total_amount": Decimal("0.00"),
-                "dues": [],
-            }
-        house_summary[house_name]["dues_count"] += 1
-        house_summary[house_name]["total_amount"] += due.amount_due
-        house_summary[house_name]["dues"].append(due)
+    ward = request.GET.get("ward", "")
+    area = request.GET.get("area", "").strip()
+    age = request.GET.get("age", "")
+    min_months = request.GET.get("min_months", "")
+    order = request.GET.get("order", "")
+    if not ward.isdigit():
+        ward = ""
+    if not min_months.isdigit():
+        min_months = ""
+    if order not in SUMMARY_ORDER:
+        order = "oldest"
+
+    dues = overdue_dues(today, ward=ward, area=area, age=age, min_months=int(min_months or 0))
+    totals = overdue_totals(dues)
+
+    # Only the houses on this page get their dues loaded
+    paginator = Paginator(overdue_house_summary(dues, order), SUMMARY_PAGE_SIZE)
+    page = paginator.get_page(request.GET.get("page"))
+    house_summary = attach_house_dues(list(page.object_list), dues)
+
+    filter_query = request.GET.copy()
+    filter_query.pop("page", None)
 
     context = {
-        "overdue_dues": overdue_dues,
-        "total_overdue_amount": total_overdue_amount,
+        "overdue_dues": dues,
+        "total_overdue_amount": totals["total_amount"],
+        "overdue_count": totals["dues_count"],
+        "house_count": totals["house_count"],
         "house_summary": house_summary,
+        "page_obj": page,
+        "filter_query": filter_query.urlencode(),
+        "wards": Ward.objects.order_by("name"),
+        "age_buckets": AGE_BUCKETS,
+        "selected_ward": ward,
+        "selected_area": area,
+        "selected_age": age,
+        "selected_min_months": min_months,
+        "selected_order": order,
         "today": today,
     }
     return render(request, "membership/overdue_report.html", context)
@@ -182,49 +162,30 @@ def generate_monthly_dues_view(request):
         try:
             year = int(request.POST.get("year"))
             month = int(request.POST.get("month"))
+            # Optional end of a range of months; defaults to the single month
+            end_year = int(request.POST.get("end_year") or year)
+            end_month = int(request.POST.get("end_month") or month)
 
             # Validate month range
-            if not (1 <= month <= 12):
+            if not (1 <= month <= 12 and 1 <= end_month <= 12):
                 messages.error(request, "Month must be between 1 and 12.")
-                return redirect("generate_monthly_dues")
-
-            # Check if dues already exist for this month
-            existing_dues = MembershipDues.objects.filter(year=year, month=month)
-            if existing_dues.exists():
-                messages.warning(request, f"Dues for {year}-{month:02d} already exist!")
-                return redirect("generate_monthly_dues")
-
-            # Generate dues for all houses
-            houses = HouseRegistration.objects.all()
-            created_count = 0
-
-            with transaction.atomic():
-                for house in houses:
-                    # For now, assume each house pays ₹10 regardless of member count
-                    # This can be enhanced with more complex logic later
-
-                    MembershipDues.objects.create(
-                        house=house,
-                        year=year,
-                        month=month,
-                        amount_due=Decimal("10.00"),
-                        due_date=timezone.datetime(year, month, 1).date(),
-                    )
-                    created_count += 1
+                return redirect("membership:generate_monthly_dues")
+            if (end_year, end_month) < (year, month):
+                messages.error(request, "End month must not be before the start month.")
+                return redirect("membership:generate_monthly_dues")
 
-            messages.success(
-                request,
-                f"Generated {created_count} dues records for {year}-{month:02d}",
-            )
-            logger.info(
-                f"Generated {created_count} dues records for {year}-{month:02d}"
-            )
-            return redirect("generate_monthly_dues")
+            result = generate_dues((year, month), (end_year, end_month))
+
+            if result.created:
+                messages.success(request, f"Generated {result}")
+            else:
+                messages.warning(request, f"No new dues generated: {result}")
+            return redirect("membership:generate_monthly_dues")
 
         except (ValueError, TypeError) as e:
             messages.error(request, "Invalid year or month provided.")
             logger.warning(f"Invalid input in generate_monthly_dues: {e}")
-            return redirect("generate_monthly_dues")
+            return redirect("membership:generate_monthly_dues")
         except Exception as e:
             messages.error(
                 request, "An error occurred while generating dues. Please try again."
@@ -232,13 +193,14 @@ def generate_monthly_dues_view(request):
             logger.error(
                 f"Unexpected error in generate_monthly_dues: {e}", exc_info=True
             )
-            return redirect("generate_monthly_dues")
+            return redirect("membership:generate_monthly_dues")
 
     # GET request - show form
     today = timezone.now().date()
     context = {
         "current_year": today.year,
         "current_month": today.month,
+        "dues_amount": get_monthly_dues_amount(),
     }
     return render(request, "membership/generate_monthly_dues.html", context)
 
@@ -269,6 +231,49 @@ def print_membership_card_view(request, member_id):
     return response
 
 
+def print_membership_cards_view(request):
+    """Print the cards of selected members, a house or a ward, several per A4 sheet"""
+    member_ids = [pk for pk in request.GET.getlist("member") if pk.isdigit()]
+    house = request.GET.get("house", "")
+    ward = request.GET.get("ward", "")
+
+    if member_ids:
+        members = Member.objects.filter(pk__in=member_ids)
+    elif house.isdigit():
+        members = Member.objects.filter(house_id=house, is_active=True)
+    elif ward.isdigit():
+        members = Member.objects.filter(house__ward_id=ward, is_active=True)
+    else:
+        context = {
+            "wards": Ward.objects.order_by("name"),
+            "houses": HouseRegistration.objects.order_by("house_name", "house_number"),
+            "cards_per_sheet": CARDS_PER_SHEET,
+        }
+        return render(request, "membership/print_cards.html", context)
+
+    members = members.order_by("house__house_name", "house__house_number", "first_name", "last_name", "pk")
+    count = members.count()
+    if not count:
+        messages.warning(request, "No members to print cards for.")
+        return redirect("membership:print_membership_cards")
+    if count > MAX_BATCH_CARDS:
+        messages.error(request, f"{count} cards requested; print at most {MAX_BATCH_CARDS} at a time.")
+        return redirect("membership:print_membership_cards")
+
+    # Written to a temporary file and streamed from there, not held in memory
+    output = tempfile.TemporaryFile()
+    generate_membership_cards(members, output)
+    output.seek(0)
+    logger.info(f"Printed {count} membership cards")
+    return FileResponse(output, as_attachment=True, filename="membership_cards.pdf", content_type="application/pdf")
+
+
+def membership_card_qr_view(request, member_id):
+    """PNG of the QR code on a member's card, for the card preview"""
+    member = get_object_or_404(Member, id=member_id)
+    return HttpResponse(cached_qr_png(membership_card_data(member)), content_type="image/png")
+
+
 def preview_membership_card_view(request, member_id):
     """View to preview a membership card for a specific member"""
     member = get_object_or_404(Member, id=member_id)
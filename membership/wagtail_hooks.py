@@ -1,7 +1,9 @@
 import re
 
 from django import forms
+from django.contrib import admin
 from django.core.exceptions import ValidationError
+from django.db.models import Q
 from django.urls import reverse
 from django.utils.html import format_html
 from wagtail.admin.panels import FieldPanel, FieldRowPanel, MultiFieldPanel
@@ -51,6 +53,12 @@ class MemberButtonHelper(ButtonHelper):
             "title": "Preview/Print Membership Questionnaire",
         }
         buttons.append(questionnaire_button)
+        buttons.append({
+            "url": reverse("membership:print_membership_cards"),
+            "label": "Print Cards",
+            "classname": "button",
+            "title": "Print membership cards for a house, a ward or selected members",
+        })
         return buttons
 
 
@@ -277,18 +285,69 @@ class HouseRegistrationForm(forms.ModelForm):
         return value
 
 
+class ArrearsListFilter(admin.SimpleListFilter):
+    """Houses by number of unpaid dues, from the indexed ``HouseBalance`` column"""
+
+    title = "months in arrears"
+    parameter_name = "arrears"
+
+    # value -> (label, fewest months, most months)
+    BUCKETS = {
+        "none": ("None", 0, 0),
+        "1-3": ("1 to 3 months", 1, 3),
+        "4-12": ("4 to 12 months", 4, 12),
+        "13+": ("Over 12 months", 13, None),
+    }
+
+    def lookups(self, request, model_admin):
+        return [(value, label) for value, (label, _fewest, _most) in self.BUCKETS.items()]
+
+    def queryset(self, request, queryset):
+        if self.value() not in self.BUCKETS:
+            return queryset
+        _label, fewest, most = self.BUCKETS[self.value()]
+        if not fewest:
+            return queryset.filter(Q(balance=None) | Q(balance__months_in_arrears=0))
+        queryset = queryset.filter(balance__months_in_arrears__gte=fewest)
+        if most is not None:
+            queryset = queryset.filter(balance__months_in_arrears__lte=most)
+        return queryset
+
+
 class HouseRegistrationAdmin(ModelAdmin):
     model = HouseRegistration
     permission_helper_class = ACLPermissionHelper
     menu_label = "House Registrations"
     menu_icon = "home"
     add_to_admin_menu = False  # Will be included in grouped menu
-    list_display = ("house_name", "house_number", "area", "ward", "city", "state", "country")
+    list_display = (
+        "house_name", "house_number", "area", "ward", "city", "state", "country",
+        "months_in_arrears", "total_outstanding",
+    )
+    list_filter = (ArrearsListFilter,)
     search_fields = ("house_name", "house_number", "area")
 
     def get_form_class(self):
         return HouseRegistrationForm
 
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related("ward", "city", "state", "country", "balance")
+
+    def months_in_arrears(self, obj):
+        # Houses without a HouseBalance row owe nothing
+        balance = getattr(obj, "balance", None)
+        return balance.months_in_arrears if balance else 0
+
+    months_in_arrears.short_description = "Months in Arrears"
+    months_in_arrears.admin_order_field = "balance__months_in_arrears"
+
+    def total_outstanding(self, obj):
+        balance = getattr(obj, "balance", None)
+        return f"₹{balance.total_outstanding if balance else '0.00'}"
+
+    total_outstanding.short_description = "Outstanding"
+    total_outstanding.admin_order_field = "balance__total_outstanding"
+
     panels = [
         MultiFieldPanel(
             [
@@ -1,10 +1,20 @@
+import tempfile
+from pathlib import Path
+
 from .settings import *
 
-# Force SQLite for testing
+# Force SQLite for testing. The test database is a file, not the in-memory
+# default, so concurrent writers from several threads wait for each other
+# (ReceiptSequenceConcurrencyTest) instead of failing with "table is locked".
+# It is created afresh for every run: a reused one would keep the flush done
+# by TransactionTestCase and lose the rows created by migrations.
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        'TEST': {
+            'NAME': Path(tempfile.gettempdir()) / 'mms_test.sqlite3',
+        },
     }
 }
 
@@ -31,5 +31,5 @@ def test_data_profiling_csv_export(admin_client):
     assert response.status_code == 200
     assert response['Content-Type'] == 'text/csv'
     assert 'attachment; filename="data_profiling_' in response['Content-Disposition']
-    content = response.content.decode('utf-8')
+    content = b"".join(response.streaming_content).decode('utf-8')
     assert "Module,Model Name,Record Count,Last Updated" in content